@@ -1,11 +1,9 @@
+import os
+
 import click
 
-from graffan.library.analysis.targets import analyze_targets
-from graffan.library.models.analysis import AnalysedIteration
-from graffan.utilities.forcebalance import (
-    extract_target_parameters,
-    load_fb_force_field,
-)
+from graffan.library.analysis.images import prerender_images
+from graffan.library.analysis.targets import analyze_iteration
 
 
 @click.command("analyse", help="Analyzes the output of a ForceBalance iteration.")
@@ -16,19 +14,65 @@ from graffan.utilities.forcebalance import (
     help="The iteration to analyze.",
     show_default=True,
 )
-def analyse_cli(iteration):
+@click.option(
+    "--memory-budget",
+    default=None,
+    type=click.IntRange(min=1),
+    help="An optional budget (in MB) for the intermediate arrays used while mapping "
+    "the target gradients. If set, the targets will be mapped in chunks sized to fit "
+    "within the budget. The budget does not cover the merged per-molecule gradients "
+    "or the analysed output built from them, whose size is set by the number of "
+    "non-zero gradients.",
+)
+@click.option(
+    "--resume",
+    default=False,
+    type=bool,
+    is_flag=True,
+    help="Resume the analysis from the last checkpoint, only re-extracting the "
+    "gradients of targets which were not previously extracted successfully.",
+)
+@click.option(
+    "--max-workers",
+    default=None,
+    type=click.IntRange(min=1),
+    help="The maximum number of processes to use when finding the atoms matched by "
+    "each refit parameter and when rendering images. By default one process per CPU "
+    "will be used.",
+)
+@click.option(
+    "--prerender-images",
+    "prerender",
+    default=False,
+    type=bool,
+    is_flag=True,
+    help="Render an image of each molecule with the atoms matched by each refit "
+    "parameter highlighted, and store them alongside the output so that they do not "
+    "need to be rendered by the dashboard.",
+)
+def analyse_cli(iteration, memory_budget, resume, max_workers, prerender):
 
-    # Load in the definitions of the refit parameters.
-    fb_force_field = load_fb_force_field("")
-    parameters = extract_target_parameters(fb_force_field)
+    output_name = f"iteration_{str(iteration).zfill(4)}"
 
-    # Perform the analysis
-    output = AnalysedIteration(
-        iteration=iteration,
-        targets=analyze_targets("", iteration),
-        refit_parameters=parameters,
+    # Perform the analysis, storing the raw gradients alongside the main output.
+    output = analyze_iteration(
+        "",
+        iteration,
+        output_directory=output_name,
+        memory_budget=None if memory_budget is None else memory_budget * 1024**2,
+        resume=resume,
+        max_workers=max_workers,
     )
 
-    with open(f"iteration_{str(iteration).zfill(4)}.json", "w") as file:
+    for error in output.errors:
+        click.echo(
+            f"{error.name} ({error.type}) could not be analysed: {error.message}",
+            err=True,
+        )
+
+    with open(f"{output_name}.json", "w") as file:
 
         file.write(output.json(sort_keys=True, indent=2, separators=(",", ": ")))
+
+    if prerender:
+        prerender_images(output, os.path.join(output_name, "images"), max_workers)
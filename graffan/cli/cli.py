@@ -1,6 +1,7 @@
 import click
 
 from graffan.cli.analyse import analyse_cli
+from graffan.cli.query import query_cli
 from graffan.cli.visualise import visualise_cli
 
 
@@ -10,4 +11,5 @@ def cli():
 
 
 cli.add_command(analyse_cli)
+cli.add_command(query_cli)
 cli.add_command(visualise_cli)
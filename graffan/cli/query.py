@@ -0,0 +1,140 @@
+import os
+from typing import get_args
+
+import click
+
+from graffan.library.analysis.query import (
+    QueryOrder,
+    SummaryStatistic,
+    build_gradient_columns,
+    load_gradient_columns,
+    query_gradients,
+    query_parameters,
+)
+from graffan.library.analysis.targets import MAPPED_GRADIENTS_FILE_NAME
+from graffan.library.models.analysis import AnalysedIteration
+
+
+def _echo_gradients(columns, parameter_id, attribute, k, order, threshold):
+
+    entries = query_gradients(columns, parameter_id, attribute, k, order, threshold)
+
+    for entry in entries:
+        click.echo(f"{entry.id}\t{entry.attribute}\t{entry.smiles}\t{entry.value}")
+
+
+def _missing_target_error(filename: str, target_type: str) -> click.BadParameter:
+
+    return click.BadParameter(
+        f"{filename} does not contain any {target_type} targets.",
+        param_hint="--target",
+    )
+
+
+@click.command(
+    "query",
+    help="Finds the largest (or smallest) gradients stored in an analyzed output. If "
+    "a parameter is specified the molecules which contribute most to the gradient "
+    "w.r.t. that parameter are returned, otherwise the parameters with the largest "
+    "summary statistic are returned.",
+)
+@click.option(
+    "--target",
+    "target_type",
+    required=True,
+    type=click.Choice(["torsion", "vibration", "optgeo"]),
+    help="The type of target to query.",
+)
+@click.option(
+    "--parameter",
+    "parameter_id",
+    default=None,
+    type=str,
+    help="The id of the parameter to find the largest per-molecule gradients of.",
+)
+@click.option(
+    "--attribute",
+    default=None,
+    type=str,
+    help="The parameter attribute to restrict the query to.",
+)
+@click.option(
+    "-k",
+    "--top",
+    "k",
+    default=10,
+    type=int,
+    help="The maximum number of results to return.",
+    show_default=True,
+)
+@click.option(
+    "--order",
+    default="absolute",
+    type=click.Choice([*get_args(QueryOrder)]),
+    help="Whether to return the largest, smallest or largest in magnitude values.",
+    show_default=True,
+)
+@click.option(
+    "--statistic",
+    default="sum",
+    type=click.Choice([*get_args(SummaryStatistic)]),
+    help="The summary statistic to rank parameters by when no parameter is "
+    "specified.",
+    show_default=True,
+)
+@click.option(
+    "--threshold",
+    default=None,
+    type=float,
+    help="Only return values whose magnitude is greater than or equal to this.",
+)
+@click.argument("filename", type=click.Path(exists=True))
+def query_cli(
+    filename, target_type, parameter_id, attribute, k, order, statistic, threshold
+):
+
+    mapped_gradients_path = os.path.join(
+        os.path.splitext(filename)[0], MAPPED_GRADIENTS_FILE_NAME
+    )
+
+    if (parameter_id is not None or attribute is not None) and os.path.isfile(
+        mapped_gradients_path
+    ):
+
+        # Query the sparse gradients stored alongside the output directly rather
+        # than parsing and traversing the nested gradient dictionaries.
+        try:
+            columns = load_gradient_columns(mapped_gradients_path, target_type)
+        except KeyError:
+            raise _missing_target_error(filename, target_type)
+
+        _echo_gradients(
+            columns,
+            parameter_id,
+            attribute,
+            k,
+            order,
+            threshold,
+        )
+        return
+
+    analyzed_output = AnalysedIteration.parse_file(filename)
+    targets = {target.type: target for target in analyzed_output.targets}
+
+    if target_type not in targets:
+        raise _missing_target_error(filename, target_type)
+
+    target = targets[target_type]
+
+    if parameter_id is None and attribute is None:
+
+        for summary in query_parameters(target, k, order, statistic, threshold):
+            click.echo(
+                f"{summary.id}\t{summary.attribute}\t{getattr(summary, statistic)}"
+            )
+
+        return
+
+    _echo_gradients(
+        build_gradient_columns(target), parameter_id, attribute, k, order, threshold
+    )
@@ -1,11 +1,35 @@
+import os
+
 import click
 
-from graffan.dashboard.app import DashboardApp
+from graffan.dashboard.app import (
+    DEFAULT_GRID_PAGE_SIZE,
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    MAXIMUM_GRID_PAGE_SIZE,
+    DashboardApp,
+)
+from graffan.dashboard.data import (
+    MAX_LOADED_DATASETS,
+    IterationStore,
+    configure_dataset_cache,
+    get_dataset,
+    register_dataset,
+)
+from graffan.dashboard.export import export_report
 from graffan.library.models.analysis import AnalysedIteration
+from graffan.utilities.rdkit import configure_image_cache
+
+DEFAULT_IMAGE_CACHE = os.path.join(
+    os.path.expanduser("~"), ".cache", "graffan", "images"
+)
 
 
 @click.command(
-    "visualise", help="Launch an interactive dashboard to visualise an analyzed output."
+    "visualise",
+    help="Launch an interactive dashboard to visualise an analyzed output, or a "
+    "directory of analysed outputs (e.g. `iteration_0000.json`, "
+    "`iteration_0001.json`, ...) which can be scrubbed through.",
 )
 @click.option(
     "--debug",
@@ -14,10 +38,144 @@ from graffan.library.models.analysis import AnalysedIteration
     is_flag=True,
     help="Launch the dashboard in debug mode.",
 )
+@click.option(
+    "--image-cache",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="The directory to persist rendered molecule images in. By default any "
+    "images pre-rendered by `graffan analyse` will be used if present, otherwise "
+    f"images will be stored in {DEFAULT_IMAGE_CACHE}.",
+)
+@click.option(
+    "--image-cache-size",
+    default=64,
+    type=click.IntRange(min=0),
+    help="The maximum size (in MB) of rendered molecule images to retain in memory.",
+    show_default=True,
+)
+@click.option(
+    "--grid-page-size",
+    default=DEFAULT_GRID_PAGE_SIZE,
+    type=click.IntRange(min=1, max=MAXIMUM_GRID_PAGE_SIZE),
+    help="The number of molecules to show per page of the zoomed region grid.",
+    show_default=True,
+)
+@click.option(
+    "--max-loaded-iterations",
+    default=MAX_LOADED_DATASETS,
+    type=click.IntRange(min=1),
+    help="The maximum number of analysed iterations to retain in memory when "
+    "visualising a directory of analysed outputs.",
+    show_default=True,
+)
+@click.option(
+    "--export",
+    "export_path",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Export a self-contained HTML report to this path which can be viewed "
+    "without running a server, rather than launching the dashboard. When a directory "
+    "of analysed outputs is provided, the latest iteration will be exported.",
+)
+@click.option(
+    "--serve",
+    default=False,
+    type=bool,
+    is_flag=True,
+    help="Serve the dashboard using a production WSGI server (gunicorn) rather than "
+    "launching it using the development server. This is recommended when the "
+    "dashboard will be accessed by multiple users.",
+)
+@click.option(
+    "--workers",
+    default=4,
+    type=click.IntRange(min=1),
+    help="The number of worker processes to serve the dashboard with. This option "
+    "is only used when `--serve` is set.",
+    show_default=True,
+)
+@click.option(
+    "--host",
+    default=DEFAULT_HOST,
+    type=str,
+    help="The host to bind the dashboard server to.",
+    show_default=True,
+)
+@click.option(
+    "--port",
+    default=DEFAULT_PORT,
+    type=click.IntRange(min=0, max=65535),
+    help="The port to bind the dashboard server to.",
+    show_default=True,
+)
 @click.argument("filename", type=click.Path(exists=True))
-def visualise_cli(filename, debug):
+def visualise_cli(
+    filename,
+    debug,
+    image_cache,
+    image_cache_size,
+    grid_page_size,
+    max_loaded_iterations,
+    export_path,
+    serve,
+    workers,
+    host,
+    port,
+):
+
+    configure_dataset_cache(max_loaded_iterations)
+
+    if os.path.isdir(filename):
+
+        # Each iteration is only loaded when it is first viewed.
+        analyzed_output = IterationStore.from_directory(filename)
+        prerendered_directory = None
+
+    else:
 
-    analyzed_output = AnalysedIteration.parse_file(filename)
+        analyzed_output = AnalysedIteration.parse_file(filename)
+        prerendered_directory = os.path.join(os.path.splitext(filename)[0], "images")
+
+    if image_cache is None:
+
+        image_cache = (
+            prerendered_directory
+            if prerendered_directory is not None
+            and os.path.isdir(prerendered_directory)
+            else DEFAULT_IMAGE_CACHE
+        )
+
+    configure_image_cache(image_cache, image_cache_size * 1024**2)
+
+    if export_path is not None:
+
+        dataset = (
+            get_dataset(analyzed_output.dataset_id(analyzed_output.iterations[-1]))
+            if isinstance(analyzed_output, IterationStore)
+            else register_dataset(analyzed_output)
+        )
+        export_report(dataset, export_path)
+
+        click.echo(f"Exported the dashboard to {export_path}")
+        return
 
     # Launch the dashboard.
-    DashboardApp.launch(analyzed_output, debug=debug)
+    if serve:
+
+        DashboardApp.serve(
+            analyzed_output,
+            workers=workers,
+            grid_page_size=grid_page_size,
+            host=host,
+            port=port,
+        )
+
+    else:
+
+        DashboardApp.launch(
+            analyzed_output,
+            debug=debug,
+            grid_page_size=grid_page_size,
+            host=host,
+            port=port,
+        )
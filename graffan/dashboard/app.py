@@ -1,23 +1,49 @@
 import base64
+import functools
 import logging
+import time
 import webbrowser
 from threading import Timer
+from typing import Any, Dict, Optional, Tuple, Union
+from urllib.parse import urlencode
 
 import dash
 import dash_bootstrap_components as dbc
 import dash_core_components as dcc
 import dash_html_components as html
-import pandas
-import plotly.express as px
+import dash_table
+import flask
+import numpy
 from dash.dependencies import Input, Output, State
 from dash.exceptions import PreventUpdate
 
+from graffan.dashboard.data import (
+    DashboardData,
+    IterationStore,
+    PlotPoints,
+    get_dataset,
+    get_iteration_store,
+    register_iteration_store,
+)
+from graffan.dashboard.figures import (
+    DENSITY_THRESHOLD,
+    build_heatmap_figure,
+    build_trajectory_figure,
+    cached_scatter_figure,
+)
+from graffan.dashboard.table import TABLE_COLUMNS, TableFilter, parse_filter_query
+from graffan.dashboard.telemetry import callback_telemetry
 from graffan.library.models.analysis import AnalysedIteration
-from graffan.utilities.rdkit import smiles_to_grid_svg, smiles_to_svg
+from graffan.utilities.rdkit import smiles_to_grid_svg, smiles_to_svg, svg_cache_key
 
 logger = logging.getLogger(__name__)
 
 INNER_STATE = "inner-state"
+SELECTION_INDEX = "selection-index"
+ITERATION_STATE = "iteration-state"
+HEATMAP_VIEW = "heatmap-view"
+
+ITERATION_SLIDER = "iteration-slider"
 
 TARGET_SELECT = "target-select"
 PARAMETER_SELECT = "parameter-select"
@@ -32,136 +58,402 @@ PARAMETER_ID_LABEL = "parameter-id-label"
 PARAMETER_SMIRKS_LABEL = "parameter-smirks-label"
 
 MAIN_PLOT = "plot-area"
-
-_app = dash.Dash(external_stylesheets=[dbc.themes.BOOTSTRAP])
+TRAJECTORY_PLOT = "trajectory-plot"
+HEATMAP_PLOT = "heatmap-plot"
+
+MOLECULE_IMAGE_ROUTE = "/molecule-images"
+
+GRID_IMAGE = "grid-image"
+GRID_PAGE_SELECT = "grid-page-select"
+GRID_PAGE_SIZE_STATE = "grid-page-size"
+GRID_PAGE_LABEL = "grid-page-label"
+
+DEFAULT_GRID_PAGE_SIZE = 20
+MAXIMUM_GRID_PAGE_SIZE = 100
+
+GRADIENT_TABLE = "gradient-table"
+TABLE_PAGE_SIZE = 25
+
+TELEMETRY_TOGGLE = "telemetry-toggle"
+TELEMETRY_COLLAPSE = "telemetry-collapse"
+TELEMETRY_INTERVAL = "telemetry-interval"
+TELEMETRY_TABLE = "telemetry-table"
+
+TELEMETRY_REFRESH_INTERVAL = 5000
+"""The interval (in ms) at which the telemetry panel is refreshed while open."""
+
+METRICS_ROUTE = "/metrics"
+
+# The current selections are retained where possible so that they are not lost when
+# moving between iterations.
+_SELECT_TARGET_OPTIONS = """
+function(selectionIndex, selectedTarget) {
+    const targetTypes = Object.keys(selectionIndex.targets);
+    const options = targetTypes.map(
+        targetType => ({label: targetType, value: targetType})
+    );
+    if (targetTypes.includes(selectedTarget)) {
+        return [options, selectedTarget];
+    }
+    return [options, targetTypes.length > 0 ? targetTypes[0] : null];
+}
+"""
+_SELECT_PARAMETER_OPTIONS = """
+function(selectedTarget, selectionIndex, selectedParameter) {
+    if (!selectedTarget || !(selectedTarget in selectionIndex.targets)) {
+        return [[], null];
+    }
+    const parameterIds = selectionIndex.targets[selectedTarget].parameters;
+    const options = parameterIds.map(
+        parameterId => ({label: parameterId, value: parameterId})
+    );
+    if (parameterIds.includes(selectedParameter)) {
+        return [options, selectedParameter];
+    }
+    return [options, options.length > 0 ? options[0].value : null];
+}
+"""
+_SELECT_ATTRIBUTE_OPTIONS = """
+function(selectedTarget, selectedParameter, selectionIndex, selectedX, selectedY) {
+    const target = selectedTarget ? selectionIndex.targets[selectedTarget] : null;
+    if (!target || !selectedParameter || !(selectedParameter in target.attributes)) {
+        return [[], [], null, null];
+    }
+    const attributes = target.attributes[selectedParameter];
+    const options = attributes.map(
+        attribute => ({label: attribute, value: attribute})
+    );
+    if (options.length === 0) {
+        return [[], [], null, null];
+    }
+    return [
+        options,
+        options,
+        attributes.includes(selectedX) ? selectedX : attributes[0],
+        attributes.includes(selectedY) ? selectedY : attributes[attributes.length - 1],
+    ];
+}
+"""
+_ON_PARAMETER_CHANGED = """
+function(selectedParameter, selectionIndex) {
+    if (!selectedParameter) {
+        return ["", ""];
+    }
+    const smirks = selectionIndex.smirks[selectedParameter];
+    return [selectedParameter, smirks === undefined ? "" : smirks];
+}
+"""
+# The telemetry panel is only refreshed while it is open.
+_TOGGLE_TELEMETRY = """
+function(nClicks, isOpen) {
+    const open = nClicks ? !isOpen : Boolean(isOpen);
+    return [open, !open];
+}
+"""
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8050
+
+
+def _callback(*dependencies, **kwargs):
+    """Marks a function as a dashboard callback with a given set of dependencies.
+    The function is registered with each app created by ``DashboardApp.create_app``
+    rather than with a single, module level app."""
+
+    def decorator(function):
+
+        function.callback_dependencies = dependencies
+        function.callback_kwargs = kwargs
+
+        return function
+
+    return decorator
 
 
 class DashboardApp:
+
+    # The select options are populated in the browser from a small index of the
+    # valid selections so that changing a selection does not need the server.
+    _clientside_callbacks = [
+        (
+            _SELECT_TARGET_OPTIONS,
+            (
+                Output(TARGET_SELECT, "options"),
+                Output(TARGET_SELECT, "value"),
+                Input(SELECTION_INDEX, "data"),
+                State(TARGET_SELECT, "value"),
+            ),
+        ),
+        (
+            _SELECT_PARAMETER_OPTIONS,
+            (
+                Output(PARAMETER_SELECT, "options"),
+                Output(PARAMETER_SELECT, "value"),
+                Input(TARGET_SELECT, "value"),
+                Input(SELECTION_INDEX, "data"),
+                State(PARAMETER_SELECT, "value"),
+            ),
+        ),
+        (
+            _SELECT_ATTRIBUTE_OPTIONS,
+            (
+                Output(X_ATTRIBUTE_SELECT, "options"),
+                Output(Y_ATTRIBUTE_SELECT, "options"),
+                Output(X_ATTRIBUTE_SELECT, "value"),
+                Output(Y_ATTRIBUTE_SELECT, "value"),
+                Input(TARGET_SELECT, "value"),
+                Input(PARAMETER_SELECT, "value"),
+                Input(SELECTION_INDEX, "data"),
+                State(X_ATTRIBUTE_SELECT, "value"),
+                State(Y_ATTRIBUTE_SELECT, "value"),
+            ),
+        ),
+        (
+            _ON_PARAMETER_CHANGED,
+            (
+                Output(PARAMETER_ID_LABEL, "children"),
+                Output(PARAMETER_SMIRKS_LABEL, "children"),
+                Input(PARAMETER_SELECT, "value"),
+                Input(SELECTION_INDEX, "data"),
+            ),
+        ),
+        (
+            _TOGGLE_TELEMETRY,
+            (
+                Output(TELEMETRY_COLLAPSE, "is_open"),
+                Output(TELEMETRY_INTERVAL, "disabled"),
+                Input(TELEMETRY_TOGGLE, "n_clicks"),
+                State(TELEMETRY_COLLAPSE, "is_open"),
+            ),
+        ),
+    ]
+
     @staticmethod
-    @_app.callback(
-        Output(PARAMETER_SELECT, "options"),
-        Output(PARAMETER_SELECT, "value"),
-        Input(TARGET_SELECT, "value"),
-        State(INNER_STATE, "data"),
+    @_callback(
+        Output(INNER_STATE, "data"),
+        Output(SELECTION_INDEX, "data"),
+        Input(ITERATION_SLIDER, "value"),
+        State(ITERATION_STATE, "data"),
+        prevent_initial_call=True,
     )
-    def _select_parameter_options(selected_target, inner_data_json):
+    def _on_iteration_changed(selected_iteration, iteration_store_id):
 
-        if selected_target is None or len(selected_target) == 0:
-            return [], None
+        if selected_iteration is None:
+            raise PreventUpdate
 
-        inner_data = AnalysedIteration.parse_raw(inner_data_json)
-        targets = {target.type: target for target in inner_data.targets}
+        iteration_store = get_iteration_store(iteration_store_id)
 
-        parameter_ids = [
-            {"label": parameter_id, "value": parameter_id}
-            for parameter_id in targets[selected_target].gradients
-        ]
+        # The iteration is loaded here if it is not already in the dataset cache.
+        dataset = get_dataset(iteration_store.dataset_id(selected_iteration))
 
-        return parameter_ids, parameter_ids[0]["value"]
+        return dataset.id, dataset.selection_index
 
     @staticmethod
-    @_app.callback(
-        Output(X_ATTRIBUTE_SELECT, "options"),
-        Output(Y_ATTRIBUTE_SELECT, "options"),
-        Output(X_ATTRIBUTE_SELECT, "value"),
-        Output(Y_ATTRIBUTE_SELECT, "value"),
-        Input(TARGET_SELECT, "value"),
+    def _point_smiles(
+        point: Dict[str, Any],
+        dataset: DashboardData,
+        selection: Tuple[str, str, str, str],
+    ) -> Optional[str]:
+        """Returns the molecule associated with a hovered or clicked point of the main
+        plot, or the molecule nearest to it if the point is a density bin."""
+
+        if "hovertext" in point:
+            return point["hovertext"]
+
+        if "z" not in point:
+            return None
+
+        plot_points = dataset.plot_points(*selection)
+
+        nearest_index = (
+            None
+            if plot_points is None
+            else plot_points.query_nearest(point["x"], point["y"])
+        )
+
+        return None if nearest_index is None else plot_points.smiles[nearest_index]
+
+    @staticmethod
+    @_callback(
+        Output(MOLECULE_IMAGE, "src"),
+        Output(MOLECULE_IMAGE_LABEL, "children"),
+        Input(MAIN_PLOT, "hoverData"),
+        Input(HEATMAP_PLOT, "clickData"),
         Input(PARAMETER_SELECT, "value"),
-        State(INNER_STATE, "data"),
+        Input(INNER_STATE, "data"),
+        State(TARGET_SELECT, "value"),
+        State(X_ATTRIBUTE_SELECT, "value"),
+        State(Y_ATTRIBUTE_SELECT, "value"),
+        State(HEATMAP_VIEW, "data"),
     )
-    def _select_attribute_options(selected_target, selected_parameter, inner_data_json):
+    def _hover_data_point(
+        hoverData,
+        heatmap_click_data,
+        selected_parameter,
+        dataset_id,
+        selected_target,
+        selected_x_attribute,
+        selected_y_attribute,
+        heatmap_view,
+    ):
 
-        if (
-            selected_target is None
-            or len(selected_target) == 0
-            or selected_parameter is None
-            or len(selected_parameter) == 0
-        ):
-            return [], [], None, None
+        triggered_ids = {
+            trigger["prop_id"] for trigger in dash.callback_context.triggered
+        }
 
-        inner_data = AnalysedIteration.parse_raw(inner_data_json)
-        targets = {target.type: target for target in inner_data.targets}
+        if f"{HEATMAP_PLOT}.clickData" in triggered_ids:
 
-        attributes = [
-            {"label": attribute, "value": attribute}
-            for attribute in targets[selected_target].gradients[selected_parameter]
-        ]
+            return DashboardApp._heatmap_data_point(
+                heatmap_click_data, heatmap_view, dataset_id
+            )
+
+        if hoverData is None or len(hoverData["points"]) == 0:
+            raise PreventUpdate
+
+        dataset = get_dataset(dataset_id)
 
-        return attributes, attributes, attributes[0]["value"], attributes[-1]["value"]
+        smiles = DashboardApp._point_smiles(
+            hoverData["points"][0],
+            dataset,
+            (
+                selected_target,
+                selected_parameter,
+                selected_x_attribute,
+                selected_y_attribute,
+            ),
+        )
+
+        if smiles is None:
+            raise PreventUpdate
+
+        return DashboardApp._molecule_image(dataset, smiles, selected_parameter)
 
     @staticmethod
-    @_app.callback(
-        Output(PARAMETER_ID_LABEL, "children"),
-        Output(PARAMETER_SMIRKS_LABEL, "children"),
-        Input(PARAMETER_SELECT, "value"),
-        State(INNER_STATE, "data"),
-    )
-    def _on_parameter_changed(selected_parameter, inner_data_json):
+    def _molecule_image(
+        dataset: DashboardData, smiles: str, parameter_id: Optional[str]
+    ) -> Tuple[str, str]:
+        """Returns the URL of the image of a molecule with the atoms matched by a
+        (optional) parameter highlighted, and the SMILES pattern to label it with."""
 
-        if selected_parameter is None or len(selected_parameter) == 0:
-            return "", ""
+        molecule_id = dataset.molecule_id(smiles)
 
-        inner_data = AnalysedIteration.parse_raw(inner_data_json)
+        if molecule_id is None:
+            raise PreventUpdate
 
-        parameter_smirks = [
-            parameter.smirks
-            for parameter in inner_data.refit_parameters
-            if parameter.id == selected_parameter
-        ][0]
+        image_url = f"{MOLECULE_IMAGE_ROUTE}/{dataset.id}/{molecule_id}.svg"
 
-        return selected_parameter, parameter_smirks
+        if parameter_id is not None and len(parameter_id) > 0:
+            image_url += f"?{urlencode({'parameter': parameter_id})}"
+
+        return image_url, dataset.display_smiles(molecule_id)
 
     @staticmethod
-    @_app.callback(
-        Output(MOLECULE_IMAGE, "src"),
-        Output(MOLECULE_IMAGE_LABEL, "children"),
-        Input(MAIN_PLOT, "hoverData"),
-        Input(PARAMETER_SELECT, "value"),
-        State(INNER_STATE, "data"),
-    )
-    def _hover_data_point(hoverData, selected_parameter, inner_data_json):
+    def _heatmap_data_point(
+        click_data: Optional[Dict[str, Any]],
+        heatmap_view: Optional[Dict[str, Any]],
+        dataset_id: str,
+    ) -> Tuple[str, str]:
+        """Returns the image and label of the molecule with the largest gradient in a
+        clicked (and possibly pooled) cell of the heatmap."""
+
+        if click_data is None or len(click_data["points"]) == 0 or heatmap_view is None:
+            raise PreventUpdate
 
-        from openforcefield.topology import Molecule
+        dataset = get_dataset(dataset_id)
+        matrix = dataset.gradient_matrix(heatmap_view["target"])
 
-        if hoverData is None or len(hoverData["points"]) == 0:
+        if matrix is None:
             raise PreventUpdate
 
-        if "hovertext" not in hoverData["points"][0]:
-            raise PreventUpdate
+        clicked_point = click_data["points"][0]
 
-        inner_data = AnalysedIteration.parse_raw(inner_data_json)
+        row_factor, column_factor = heatmap_view["factors"]
 
-        parameter_smirks = [
-            parameter.smirks
-            for parameter in inner_data.refit_parameters
-            if parameter.id == selected_parameter
-        ][0]
+        row = int(numpy.floor(clicked_point["y"] / row_factor))
+        column = int(numpy.floor(clicked_point["x"] / column_factor))
 
-        smiles = hoverData["points"][0]["hovertext"]
-        svg_content = smiles_to_svg(smiles, parameter_smirks)
+        entry = matrix.max_abs_entry(
+            (row * row_factor, (row + 1) * row_factor),
+            (column * column_factor, (column + 1) * column_factor),
+        )
 
-        encoded_image = base64.b64encode(svg_content.encode()).decode()
+        if entry is None:
+            raise PreventUpdate
 
-        smiles = Molecule.from_smiles(smiles, allow_undefined_stereo=True).to_smiles(
-            explicit_hydrogens=False
+        parameter_id, _ = matrix.row_labels[entry[0]]
+
+        return DashboardApp._molecule_image(
+            dataset, matrix.column_smiles[entry[1]], parameter_id
         )
-        return f"data:image/svg+xml;base64,{encoded_image}", smiles
 
     @staticmethod
-    @_app.callback(
+    def _serve_molecule_image(dataset_id: str, molecule_id: int) -> flask.Response:
+        """Serves the image of a molecule, with the atoms matched by the SMIRKS of the
+        (optional) ``parameter`` query argument highlighted.
+
+        The response for a given dataset, molecule and parameter never changes, and
+        so can be cached indefinitely by the browser."""
+
+        try:
+            dataset = get_dataset(dataset_id)
+        except KeyError:
+            flask.abort(404)
+
+        if molecule_id >= len(dataset.molecule_smiles):
+            flask.abort(404)
+
+        smiles = dataset.molecule_smiles[molecule_id]
+
+        parameter_id = flask.request.args.get("parameter")
+        parameter = dataset.parameters.get(parameter_id)
+
+        parameter_smirks = None if parameter is None else parameter.smirks
+
+        image_tag = svg_cache_key(smiles, parameter_smirks)
+
+        if flask.request.if_none_match.contains(image_tag):
+            response = flask.Response(status=304)
+        else:
+
+            parameter_matches = dataset.analysed_iteration.parameter_matches.get(
+                parameter_id, {}
+            )
+            highlight_matches = (
+                None
+                if smiles not in parameter_matches
+                else tuple(tuple(match) for match in parameter_matches[smiles])
+            )
+
+            response = flask.Response(
+                smiles_to_svg(smiles, parameter_smirks, highlight_matches),
+                mimetype="image/svg+xml",
+            )
+
+        response.set_etag(image_tag)
+
+        response.cache_control.public = True
+        response.cache_control.max_age = 365 * 24 * 60 * 60
+        response.cache_control.immutable = True
+
+        return response
+
+    @staticmethod
+    @_callback(
         Output(MAIN_PLOT, "figure"),
         Input(TARGET_SELECT, "value"),
         Input(PARAMETER_SELECT, "value"),
         Input(X_ATTRIBUTE_SELECT, "value"),
         Input(Y_ATTRIBUTE_SELECT, "value"),
-        State(INNER_STATE, "data"),
+        Input(MAIN_PLOT, "relayoutData"),
+        Input(INNER_STATE, "data"),
     )
     def _build_plot(
         selected_target,
         selected_parameter,
         selected_x_attribute,
         selected_y_attribute,
-        inner_data_json,
+        relayout_data,
+        dataset_id,
     ):
 
         if (
@@ -176,162 +468,559 @@ class DashboardApp:
         ):
             return {}
 
-        inner_data = AnalysedIteration.parse_raw(inner_data_json)
-        targets = {target.type: target for target in inner_data.targets}
+        dataset = get_dataset(dataset_id)
 
-        target = targets[selected_target]
+        triggered_ids = {
+            trigger["prop_id"] for trigger in dash.callback_context.triggered
+        }
 
-        if selected_parameter not in target.gradients:
-            return {}
+        x_range, y_range = None, None
 
-        parameter_gradients = target.gradients[selected_parameter]
+        if f"{MAIN_PLOT}.relayoutData" in triggered_ids:
 
-        if (
-            selected_x_attribute not in parameter_gradients
-            or selected_y_attribute not in parameter_gradients
-        ):
-            return {}
+            plot_points = dataset.plot_points(
+                selected_target,
+                selected_parameter,
+                selected_x_attribute,
+                selected_y_attribute,
+            )
 
-        x = []
-        y = []
+            # Zooming only needs to re-build the plot when the points are shown as a
+            # density, as the individual points should be shown once zoomed in far
+            # enough.
+            if plot_points is None or len(plot_points.x) <= DENSITY_THRESHOLD:
+                raise PreventUpdate
 
-        labels = []
+            x_range, y_range = DashboardApp._zoomed_ranges(relayout_data)
 
-        for smiles in parameter_gradients[selected_x_attribute]:
+        figure = cached_scatter_figure(
+            dataset,
+            selected_target,
+            selected_parameter,
+            selected_x_attribute,
+            selected_y_attribute,
+            x_range,
+            y_range,
+        )
 
-            if smiles not in parameter_gradients[selected_y_attribute]:
-                continue
+        return {} if figure is None else figure
+
+    @staticmethod
+    @_callback(
+        Output(HEATMAP_PLOT, "figure"),
+        Output(HEATMAP_VIEW, "data"),
+        Input(TARGET_SELECT, "value"),
+        Input(HEATMAP_PLOT, "relayoutData"),
+        Input(INNER_STATE, "data"),
+    )
+    def _build_heatmap(selected_target, relayout_data, dataset_id):
 
-            x.append(parameter_gradients[selected_x_attribute][smiles])
-            y.append(parameter_gradients[selected_y_attribute][smiles])
+        if selected_target is None or len(selected_target) == 0:
+            return {}, None
+
+        triggered_ids = {
+            trigger["prop_id"] for trigger in dash.callback_context.triggered
+        }
+
+        # Only the region of the heatmap in view is sent to the browser, so it must be
+        # re-built whenever it is zoomed or panned.
+        x_range, y_range = (
+            DashboardApp._zoomed_ranges(relayout_data)
+            if f"{HEATMAP_PLOT}.relayoutData" in triggered_ids
+            else (None, None)
+        )
 
-            labels.append(smiles)
+        heatmap = build_heatmap_figure(
+            get_dataset(dataset_id), selected_target, x_range, y_range
+        )
 
-        x_label = f"d<X2> / d {selected_x_attribute}"
-        y_label = f"d<X2> / d {selected_y_attribute}"
+        if heatmap is None:
+            return {}, None
 
-        plot_data = pandas.DataFrame({x_label: x, y_label: y, "labels": labels})
+        figure, factors = heatmap
 
-        figure = px.scatter(
-            plot_data,
-            x=x_label,
-            y=y_label,
-            hover_name="labels",
-            marginal_x="histogram",
-            marginal_y="histogram",
+        return figure, {"target": selected_target, "factors": factors}
+
+    @staticmethod
+    def _zoomed_ranges(
+        relayout_data: Optional[Dict[str, Any]],
+    ) -> Tuple[Optional[Tuple[float, float]], Optional[Tuple[float, float]]]:
+        """Returns the x- and y-ranges which a plot is zoomed to, or ``None`` for each
+        axis which is not zoomed."""
+
+        relayout_data = {} if relayout_data is None else relayout_data
+
+        x_range = (
+            None
+            if "xaxis.range[0]" not in relayout_data
+            else (relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"])
+        )
+        y_range = (
+            None
+            if "yaxis.range[0]" not in relayout_data
+            else (relayout_data["yaxis.range[0]"], relayout_data["yaxis.range[1]"])
         )
-        figure.update_traces(hoverinfo="none", hovertemplate=None)
-        figure.update_layout(hovermode="closest")
 
-        return figure
+        return x_range, y_range
 
     @staticmethod
-    @_app.callback(
-        Output("generic-output", "src"),
+    def _query_region(
+        plot_points: PlotPoints,
+        relayout_data: Optional[Dict[str, Any]],
+        selected_data: Optional[Dict[str, Any]],
+    ) -> Optional[numpy.ndarray]:
+        """Returns the indices of the points in the currently selected (lasso or box)
+        region of the main plot, or if there is no selection, in the zoomed region."""
+
+        if selected_data is not None and "lassoPoints" in selected_data:
+
+            lasso_points = selected_data["lassoPoints"]
+            return plot_points.query_lasso(lasso_points["x"], lasso_points["y"])
+
+        if selected_data is not None and "range" in selected_data:
+
+            selected_range = selected_data["range"]
+
+            return plot_points.query_box(
+                selected_range.get("x", (-numpy.inf, numpy.inf)),
+                selected_range.get("y", (-numpy.inf, numpy.inf)),
+            )
+
+        x_range, y_range = DashboardApp._zoomed_ranges(relayout_data)
+
+        if x_range is None and y_range is None:
+            return None
+
+        return plot_points.query_box(
+            (-numpy.inf, numpy.inf) if x_range is None else x_range,
+            (-numpy.inf, numpy.inf) if y_range is None else y_range,
+        )
+
+    @staticmethod
+    @_callback(
+        Output(GRID_IMAGE, "src"),
+        Output(GRID_PAGE_SELECT, "value"),
+        Output(GRID_PAGE_SELECT, "max"),
+        Output(GRID_PAGE_LABEL, "children"),
         Input(MAIN_PLOT, "relayoutData"),
+        Input(MAIN_PLOT, "selectedData"),
         Input(TARGET_SELECT, "value"),
         Input(PARAMETER_SELECT, "value"),
         Input(X_ATTRIBUTE_SELECT, "value"),
         Input(Y_ATTRIBUTE_SELECT, "value"),
-        State(INNER_STATE, "data"),
+        Input(GRID_PAGE_SELECT, "value"),
+        Input(INNER_STATE, "data"),
+        State(GRID_PAGE_SIZE_STATE, "data"),
     )
     def on_plot_zoomed(
         relayout_data,
+        selected_data,
         selected_target,
         selected_parameter,
         selected_x_attribute,
         selected_y_attribute,
-        inner_data_json,
+        selected_page,
+        dataset_id,
+        page_size,
     ):
 
-        if relayout_data is None:
-            return ""
+        empty_output = "", 1, 1, ""
 
         if (
-            "xaxis.range[0]" not in relayout_data
-            and "yaxis.range[0]" not in relayout_data
+            selected_target is None
+            or len(selected_target) == 0
+            or selected_parameter is None
+            or len(selected_parameter) == 0
+            or selected_x_attribute is None
+            or len(selected_x_attribute) == 0
+            or selected_y_attribute is None
+            or len(selected_y_attribute) == 0
         ):
-            return ""
+            return empty_output
+
+        plot_points = get_dataset(dataset_id).plot_points(
+            selected_target,
+            selected_parameter,
+            selected_x_attribute,
+            selected_y_attribute,
+        )
+
+        if plot_points is None:
+            return empty_output
+
+        indices = DashboardApp._query_region(plot_points, relayout_data, selected_data)
+
+        if indices is None:
+            return empty_output
+
+        if len(indices) == 0:
+            return empty_output
+
+        page_size = min(max(int(page_size), 1), MAXIMUM_GRID_PAGE_SIZE)
+        n_pages = (len(indices) + page_size - 1) // page_size
+
+        # Return to the first page whenever the region or plot selection changes.
+        triggered_ids = {
+            trigger["prop_id"] for trigger in dash.callback_context.triggered
+        }
+
+        page = (
+            1
+            if selected_page is None or f"{GRID_PAGE_SELECT}.value" not in triggered_ids
+            else min(max(int(selected_page), 1), n_pages)
+        )
+
+        page_indices = indices[(page - 1) * page_size : page * page_size]
+
+        svg_content = smiles_to_grid_svg(
+            [plot_points.smiles[index] for index in page_indices]
+        )
+        encoded_image = base64.b64encode(svg_content.encode()).decode()
+
+        return (
+            f"data:image/svg+xml;base64,{encoded_image}",
+            page,
+            n_pages,
+            f"of {n_pages} ({len(indices)} molecules)",
+        )
+
+    @staticmethod
+    @_callback(
+        Output(GRADIENT_TABLE, "data"),
+        Output(GRADIENT_TABLE, "page_current"),
+        Output(GRADIENT_TABLE, "page_count"),
+        Input(GRADIENT_TABLE, "page_current"),
+        Input(GRADIENT_TABLE, "sort_by"),
+        Input(GRADIENT_TABLE, "filter_query"),
+        Input(TARGET_SELECT, "value"),
+        Input(PARAMETER_SELECT, "value"),
+        Input(INNER_STATE, "data"),
+    )
+    def _query_gradient_table(
+        page_current,
+        sort_by,
+        filter_query,
+        selected_target,
+        selected_parameter,
+        dataset_id,
+    ):
+
+        empty_output = [], 0, 1
 
         if (
             selected_target is None
             or len(selected_target) == 0
             or selected_parameter is None
             or len(selected_parameter) == 0
+        ):
+            return empty_output
+
+        gradient_table = get_dataset(dataset_id).gradient_table(selected_target)
+
+        if gradient_table is None:
+            return empty_output
+
+        filters = [
+            TableFilter(column="parameter", operator="=", value=selected_parameter),
+            *parse_filter_query(filter_query),
+        ]
+
+        sort_column, descending = None, False
+
+        if sort_by is not None and len(sort_by) > 0:
+            sort_column = sort_by[0]["column_id"]
+            descending = sort_by[0]["direction"] == "desc"
+
+        # Return to the first page whenever the rows in the table change.
+        triggered_ids = {
+            trigger["prop_id"] for trigger in dash.callback_context.triggered
+        }
+
+        page = (
+            0
+            if page_current is None
+            or f"{GRADIENT_TABLE}.page_current" not in triggered_ids
+            else max(int(page_current), 0)
+        )
+
+        rows, n_rows = gradient_table.query(
+            filters, sort_column, descending, page, TABLE_PAGE_SIZE
+        )
+        n_pages = max((n_rows + TABLE_PAGE_SIZE - 1) // TABLE_PAGE_SIZE, 1)
+
+        if page >= n_pages:
+
+            page = n_pages - 1
+            rows, _ = gradient_table.query(
+                filters, sort_column, descending, page, TABLE_PAGE_SIZE
+            )
+
+        return rows, page, n_pages
+
+    @staticmethod
+    @_callback(
+        Output(TRAJECTORY_PLOT, "figure"),
+        Input(MAIN_PLOT, "clickData"),
+        Input(TARGET_SELECT, "value"),
+        Input(PARAMETER_SELECT, "value"),
+        Input(X_ATTRIBUTE_SELECT, "value"),
+        Input(Y_ATTRIBUTE_SELECT, "value"),
+        State(INNER_STATE, "data"),
+        State(ITERATION_STATE, "data"),
+    )
+    def _build_trajectory_plot(
+        click_data,
+        selected_target,
+        selected_parameter,
+        selected_x_attribute,
+        selected_y_attribute,
+        dataset_id,
+        iteration_store_id,
+    ):
+
+        if (
+            click_data is None
+            or len(click_data["points"]) == 0
+            or selected_target is None
+            or len(selected_target) == 0
+            or selected_parameter is None
+            or len(selected_parameter) == 0
             or selected_x_attribute is None
             or len(selected_x_attribute) == 0
             or selected_y_attribute is None
             or len(selected_y_attribute) == 0
         ):
-            return ""
+            return {}
 
-        inner_data = AnalysedIteration.parse_raw(inner_data_json)
-        targets = {target.type: target for target in inner_data.targets}
+        dataset = get_dataset(dataset_id)
 
-        target = targets[selected_target]
+        smiles = DashboardApp._point_smiles(
+            click_data["points"][0],
+            dataset,
+            (
+                selected_target,
+                selected_parameter,
+                selected_x_attribute,
+                selected_y_attribute,
+            ),
+        )
 
-        if selected_parameter not in target.gradients:
-            return ""
+        if smiles is None:
+            return {}
 
-        parameter_gradients = target.gradients[selected_parameter]
+        iteration_store = get_iteration_store(iteration_store_id)
 
-        if (
-            selected_x_attribute not in parameter_gradients
-            or selected_y_attribute not in parameter_gradients
-        ):
-            return ""
+        trajectories = {}
 
-        x_range = (
-            (-1e10, 1e10)
-            if "xaxis.range[0]" not in relayout_data
-            else (relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"])
+        for attribute in dict.fromkeys([selected_x_attribute, selected_y_attribute]):
+
+            iterations, trajectories[f"d<X2> / d {attribute}"] = (
+                iteration_store.trajectory(
+                    selected_target, selected_parameter, attribute, smiles
+                )
+            )
+
+        molecule_id = dataset.molecule_id(smiles)
+
+        return build_trajectory_figure(
+            iterations,
+            trajectories,
+            smiles if molecule_id is None else dataset.display_smiles(molecule_id),
         )
-        y_range = (
-            (-1e10, 1e10)
-            if "yaxis.range[0]" not in relayout_data
-            else (relayout_data["yaxis.range[0]"], relayout_data["yaxis.range[1]"])
+
+    @staticmethod
+    def _build_zoom_grid(grid_page_size: int):
+
+        return [
+            dcc.Store(GRID_PAGE_SIZE_STATE, data=grid_page_size),
+            dbc.Row(
+                [
+                    dbc.Col(dbc.Label("Molecules in region - page"), width="auto"),
+                    dbc.Col(
+                        dbc.Input(
+                            id=GRID_PAGE_SELECT, type="number", min=1, max=1, value=1
+                        ),
+                        width=2,
+                    ),
+                    dbc.Col(html.Span(id=GRID_PAGE_LABEL), width="auto"),
+                ]
+            ),
+            dbc.Row([html.Img(id=GRID_IMAGE)]),
+        ]
+
+    @staticmethod
+    def _start_request_timer():
+        flask.g.request_start_time = time.perf_counter()
+
+    @staticmethod
+    def _record_request(
+        callback_names: Dict[str, str], response: flask.Response
+    ) -> flask.Response:
+        """Records the latency and payload size of a response to a callback."""
+
+        start_time = getattr(flask.g, "request_start_time", None)
+
+        if start_time is None or not flask.request.path.endswith(
+            "_dash-update-component"
+        ):
+            return response
+
+        request_body = flask.request.get_json(silent=True) or {}
+        output = request_body.get("output")
+
+        callback_telemetry.record(
+            callback_names.get(output, output),
+            time.perf_counter() - start_time,
+            response.calculate_content_length() or 0,
         )
 
-        smiles_list = []
+        return response
 
-        for smiles in parameter_gradients[selected_x_attribute]:
+    @staticmethod
+    def _serve_metrics() -> flask.Response:
+        """Serves the callback telemetry in the Prometheus text exposition format."""
 
-            if smiles not in parameter_gradients[selected_y_attribute]:
-                continue
+        return flask.Response(
+            callback_telemetry.to_prometheus(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
 
-            x = parameter_gradients[selected_x_attribute][smiles]
-            y = parameter_gradients[selected_y_attribute][smiles]
+    @staticmethod
+    @_callback(
+        Output(TELEMETRY_TABLE, "children"),
+        Input(TELEMETRY_INTERVAL, "n_intervals"),
+        Input(TELEMETRY_COLLAPSE, "is_open"),
+    )
+    def _update_telemetry_panel(n_intervals, is_open):
 
-            if x < x_range[0] or x > x_range[1]:
-                continue
-            if y < y_range[0] or y > y_range[1]:
-                continue
+        if not is_open:
+            raise PreventUpdate
 
-            smiles_list.append(smiles)
+        header = html.Thead(
+            html.Tr(
+                [
+                    html.Th(column)
+                    for column in [
+                        "Callback",
+                        "Calls",
+                        "Latency p50 / p95 / p99 (ms)",
+                        "Payload p50 / p95 / p99 (kB)",
+                    ]
+                ]
+            )
+        )
 
-        svg_content = smiles_to_grid_svg(smiles_list)
-        encoded_image = base64.b64encode(svg_content.encode()).decode()
+        rows = [
+            html.Tr(
+                [
+                    html.Td(summary["callback"]),
+                    html.Td(summary["count"]),
+                    html.Td(
+                        " / ".join(
+                            f"{summary[f'duration_p{q}'] * 1000.0:.1f}"
+                            for q in (50, 95, 99)
+                        )
+                    ),
+                    html.Td(
+                        " / ".join(
+                            f"{summary[f'payload_p{q}'] / 1024.0:.1f}"
+                            for q in (50, 95, 99)
+                        )
+                    ),
+                ]
+            )
+            for summary in callback_telemetry.summary()
+        ]
+
+        return [header, html.Tbody(rows)]
+
+    @staticmethod
+    def _build_telemetry_panel():
 
-        return f"data:image/svg+xml;base64,{encoded_image}"
+        return [
+            dbc.Button(
+                "Callback telemetry", id=TELEMETRY_TOGGLE, color="link", size="sm"
+            ),
+            dbc.Collapse(
+                [
+                    html.P(
+                        f"Callback latencies and payload sizes measured by this "
+                        f"server process. These are also available in the "
+                        f"Prometheus text format at {METRICS_ROUTE}."
+                    ),
+                    dbc.Table(id=TELEMETRY_TABLE, size="sm", striped=True),
+                ],
+                id=TELEMETRY_COLLAPSE,
+                is_open=False,
+            ),
+            dcc.Interval(
+                id=TELEMETRY_INTERVAL,
+                interval=TELEMETRY_REFRESH_INTERVAL,
+                disabled=True,
+            ),
+        ]
 
     @staticmethod
-    def _build_select_target(analyzed_output: AnalysedIteration):
+    def _build_gradient_table():
+
+        # Rows are paged, sorted and filtered on the server so that only the rows
+        # currently in view are sent to the browser.
+        return dash_table.DataTable(
+            id=GRADIENT_TABLE,
+            columns=[
+                {
+                    "id": column_id,
+                    "name": column_name,
+                    "type": "numeric" if column_id == "gradient" else "text",
+                }
+                for column_id, column_name in TABLE_COLUMNS.items()
+            ],
+            data=[],
+            page_current=0,
+            page_size=TABLE_PAGE_SIZE,
+            page_count=1,
+            page_action="custom",
+            sort_action="custom",
+            sort_mode="single",
+            sort_by=[],
+            filter_action="custom",
+            filter_query="",
+        )
 
-        target_types = [target.type for target in analyzed_output.targets]
+    @staticmethod
+    def _build_select_target():
 
         return dbc.Col(
             [
                 dbc.Label("Target type"),
                 dbc.Select(
                     id=TARGET_SELECT,
-                    options=[
-                        {"label": target_type, "value": target_type}
-                        for target_type in target_types
-                    ],
+                    options=[],
                 ),
             ]
         )
 
+    @staticmethod
+    def _build_select_iteration(iteration_store: IterationStore):
+
+        iterations = iteration_store.iterations
+
+        return dbc.Row(
+            dbc.Col(
+                [
+                    dbc.Label("Iteration"),
+                    dcc.Slider(
+                        id=ITERATION_SLIDER,
+                        min=iterations[0],
+                        max=iterations[-1],
+                        step=None,
+                        value=iterations[-1],
+                        marks={iteration: str(iteration) for iteration in iterations},
+                    ),
+                ]
+            )
+        )
+
     @staticmethod
     def _build_select_parameter():
 
@@ -370,15 +1059,26 @@ class DashboardApp:
         ]
 
     @classmethod
-    def _build_layout(cls, analyzed_output: AnalysedIteration):
+    def _build_layout(cls, iteration_store: IterationStore, grid_page_size: int):
+
+        # Only the latest iteration is loaded up front.
+        dataset = get_dataset(
+            iteration_store.dataset_id(iteration_store.iterations[-1])
+        )
 
-        _app.layout = dbc.Container(
+        return dbc.Container(
             children=[
                 html.H1(children="Visualise Target Gradients"),
-                dcc.Store(INNER_STATE, data=analyzed_output.json()),
+                dcc.Store(INNER_STATE, data=dataset.id),
+                dcc.Store(SELECTION_INDEX, data=dataset.selection_index),
+                dcc.Store(
+                    ITERATION_STATE, data=register_iteration_store(iteration_store)
+                ),
+                cls._build_select_iteration(iteration_store),
+                html.Br(),
                 dbc.Row(
                     [
-                        cls._build_select_target(analyzed_output),
+                        cls._build_select_target(),
                         cls._build_select_parameter(),
                     ]
                 ),
@@ -403,16 +1103,138 @@ class DashboardApp:
                     ]
                 ),
                 html.Br(),
-                dbc.Row([html.Img(id="generic-output")]),
+                *cls._build_zoom_grid(grid_page_size),
+                html.Br(),
+                dbc.Row(dbc.Col(dcc.Graph(id=TRAJECTORY_PLOT))),
+                html.Br(),
+                dcc.Store(HEATMAP_VIEW),
+                dbc.Row(dbc.Col(dcc.Graph(id=HEATMAP_PLOT))),
+                html.Br(),
+                dbc.Row(dbc.Col(cls._build_gradient_table())),
+                html.Br(),
+                *cls._build_telemetry_panel(),
             ]
         )
 
     @classmethod
-    def launch(cls, analyzed_output: AnalysedIteration, debug: bool = False):
+    def create_app(
+        cls,
+        analyzed_output: Union[AnalysedIteration, IterationStore],
+        grid_page_size: int = DEFAULT_GRID_PAGE_SIZE,
+    ) -> dash.Dash:
+        """Creates a new dashboard app which visualises an analysed iteration, or a
+        collection of analysed iterations.
+
+        Parameters
+        ----------
+        analyzed_output
+            The analysed iteration(s) to visualise.
+        grid_page_size
+            The number of molecules to show per page of the region grid.
+
+        Returns
+        -------
+            The dash app.
+        """
+
+        app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+        app.layout = cls._build_layout(
+            (
+                analyzed_output
+                if isinstance(analyzed_output, IterationStore)
+                else IterationStore.from_iteration(analyzed_output)
+            ),
+            min(max(grid_page_size, 1), MAXIMUM_GRID_PAGE_SIZE),
+        )
+
+        # The name of the callback associated with each set of outputs.
+        callback_names = {}
+
+        for attribute_name in dir(cls):
 
-        cls._build_layout(analyzed_output)
+            function = getattr(cls, attribute_name)
+
+            if not hasattr(function, "callback_dependencies"):
+                continue
+
+            registered_outputs = {*app.callback_map}
+
+            app.callback(*function.callback_dependencies, **function.callback_kwargs)(
+                function
+            )
+
+            callback_names.update(
+                {
+                    output: function.__name__.lstrip("_")
+                    for output in app.callback_map
+                    if output not in registered_outputs
+                }
+            )
+
+        for function, dependencies in cls._clientside_callbacks:
+            app.clientside_callback(function, *dependencies)
+
+        app.server.add_url_rule(
+            f"{MOLECULE_IMAGE_ROUTE}/<dataset_id>/<int:molecule_id>.svg",
+            view_func=cls._serve_molecule_image,
+        )
+        app.server.add_url_rule(METRICS_ROUTE, view_func=cls._serve_metrics)
+
+        app.server.before_request(cls._start_request_timer)
+        app.server.after_request(functools.partial(cls._record_request, callback_names))
+
+        return app
+
+    @classmethod
+    def launch(
+        cls,
+        analyzed_output: Union[AnalysedIteration, IterationStore],
+        debug: bool = False,
+        grid_page_size: int = DEFAULT_GRID_PAGE_SIZE,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+    ):
+        """Launches the dashboard using the (single threaded) development server."""
+
+        app = cls.create_app(analyzed_output, grid_page_size)
 
         if not debug:
-            Timer(1, lambda: webbrowser.open_new("http://localhost:8050")).start()
+            Timer(1, lambda: webbrowser.open_new(f"http://{host}:{port}")).start()
+
+        app.run_server(debug=debug, host=host, port=port)
 
-        _app.run_server(debug=debug)
+    @classmethod
+    def serve(
+        cls,
+        analyzed_output: Union[AnalysedIteration, IterationStore],
+        workers: int = 1,
+        grid_page_size: int = DEFAULT_GRID_PAGE_SIZE,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+    ):
+        """Serves the dashboard using a production WSGI server with multiple worker
+        processes.
+
+        The app is created once before the workers are forked so that the analysed
+        iteration and any data derived from it are shared between the workers, each of
+        which then maintains its own in-memory caches on top of the shared on-disk
+        image cache.
+
+        Parameters
+        ----------
+        analyzed_output
+            The analysed iteration(s) to visualise.
+        workers
+            The number of worker processes to spawn.
+        grid_page_size
+            The number of molecules to show per page of the region grid.
+        host
+            The host to bind the server to.
+        port
+            The port to bind the server to.
+        """
+
+        from graffan.dashboard.server import run_wsgi_server
+
+        app = cls.create_app(analyzed_output, grid_page_size)
+        run_wsgi_server(app.server, host, port, workers)
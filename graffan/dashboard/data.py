@@ -0,0 +1,634 @@
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy
+
+from graffan.dashboard.heatmap import (
+    MAX_CACHED_HEATMAP_TILES,
+    GradientMatrix,
+    build_gradient_matrix,
+)
+from graffan.dashboard.spatial import GridIndex, build_grid_index
+from graffan.dashboard.table import (
+    GradientTable,
+    build_gradient_table,
+    combine_gradient_tables,
+    gradient_dictionary,
+)
+from graffan.library.analysis.trajectories import (
+    extract_raw_gradient,
+    find_iteration_files,
+    raw_gradient_directory,
+)
+from graffan.library.models.analysis import (
+    AnalysedIteration,
+    AnalysedTarget,
+    GradientDictionary,
+)
+from graffan.library.models.smirnoff import SMIRNOFFParameter
+from graffan.utilities.cache import LRUCache
+from graffan.utilities.rdkit import smiles_to_display_smiles
+
+SUMMED_TARGET_TYPE = "all"
+"""The pseudo target type whose gradients are the sum of the gradients of each
+target type."""
+WEIGHTED_TARGET_TYPE = "all (weighted)"
+"""The pseudo target type whose gradients are the sum of the gradients of each
+target type, each multiplied by the ``weight`` of the targets they were computed
+from."""
+
+COMBINED_TARGET_TYPES = (SUMMED_TARGET_TYPE, WEIGHTED_TARGET_TYPE)
+
+
+class PlotPoints(NamedTuple):
+    """The points shown on the main dashboard plot for a particular selection of
+    target type, parameter and x- and y-attributes."""
+
+    smiles: List[str]
+    """The molecule associated with each point."""
+
+    x: numpy.ndarray
+    """The gradient w.r.t. the x-attribute of each point."""
+    y: numpy.ndarray
+    """The gradient w.r.t. the y-attribute of each point."""
+
+    index: GridIndex
+    """A spatial index over the points."""
+
+    def query_box(
+        self, x_range: Tuple[float, float], y_range: Tuple[float, float]
+    ) -> numpy.ndarray:
+        """Returns the (sorted) indices of the points which lie within a box. See
+        ``GridIndex.query_box`` for details."""
+        return self.index.query_box(x_range, y_range)
+
+    def query_lasso(
+        self, polygon_x: List[float], polygon_y: List[float]
+    ) -> numpy.ndarray:
+        """Returns the (sorted) indices of the points which lie within a (lasso)
+        polygon. See ``GridIndex.query_lasso`` for details."""
+        return self.index.query_lasso(polygon_x, polygon_y)
+
+    def query_nearest(self, x: float, y: float) -> Optional[int]:
+        """Returns the index of the point nearest to a given position. See
+        ``GridIndex.query_nearest`` for details."""
+        return self.index.query_nearest(x, y)
+
+
+class DashboardData:
+    """A wrapper around an analysed iteration which stores any data structures which
+    are derived from it by the dashboard so that they only need to be computed
+    once."""
+
+    @property
+    def id(self) -> str:
+        """A unique identifier for the wrapped data."""
+        return self._id
+
+    @property
+    def analysed_iteration(self) -> AnalysedIteration:
+        """The wrapped analysed iteration."""
+        return self._analysed_iteration
+
+    @property
+    def targets(self) -> Dict[str, AnalysedTarget]:
+        """The analysed targets indexed by their type."""
+        return self._targets
+
+    @property
+    def parameters(self) -> Dict[str, SMIRNOFFParameter]:
+        """The refit parameters indexed by their id. Where a parameter has more than
+        one refit attribute, the first of its entries is stored."""
+        return self._parameters
+
+    @property
+    def selection_index(self) -> Dict[str, Any]:
+        """A small, JSON serializable index of the valid selections which is shipped
+        to the browser once so that the select options can be populated client side.
+
+        The index has the form ``{"targets": {target_type: {"parameters": [id, ...],
+        "attributes": {id: [attribute, ...]}}}, "smirks": {id: smirks}}``. Lists are
+        used where the order matters as the order of the keys of a JSON object is not
+        guaranteed to be preserved in the browser.
+        """
+        return self._selection_index
+
+    @property
+    def molecule_smiles(self) -> List[str]:
+        """The unique molecules in the dataset, whose position in this list is used
+        as their id."""
+        return self._molecule_smiles
+
+    def molecule_id(self, smiles: str) -> Optional[int]:
+        """Returns the id of a molecule, or ``None`` if it is not in the dataset."""
+        return self._molecule_ids.get(smiles)
+
+    def display_smiles(self, molecule_id: int) -> str:
+        """Returns the canonical, implicit hydrogen SMILES pattern to display for a
+        molecule. Each pattern is computed at most once per dataset."""
+
+        if molecule_id not in self._display_smiles:
+
+            self._display_smiles[molecule_id] = smiles_to_display_smiles(
+                self._molecule_smiles[molecule_id]
+            )
+
+        return self._display_smiles[molecule_id]
+
+    def __init__(
+        self,
+        analysed_iteration: AnalysedIteration,
+        max_cached_plots=64,
+        dataset_id: Optional[str] = None,
+    ):
+        """
+
+        Parameters
+        ----------
+        analysed_iteration
+            The analysed iteration to wrap.
+        max_cached_plots
+            The maximum number of sets of plot points to retain.
+        dataset_id
+            The id to associate with the data. By default, a hash of the analysed
+            iteration will be used.
+        """
+
+        self._analysed_iteration = analysed_iteration
+        self._id = (
+            dataset_id
+            if dataset_id is not None
+            else hashlib.sha1(analysed_iteration.json().encode()).hexdigest()
+        )
+
+        self._plot_points = LRUCache(max_cached_plots)
+
+        self._targets = {target.type: target for target in analysed_iteration.targets}
+        self._parameters: Dict[str, SMIRNOFFParameter] = {}
+
+        for parameter in analysed_iteration.refit_parameters:
+            self._parameters.setdefault(parameter.id, parameter)
+
+        target_selections = {
+            target_type: {
+                "parameters": [*target.gradients],
+                "attributes": {
+                    parameter_id: [*attribute_gradients]
+                    for parameter_id, attribute_gradients in target.gradients.items()
+                },
+            }
+            for target_type, target in self._targets.items()
+        }
+
+        if len(self._targets) > 1:
+
+            # The combined views can select the union of the parameter attributes
+            # of each target type.
+            combined_attributes: Dict[str, Dict[str, None]] = {}
+
+            for target_selection in [*target_selections.values()]:
+                for parameter_id in target_selection["parameters"]:
+                    combined_attributes.setdefault(parameter_id, {}).update(
+                        dict.fromkeys(target_selection["attributes"][parameter_id])
+                    )
+
+            for target_type in COMBINED_TARGET_TYPES:
+
+                target_selections[target_type] = {
+                    "parameters": [*combined_attributes],
+                    "attributes": {
+                        parameter_id: [*attributes]
+                        for parameter_id, attributes in combined_attributes.items()
+                    },
+                }
+
+        self._selection_index = {
+            "targets": target_selections,
+            "smirks": {
+                parameter_id: parameter.smirks
+                for parameter_id, parameter in self._parameters.items()
+            },
+        }
+
+        self._molecule_ids: Dict[str, int] = {}
+
+        for target in self._targets.values():
+            for attribute_gradients in target.gradients.values():
+                for molecule_gradients in attribute_gradients.values():
+                    for smiles in molecule_gradients:
+                        self._molecule_ids.setdefault(smiles, len(self._molecule_ids))
+
+        self._molecule_smiles = [*self._molecule_ids]
+        self._display_smiles: Dict[int, str] = {}
+
+        self._gradient_tables: Dict[str, GradientTable] = {}
+        self._combined_gradients: Dict[str, GradientDictionary] = {}
+
+        self._gradient_matrices: Dict[str, GradientMatrix] = {}
+        self._heatmap_tiles = LRUCache(MAX_CACHED_HEATMAP_TILES)
+
+    def _build_plot_points(
+        self,
+        target_type: str,
+        parameter_id: str,
+        x_attribute: str,
+        y_attribute: str,
+    ) -> Optional[PlotPoints]:
+
+        target_gradients = self.gradients(target_type)
+
+        if target_gradients is None or parameter_id not in target_gradients:
+            return None
+
+        parameter_gradients = target_gradients[parameter_id]
+
+        if (
+            x_attribute not in parameter_gradients
+            or y_attribute not in parameter_gradients
+        ):
+            return None
+
+        x_gradients = parameter_gradients[x_attribute]
+        y_gradients = parameter_gradients[y_attribute]
+
+        smiles = [pattern for pattern in x_gradients if pattern in y_gradients]
+
+        x = numpy.array([x_gradients[pattern] for pattern in smiles], dtype=float)
+        y = numpy.array([y_gradients[pattern] for pattern in smiles], dtype=float)
+
+        return PlotPoints(smiles=smiles, x=x, y=y, index=build_grid_index(x, y))
+
+    def plot_points(
+        self,
+        target_type: str,
+        parameter_id: str,
+        x_attribute: str,
+        y_attribute: str,
+    ) -> Optional[PlotPoints]:
+        """Returns the points to plot for a particular selection of target type,
+        parameter and x- and y-attributes. The points are cached so that they are
+        only built once per selection.
+
+        Returns
+        -------
+            The points to plot, or ``None`` if the selection is not valid.
+        """
+
+        key = (target_type, parameter_id, x_attribute, y_attribute)
+        return self._plot_points.get_or_build(
+            key, lambda: self._build_plot_points(*key)
+        )
+
+    def gradients(self, target_type: str) -> Optional[GradientDictionary]:
+        """Returns the gradients of a particular target type, or of one of the
+        combined views across target types, in the form
+        ``gradients[param_id][param_attr][smiles]``. The gradients of the combined
+        views are only built once.
+
+        Returns
+        -------
+            The gradients, or ``None`` if the target type cannot be selected.
+        """
+
+        if target_type in self._targets:
+            return self._targets[target_type].gradients
+
+        if target_type not in self._selection_index["targets"]:
+            return None
+
+        if target_type not in self._combined_gradients:
+
+            self._combined_gradients[target_type] = gradient_dictionary(
+                self.gradient_table(target_type)
+            )
+
+        return self._combined_gradients[target_type]
+
+    def _build_combined_table(self, target_type: str) -> GradientTable:
+
+        tables = [self.gradient_table(real_type) for real_type in self._targets]
+
+        if target_type == SUMMED_TARGET_TYPE:
+            return combine_gradient_tables(tables)
+
+        # Prefer the weighted gradients computed during the analysis, which weight
+        # each target individually, falling back to the mean target weights of each
+        # molecule for outputs which were analysed before they were stored.
+        if all(
+            len(target.weighted_gradients) > 0 or len(target.gradients) == 0
+            for target in self._targets.values()
+        ):
+
+            return combine_gradient_tables(
+                [
+                    build_gradient_table(target.weighted_gradients)
+                    for target in self._targets.values()
+                ]
+            )
+
+        # Look up the weight of each unique molecule of each table once, rather than
+        # the weight of each row.
+        weights = [
+            numpy.array(
+                [target.weights.get(smiles, 1.0) for smiles in table.smiles.categories],
+                dtype=float,
+            )[table.smiles.codes]
+            for target, table in zip(self._targets.values(), tables)
+        ]
+
+        return combine_gradient_tables(tables, weights)
+
+    def gradient_table(self, target_type: str) -> Optional[GradientTable]:
+        """Returns a columnar table of the gradients of a particular target type, or
+        of one of the combined views across target types. The table is only built
+        once per target type.
+
+        Returns
+        -------
+            The table, or ``None`` if the target type cannot be selected.
+        """
+
+        if target_type not in self._selection_index["targets"]:
+            return None
+
+        if target_type not in self._gradient_tables:
+
+            self._gradient_tables[target_type] = (
+                build_gradient_table(self._targets[target_type].gradients)
+                if target_type in self._targets
+                else self._build_combined_table(target_type)
+            )
+
+        return self._gradient_tables[target_type]
+
+    def gradient_matrix(self, target_type: str) -> Optional[GradientMatrix]:
+        """Returns a sparse parameter by molecule matrix of the gradients of a
+        particular target type. The matrix is only built once per target type.
+
+        Returns
+        -------
+            The matrix, or ``None`` if the target type cannot be selected.
+        """
+
+        if target_type not in self._selection_index["targets"]:
+            return None
+
+        if target_type not in self._gradient_matrices:
+
+            self._gradient_matrices[target_type] = build_gradient_matrix(
+                self.gradients(target_type)
+            )
+
+        return self._gradient_matrices[target_type]
+
+    def heatmap_tile(
+        self,
+        target_type: str,
+        factors: Tuple[int, int],
+        tile_index: Tuple[int, int],
+    ) -> numpy.ndarray:
+        """Returns a downsampled tile of the gradient matrix of a target type. See
+        ``GradientMatrix.tile`` for details. Recently used tiles are cached so that
+        panning and zooming back over a region does not require it to be re-pooled.
+        """
+
+        key = (target_type, tuple(factors), tuple(tile_index))
+
+        return self._heatmap_tiles.get_or_build(
+            key,
+            lambda: self.gradient_matrix(target_type).tile(factors, tile_index),
+        )
+
+
+class IterationStore:
+    """A collection of analysed iterations of an optimization. Each iteration is only
+    loaded when it is first accessed, and is retained in the bounded dataset cache
+    (see ``configure_dataset_cache``)."""
+
+    @property
+    def id(self) -> str:
+        """A unique identifier for the collection."""
+        return self._id
+
+    @property
+    def iterations(self) -> List[int]:
+        """The iterations in the collection in ascending order."""
+        return [*self._dataset_ids]
+
+    def __init__(
+        self,
+        dataset_ids: Dict[int, str],
+        iteration_files: Optional[Dict[int, str]] = None,
+        max_cached_trajectories: int = 256,
+    ):
+        """
+
+        Parameters
+        ----------
+        dataset_ids
+            The id of the registered dataset associated with each iteration.
+        iteration_files
+            The (optional) file which each iteration was loaded from.
+        max_cached_trajectories
+            The maximum number of gradient trajectories to retain.
+        """
+
+        self._dataset_ids = {
+            iteration: dataset_ids[iteration] for iteration in sorted(dataset_ids)
+        }
+        self._iteration_files = {} if iteration_files is None else iteration_files
+
+        self._id = hashlib.sha1(
+            json.dumps([*self._dataset_ids.items()]).encode()
+        ).hexdigest()
+
+        self._trajectories = LRUCache(max_cached_trajectories)
+
+    @classmethod
+    def from_iteration(cls, analysed_iteration: AnalysedIteration) -> "IterationStore":
+        """Creates a collection containing a single, already loaded iteration."""
+
+        dataset = register_dataset(analysed_iteration)
+        return cls({analysed_iteration.iteration: dataset.id})
+
+    @classmethod
+    def from_directory(cls, directory: str) -> "IterationStore":
+        """Creates a collection from the ``iteration_XXXX.json`` files created by
+        ``graffan analyse`` in a directory."""
+
+        iteration_files = find_iteration_files(directory)
+
+        if len(iteration_files) == 0:
+            raise FileNotFoundError(
+                f"No analysed iterations were found in {directory}."
+            )
+
+        return cls(
+            {
+                iteration: register_dataset_file(file_path)
+                for iteration, file_path in iteration_files.items()
+            },
+            iteration_files,
+        )
+
+    def dataset_id(self, iteration: int) -> str:
+        """Returns the id of the dataset associated with an iteration."""
+        return self._dataset_ids[iteration]
+
+    def _gradient(
+        self,
+        iteration: int,
+        target_type: str,
+        parameter_id: str,
+        attribute: str,
+        smiles: str,
+    ) -> Optional[float]:
+
+        iteration_file = self._iteration_files.get(iteration)
+        raw_directory = (
+            None if iteration_file is None else raw_gradient_directory(iteration_file)
+        )
+
+        # Prefer reading the single gradient directly from the memory mapped raw
+        # gradients over loading the full iteration. The combined views are only
+        # available from the loaded iteration.
+        if raw_directory is not None and target_type not in COMBINED_TARGET_TYPES:
+
+            return extract_raw_gradient(
+                raw_directory, target_type, parameter_id, attribute, smiles
+            )
+
+        gradients = get_dataset(self.dataset_id(iteration)).gradients(target_type)
+
+        if gradients is None:
+            return None
+
+        return gradients.get(parameter_id, {}).get(attribute, {}).get(smiles)
+
+    def trajectory(
+        self, target_type: str, parameter_id: str, attribute: str, smiles: str
+    ) -> Tuple[List[int], List[Optional[float]]]:
+        """Returns the gradient of the targets of a given type which were computed
+        for a particular molecule w.r.t. a parameter attribute at each iteration.
+
+        Returns
+        -------
+            The iterations, and the gradient at each iteration or ``None`` where no
+            gradient is available.
+        """
+
+        key = (target_type, parameter_id, attribute, smiles)
+
+        def build_trajectory():
+
+            return self.iterations, [
+                self._gradient(iteration, *key) for iteration in self.iterations
+            ]
+
+        return self._trajectories.get_or_build(key, build_trajectory)
+
+
+MAX_LOADED_DATASETS = 4
+
+_DATASET_LOADERS: Dict[str, Callable[[], DashboardData]] = {}
+_DATASETS = LRUCache(MAX_LOADED_DATASETS)
+
+_ITERATION_STORES: Dict[str, IterationStore] = {}
+
+
+def configure_dataset_cache(max_loaded_datasets: int = MAX_LOADED_DATASETS):
+    """Sets the maximum number of datasets to retain in memory at once.
+
+    Parameters
+    ----------
+    max_loaded_datasets
+        The maximum number of datasets to retain.
+    """
+
+    global _DATASETS
+    _DATASETS = LRUCache(max_loaded_datasets)
+
+
+def register_dataset(analysed_iteration: AnalysedIteration) -> DashboardData:
+    """Makes an analysed iteration available to the dashboard callbacks.
+
+    Notes
+    -----
+    * Only the analysed iteration itself is retained by the registry, such that any
+      data derived from it by the dashboard is freed when the dataset is evicted
+      from the cache of loaded datasets, and re-built if it is retrieved again.
+
+    Parameters
+    ----------
+    analysed_iteration
+        The analysed iteration to register.
+
+    Returns
+    -------
+        The registered data, whose ``id`` can be used to retrieve it using
+        ``get_dataset``.
+    """
+
+    dataset = DashboardData(analysed_iteration)
+    dataset_id = dataset.id
+
+    _DATASET_LOADERS[dataset_id] = lambda: DashboardData(
+        analysed_iteration, dataset_id=dataset_id
+    )
+
+    return _DATASETS.get_or_build(dataset_id, lambda: dataset)
+
+
+def register_dataset_file(file_path: str) -> str:
+    """Makes an analysed iteration stored in a file available to the dashboard
+    callbacks without loading it. The file will be loaded the first time the
+    dataset is retrieved using ``get_dataset``.
+
+    Parameters
+    ----------
+    file_path
+        The path to the JSON serialized ``AnalysedIteration``.
+
+    Returns
+    -------
+        The id of the registered dataset.
+    """
+
+    file_path = os.path.abspath(file_path)
+    file_stat = os.stat(file_path)
+
+    dataset_id = hashlib.sha1(
+        json.dumps([file_path, file_stat.st_mtime, file_stat.st_size]).encode()
+    ).hexdigest()
+
+    _DATASET_LOADERS[dataset_id] = lambda: DashboardData(
+        AnalysedIteration.parse_file(file_path), dataset_id=dataset_id
+    )
+
+    return dataset_id
+
+
+def get_dataset(dataset_id: str) -> DashboardData:
+    """Retrieves a dataset which was registered using ``register_dataset`` or
+    ``register_dataset_file``, loading it if needed."""
+    return _DATASETS.get_or_build(dataset_id, _DATASET_LOADERS[dataset_id])
+
+
+def register_iteration_store(iteration_store: IterationStore) -> str:
+    """Makes a collection of iterations available to the dashboard callbacks.
+
+    Returns
+    -------
+        The id which can be used to retrieve the collection using
+        ``get_iteration_store``.
+    """
+
+    _ITERATION_STORES[iteration_store.id] = iteration_store
+    return iteration_store.id
+
+
+def get_iteration_store(iteration_store_id: str) -> IterationStore:
+    """Retrieves a collection registered using ``register_iteration_store``."""
+    return _ITERATION_STORES[iteration_store_id]
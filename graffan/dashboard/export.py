@@ -0,0 +1,416 @@
+import base64
+import gzip
+import html
+import json
+import string
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy
+import plotly.offline
+
+from graffan.dashboard.data import DashboardData
+from graffan.dashboard.figures import WEBGL_THRESHOLD
+from graffan.utilities.rdkit import smiles_to_svgs
+
+_REPORT_TEMPLATE = string.Template("""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>$title</title>
+<style>
+body { font-family: sans-serif; margin: 1em 2em; }
+.controls { display: flex; gap: 1em; flex-wrap: wrap; margin-bottom: 1em; }
+.controls label { display: flex; flex-direction: column; font-size: 0.9em; }
+.main { display: flex; gap: 1em; }
+#plot { flex: 3; min-height: 600px; }
+#molecule { flex: 1; text-align: center; }
+#molecule-image svg { max-width: 100%; height: auto; }
+#molecule-label { word-break: break-all; font-family: monospace; }
+</style>
+<script type="text/javascript">$plotly_js</script>
+</head>
+<body>
+<h1>Visualise Target Gradients</h1>
+<p>$title</p>
+<div class="controls">
+<label>Target type<select id="target-select"></select></label>
+<label>Parameter<select id="parameter-select"></select></label>
+<label>X-axis<select id="x-attribute-select"></select></label>
+<label>Y-axis<select id="y-attribute-select"></select></label>
+</div>
+<p><span id="parameter-id"></span> <code id="parameter-smirks"></code></p>
+<div class="main">
+<div id="plot"></div>
+<div id="molecule">
+<div id="molecule-image"></div>
+<p id="molecule-label"></p>
+</div>
+</div>
+<script type="application/octet-stream" id="report-data">$data</script>
+<script type="application/octet-stream" id="report-images">$images</script>
+<script type="text/javascript">
+"use strict";
+
+const WEBGL_THRESHOLD = $webgl_threshold;
+
+function decodeBytes(encoded) {
+    const binary = atob(encoded.trim());
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    return bytes;
+}
+
+async function decodeJSON(elementId) {
+    const encoded = document.getElementById(elementId).textContent;
+    if (encoded.trim().length === 0) {
+        return null;
+    }
+    const stream = new Blob([decodeBytes(encoded)]).stream().pipeThrough(
+        new DecompressionStream("gzip")
+    );
+    return JSON.parse(await new Response(stream).text());
+}
+
+function fillSelect(select, values, selected) {
+    select.innerHTML = "";
+    for (const value of values) {
+        const option = document.createElement("option");
+        option.value = value;
+        option.textContent = value;
+        select.appendChild(option);
+    }
+    if (values.includes(selected)) {
+        select.value = selected;
+    }
+}
+
+async function main() {
+
+    const data = await decodeJSON("report-data");
+    let images = null;
+
+    const selects = {
+        target: document.getElementById("target-select"),
+        parameter: document.getElementById("parameter-select"),
+        x: document.getElementById("x-attribute-select"),
+        y: document.getElementById("y-attribute-select"),
+    };
+    const plot = document.getElementById("plot");
+    await Plotly.newPlot(plot, [], {});
+
+    // The typed arrays are only decoded when a selection is first plotted.
+    const decoded = new Map();
+
+    function gradientArrays(target, parameter) {
+        const key = JSON.stringify([target, parameter]);
+        if (!decoded.has(key)) {
+            const entry = data.gradients[target][parameter];
+            const values = {};
+            for (const attribute of Object.keys(entry.values)) {
+                values[attribute] = new Float32Array(
+                    decodeBytes(entry.values[attribute]).buffer
+                );
+            }
+            decoded.set(key, {
+                molecules: new Int32Array(decodeBytes(entry.molecules).buffer),
+                values: values,
+            });
+        }
+        return decoded.get(key);
+    }
+
+    function onTargetChanged() {
+        const target = data.selection.targets[selects.target.value];
+        fillSelect(
+            selects.parameter,
+            target ? target.parameters : [],
+            selects.parameter.value
+        );
+        onParameterChanged();
+    }
+
+    function onParameterChanged() {
+        const target = data.selection.targets[selects.target.value];
+        const parameter = selects.parameter.value;
+        const attributes = target && parameter ? target.attributes[parameter] : [];
+        const previousX = selects.x.value, previousY = selects.y.value;
+        fillSelect(selects.x, attributes, previousX);
+        fillSelect(selects.y, attributes, previousY);
+        if (!attributes.includes(previousY) && attributes.length > 0) {
+            selects.y.value = attributes[attributes.length - 1];
+        }
+        document.getElementById("parameter-id").textContent = parameter || "";
+        document.getElementById("parameter-smirks").textContent =
+            data.selection.smirks[parameter] || "";
+        updatePlot();
+    }
+
+    function updatePlot() {
+
+        const target = selects.target.value, parameter = selects.parameter.value;
+        const xAttribute = selects.x.value, yAttribute = selects.y.value;
+
+        if (!target || !parameter || !xAttribute || !yAttribute) {
+            Plotly.react(plot, [], {});
+            return;
+        }
+
+        const arrays = gradientArrays(target, parameter);
+        const xValues = arrays.values[xAttribute], yValues = arrays.values[yAttribute];
+
+        const x = [], y = [], molecules = [];
+
+        for (let i = 0; i < arrays.molecules.length; i++) {
+            if (Number.isNaN(xValues[i]) || Number.isNaN(yValues[i])) {
+                continue;
+            }
+            x.push(xValues[i]);
+            y.push(yValues[i]);
+            molecules.push(arrays.molecules[i]);
+        }
+
+        Plotly.react(
+            plot,
+            [{
+                type: x.length > WEBGL_THRESHOLD ? "scattergl" : "scatter",
+                mode: "markers",
+                x: x,
+                y: y,
+                customdata: molecules,
+                hoverinfo: "none",
+            }],
+            {
+                xaxis: {title: "d<X2> / d " + xAttribute},
+                yaxis: {title: "d<X2> / d " + yAttribute},
+                hovermode: "closest",
+                uirevision: [target, parameter, xAttribute, yAttribute].join(" "),
+            }
+        );
+    }
+
+    selects.target.addEventListener("change", onTargetChanged);
+    selects.parameter.addEventListener("change", onParameterChanged);
+    selects.x.addEventListener("change", updatePlot);
+    selects.y.addEventListener("change", updatePlot);
+
+    fillSelect(selects.target, Object.keys(data.selection.targets), null);
+    onTargetChanged();
+
+    plot.on("plotly_hover", function (event) {
+        const moleculeId = event.points[0].customdata;
+        document.getElementById("molecule-label").textContent = data.smiles[moleculeId];
+        const imageIndex = images === null
+            ? undefined
+            : (images.index[selects.parameter.value] || {})[moleculeId];
+        document.getElementById("molecule-image").innerHTML =
+            imageIndex === undefined ? "" : images.svgs[imageIndex];
+    });
+
+    // Decode the (larger) images only once the plot has been shown.
+    images = await decodeJSON("report-images");
+}
+
+main();
+</script>
+</body>
+</html>
+""")
+
+
+def _encode_array(values: numpy.ndarray, dtype: str) -> str:
+    """Encodes an array as the base64 encoded bytes of a little-endian typed array."""
+    return base64.b64encode(
+        numpy.ascontiguousarray(values, dtype=dtype).tobytes()
+    ).decode()
+
+
+def _compress_json(value: Any) -> str:
+    """Encodes a JSON serializable value as base64 encoded, gzipped JSON."""
+    return base64.b64encode(gzip.compress(json.dumps(value).encode())).decode()
+
+
+def build_report_data(dataset: DashboardData) -> Dict[str, Any]:
+    """Builds the data shipped with an exported report.
+
+    For each target type and parameter, the ids of the molecules which have a
+    gradient w.r.t. any of the parameter's attributes are stored as a base64 encoded
+    ``Int32Array``, and the gradients w.r.t. each attribute as a ``Float32Array``
+    aligned with the molecule ids (with ``NaN`` for missing gradients).
+
+    Parameters
+    ----------
+    dataset
+        The dataset to export.
+
+    Returns
+    -------
+        A JSON serializable dictionary of the data.
+    """
+
+    gradients = {}
+
+    for target_type in dataset.selection_index["targets"]:
+
+        gradients[target_type] = {}
+
+        for parameter_id, attribute_gradients in dataset.gradients(target_type).items():
+
+            molecule_ids = sorted(
+                {
+                    dataset.molecule_id(smiles)
+                    for molecule_gradients in attribute_gradients.values()
+                    for smiles in molecule_gradients
+                }
+            )
+            molecule_indices = {
+                molecule_id: index for index, molecule_id in enumerate(molecule_ids)
+            }
+
+            values = {}
+
+            for attribute, molecule_gradients in attribute_gradients.items():
+
+                attribute_values = numpy.full(len(molecule_ids), numpy.nan)
+
+                for smiles, gradient in molecule_gradients.items():
+
+                    attribute_values[molecule_indices[dataset.molecule_id(smiles)]] = (
+                        gradient
+                    )
+
+                values[attribute] = _encode_array(attribute_values, "<f4")
+
+            gradients[target_type][parameter_id] = {
+                "molecules": _encode_array(numpy.array(molecule_ids), "<i4"),
+                "values": values,
+            }
+
+    return {
+        "selection": dataset.selection_index,
+        "smiles": [
+            dataset.display_smiles(molecule_id)
+            for molecule_id in range(len(dataset.molecule_smiles))
+        ],
+        "gradients": gradients,
+    }
+
+
+def build_report_images(
+    dataset: DashboardData, max_workers: Optional[int] = None
+) -> Dict[str, Any]:
+    """Renders the images shipped with an exported report.
+
+    An image is rendered of each molecule with a gradient w.r.t. each parameter, with
+    the atoms matched by the SMIRKS pattern of the parameter highlighted. The unique
+    images are stored in ``svgs``, and the index into ``svgs`` of the image of a
+    molecule for a given parameter in ``index[parameter_id][molecule_id]``.
+
+    Parameters
+    ----------
+    dataset
+        The dataset to export.
+    max_workers
+        The maximum number of processes to render the molecule images with.
+
+    Returns
+    -------
+        A JSON serializable dictionary of the images.
+    """
+
+    parameter_molecules = defaultdict(dict)
+
+    for target_type in dataset.selection_index["targets"]:
+
+        for parameter_id, attribute_gradients in dataset.gradients(target_type).items():
+
+            for molecule_gradients in attribute_gradients.values():
+
+                parameter_molecules[parameter_id].update(
+                    (dataset.molecule_id(smiles), smiles)
+                    for smiles in molecule_gradients
+                )
+
+    pairs, highlight_matches = [], []
+    pair_indices: Dict[Tuple[str, Optional[str]], int] = {}
+
+    index = {}
+
+    for parameter_id, molecules in parameter_molecules.items():
+
+        parameter = dataset.parameters.get(parameter_id)
+        parameter_smirks = None if parameter is None else parameter.smirks
+
+        parameter_matches = dataset.analysed_iteration.parameter_matches.get(
+            parameter_id, {}
+        )
+
+        index[parameter_id] = {}
+
+        for molecule_id, smiles in sorted(molecules.items()):
+
+            pair = (smiles, parameter_smirks)
+
+            if pair not in pair_indices:
+
+                pair_indices[pair] = len(pairs)
+
+                pairs.append(pair)
+                highlight_matches.append(
+                    None
+                    if smiles not in parameter_matches
+                    else tuple(tuple(match) for match in parameter_matches[smiles])
+                )
+
+            index[parameter_id][molecule_id] = pair_indices[pair]
+
+    return {
+        "svgs": smiles_to_svgs(
+            pairs, max_workers=max_workers, highlight_matches=highlight_matches
+        ),
+        "index": index,
+    }
+
+
+def export_report(
+    dataset: DashboardData,
+    file_path: str,
+    include_images: bool = True,
+    max_workers: Optional[int] = None,
+):
+    """Exports a self-contained HTML report which allows the gradients in a dataset
+    to be explored without a server, e.g. to share with collaborators.
+
+    The report contains the plotly.js library, the gradients of each selection
+    encoded as compressed typed arrays (see ``build_report_data``), and a
+    pre-rendered image of each molecule with the atoms matched by each parameter
+    highlighted (see ``build_report_images``).
+
+    Parameters
+    ----------
+    dataset
+        The dataset to export.
+    file_path
+        The path to save the report to.
+    include_images
+        Whether to include an image of each molecule in the report.
+    max_workers
+        The maximum number of processes to render the molecule images with.
+    """
+
+    images = build_report_images(dataset, max_workers) if include_images else None
+
+    report = _REPORT_TEMPLATE.substitute(
+        title=html.escape(
+            f"Iteration {dataset.analysed_iteration.iteration} - exported by graffan"
+        ),
+        plotly_js=plotly.offline.get_plotlyjs(),
+        webgl_threshold=WEBGL_THRESHOLD,
+        data=_compress_json(build_report_data(dataset)),
+        images="" if images is None else _compress_json(images),
+    )
+
+    with open(file_path, "w") as file:
+        file.write(report)
@@ -0,0 +1,362 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy
+import plotly.graph_objects as go
+
+from graffan.dashboard.data import DashboardData, PlotPoints
+from graffan.dashboard.heatmap import build_heatmap_view
+from graffan.utilities.cache import LRUCache
+
+WEBGL_THRESHOLD = 5000
+"""The number of points above which markers are rendered using WebGL."""
+DENSITY_THRESHOLD = 50000
+"""The number of points above which a binned density is rendered in place of the
+individual points."""
+
+N_DENSITY_BINS = 200
+N_MARGINAL_BINS = 50
+
+MAX_HEATMAP_ROW_LABELS = 50
+"""The maximum number of rows in view for which the parameter labels are shown."""
+
+MAX_CACHED_FIGURES = 64
+
+_figure_cache = LRUCache(MAX_CACHED_FIGURES)
+
+
+def _plot_bounds(
+    values: numpy.ndarray, value_range: Optional[Tuple[float, float]]
+) -> Tuple[float, float]:
+    """Returns the finite bounds to bin a set of (visible) values over."""
+
+    lower = -numpy.inf if value_range is None else value_range[0]
+    upper = numpy.inf if value_range is None else value_range[1]
+
+    if not numpy.isfinite(lower):
+        lower = values.min() if len(values) > 0 else 0.0
+    if not numpy.isfinite(upper):
+        upper = values.max() if len(values) > 0 else 1.0
+
+    if upper <= lower:
+        lower, upper = lower - 0.5, upper + 0.5
+
+    return float(lower), float(upper)
+
+
+def _build_marginal(
+    values: numpy.ndarray, bounds: Tuple[float, float], horizontal: bool
+) -> go.Bar:
+    """Builds a bar trace containing a histogram of a set of values."""
+
+    counts, edges = numpy.histogram(values, bins=N_MARGINAL_BINS, range=bounds)
+
+    centers = 0.5 * (edges[1:] + edges[:-1])
+    widths = edges[1:] - edges[:-1]
+
+    if horizontal:
+
+        return go.Bar(
+            x=counts, y=centers, width=widths, orientation="h", xaxis="x2", yaxis="y"
+        )
+
+    return go.Bar(x=centers, y=counts, width=widths, xaxis="x", yaxis="y2")
+
+
+def build_scatter_figure(
+    plot_points: PlotPoints,
+    x_label: str,
+    y_label: str,
+    x_range: Optional[Tuple[float, float]] = None,
+    y_range: Optional[Tuple[float, float]] = None,
+) -> go.Figure:
+    """Builds a scatter plot of a set of points, with marginal histograms of their
+    x- and y-values, which remains responsive for large numbers of points.
+
+    Markers are rendered using WebGL when there are more than ``WEBGL_THRESHOLD``
+    points in view, and are replaced by a 2D histogram of the point density when
+    there are more than ``DENSITY_THRESHOLD``. All histograms are binned on the
+    server so that only the bin counts need to be sent to the browser.
+
+    Parameters
+    ----------
+    plot_points
+        The points to plot.
+    x_label
+        The label of the x-axis.
+    y_label
+        The label of the y-axis.
+    x_range
+        The (optional) range of x-values currently in view.
+    y_range
+        The (optional) range of y-values currently in view.
+
+    Returns
+    -------
+        The plotly figure.
+    """
+
+    indices = (
+        numpy.arange(len(plot_points.x))
+        if x_range is None and y_range is None
+        else plot_points.query_box(
+            (-numpy.inf, numpy.inf) if x_range is None else x_range,
+            (-numpy.inf, numpy.inf) if y_range is None else y_range,
+        )
+    )
+
+    x, y = plot_points.x[indices], plot_points.y[indices]
+
+    x_bounds = _plot_bounds(x, x_range)
+    y_bounds = _plot_bounds(y, y_range)
+
+    if len(indices) > DENSITY_THRESHOLD:
+
+        counts, x_edges, y_edges = numpy.histogram2d(
+            x, y, bins=N_DENSITY_BINS, range=[x_bounds, y_bounds]
+        )
+        # Leave empty bins transparent.
+        counts = numpy.where(counts > 0, counts, numpy.nan)
+
+        main_trace = go.Heatmap(
+            x=0.5 * (x_edges[1:] + x_edges[:-1]),
+            y=0.5 * (y_edges[1:] + y_edges[:-1]),
+            z=counts.T,
+            colorscale="Viridis",
+            showscale=False,
+            hoverinfo="none",
+        )
+
+    else:
+
+        trace_type = go.Scattergl if len(indices) > WEBGL_THRESHOLD else go.Scatter
+
+        main_trace = trace_type(
+            x=x,
+            y=y,
+            mode="markers",
+            hovertext=[plot_points.smiles[index] for index in indices],
+            hoverinfo="none",
+        )
+
+    figure = go.Figure(
+        data=[
+            main_trace,
+            _build_marginal(x, x_bounds, horizontal=False),
+            _build_marginal(y, y_bounds, horizontal=True),
+        ]
+    )
+
+    figure.update_layout(
+        xaxis=dict(domain=[0.0, 0.8], title=x_label),
+        yaxis=dict(domain=[0.0, 0.8], title=y_label),
+        xaxis2=dict(domain=[0.82, 1.0], anchor="y", showticklabels=False),
+        yaxis2=dict(domain=[0.82, 1.0], anchor="x", showticklabels=False),
+        bargap=0.0,
+        hovermode="closest",
+        showlegend=False,
+    )
+
+    if x_range is not None:
+        figure.update_layout(xaxis_range=list(x_bounds))
+    if y_range is not None:
+        figure.update_layout(yaxis_range=list(y_bounds))
+
+    return figure
+
+
+def cached_scatter_figure(
+    dataset: DashboardData,
+    target_type: str,
+    parameter_id: str,
+    x_attribute: str,
+    y_attribute: str,
+    x_range: Optional[Tuple[float, float]] = None,
+    y_range: Optional[Tuple[float, float]] = None,
+) -> Optional[Dict[str, Any]]:
+    """Returns the JSON (dictionary) representation of the scatter plot built by
+    ``build_scatter_figure`` for a particular selection of target type, parameter
+    and x- and y-attributes. Figures are memoized in a bounded cache keyed by the
+    dataset id and selection so that switching back to a recently viewed selection
+    does not require the figure to be re-built.
+
+    Returns
+    -------
+        The figure, or ``None`` if the selection is not valid.
+    """
+
+    selection = (target_type, parameter_id, x_attribute, y_attribute)
+
+    def build_figure():
+
+        plot_points = dataset.plot_points(*selection)
+
+        if plot_points is None:
+            return None
+
+        figure = build_scatter_figure(
+            plot_points,
+            f"d<X2> / d {x_attribute}",
+            f"d<X2> / d {y_attribute}",
+            x_range,
+            y_range,
+        )
+        # Retain the current zoom level until a different plot is selected.
+        figure.update_layout(uirevision=" ".join(selection))
+
+        return figure.to_dict()
+
+    key = (
+        dataset.id,
+        selection,
+        None if x_range is None else tuple(x_range),
+        None if y_range is None else tuple(y_range),
+    )
+
+    return _figure_cache.get_or_build(key, build_figure)
+
+
+def build_trajectory_figure(
+    iterations: List[int],
+    trajectories: Dict[str, List[Optional[float]]],
+    title: str,
+) -> go.Figure:
+    """Builds a line plot of how a set of gradients change over the course of an
+    optimization.
+
+    Parameters
+    ----------
+    iterations
+        The iterations the gradients were computed at.
+    trajectories
+        The label and values of each gradient at each iteration, where a value of
+        ``None`` indicates a missing gradient.
+    title
+        The title of the plot.
+
+    Returns
+    -------
+        The plotly figure.
+    """
+
+    figure = go.Figure(
+        data=[
+            go.Scatter(x=iterations, y=values, mode="lines+markers", name=label)
+            for label, values in trajectories.items()
+        ]
+    )
+    figure.update_layout(
+        title=title,
+        xaxis=dict(title="Iteration", tickmode="array", tickvals=iterations),
+        yaxis=dict(title="Gradient"),
+    )
+
+    return figure
+
+
+def _index_range(
+    value_range: Optional[Tuple[float, float]], size: int
+) -> Tuple[int, int]:
+    """Converts the range of an axis whose cells are centered on integer coordinates
+    into the (half-open) range of the cells which are in view."""
+
+    if value_range is None:
+        return 0, size
+
+    lower = min(max(int(numpy.floor(min(value_range) + 0.5)), 0), size)
+    upper = min(max(int(numpy.ceil(max(value_range) + 0.5)), lower + 1), size)
+
+    return lower, upper
+
+
+def build_heatmap_figure(
+    dataset: DashboardData,
+    target_type: str,
+    x_range: Optional[Tuple[float, float]] = None,
+    y_range: Optional[Tuple[float, float]] = None,
+) -> Optional[Tuple[go.Figure, Tuple[int, int]]]:
+    """Builds a heatmap of the gradients of a target type w.r.t. each refit parameter
+    attribute (y-axis) for each molecule (x-axis).
+
+    Only the region of the matrix in view is sent to the browser, downsampled using
+    max-abs pooling such that at most ``HEATMAP_TILE_SIZE`` cells are shown along
+    each axis. The pooled tiles are cached by the dataset.
+
+    Parameters
+    ----------
+    dataset
+        The dataset containing the gradients.
+    target_type
+        The type of target to plot the gradients of.
+    x_range
+        The (optional) range of columns currently in view.
+    y_range
+        The (optional) range of rows currently in view.
+
+    Returns
+    -------
+        The plotly figure and the number of rows and columns of the matrix pooled into
+        each cell, or ``None`` if there are no targets of the given type.
+    """
+
+    matrix = dataset.gradient_matrix(target_type)
+
+    if matrix is None:
+        return None
+
+    n_rows, n_columns = matrix.shape
+
+    view = build_heatmap_view(
+        matrix.shape,
+        _index_range(y_range, n_rows),
+        _index_range(x_range, n_columns),
+        lambda factors, tile_index: dataset.heatmap_tile(
+            target_type, factors, tile_index
+        ),
+    )
+
+    # Place the center of each pooled cell at the center of the block of the matrix
+    # that it covers.
+    row_factor, column_factor = view.factors
+
+    y = (numpy.arange(view.values.shape[0]) + view.offsets[0]) * row_factor + (
+        row_factor - 1
+    ) / 2.0
+    x = (numpy.arange(view.values.shape[1]) + view.offsets[1]) * column_factor + (
+        column_factor - 1
+    ) / 2.0
+
+    figure = go.Figure(
+        data=[
+            go.Heatmap(
+                x=x,
+                y=y,
+                z=view.values,
+                colorscale="RdBu",
+                zmid=0.0,
+                hoverongaps=False,
+                hovertemplate="%{z}<extra></extra>",
+            )
+        ]
+    )
+    figure.update_layout(
+        xaxis=dict(
+            title="Molecule", showticklabels=False, range=[-0.5, n_columns - 0.5]
+        ),
+        yaxis=dict(title="Parameter", range=[-0.5, n_rows - 0.5]),
+        uirevision=target_type,
+    )
+
+    if x_range is not None:
+        figure.update_layout(xaxis_range=list(x_range))
+    if y_range is not None:
+        figure.update_layout(yaxis_range=list(y_range))
+
+    if row_factor == 1 and len(y) <= MAX_HEATMAP_ROW_LABELS:
+
+        figure.update_yaxes(
+            tickmode="array",
+            tickvals=y,
+            ticktext=[" ".join(matrix.row_labels[int(row)]) for row in y],
+        )
+
+    return figure, view.factors
@@ -0,0 +1,283 @@
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy
+
+HEATMAP_TILE_SIZE = 256
+"""The number of (pooled) cells along each side of a heatmap tile."""
+
+MAX_CACHED_HEATMAP_TILES = 32
+
+
+class GradientMatrix(NamedTuple):
+    """A sparse matrix of the gradients of a target type w.r.t. each refit parameter
+    attribute (rows) for each molecule (columns), stored in compressed sparse row
+    format."""
+
+    row_labels: List[Tuple[str, str]]
+    """The parameter id and attribute associated with each row."""
+    column_smiles: List[str]
+    """The molecule associated with each column."""
+
+    columns: numpy.ndarray
+    """The column of each non-zero entry, grouped by row."""
+    values: numpy.ndarray
+    """The value of each non-zero entry, grouped by row."""
+    row_offsets: numpy.ndarray
+    """The offset into ``columns`` and ``values`` of the first entry in each row."""
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.row_labels), len(self.column_smiles)
+
+    def _entries(
+        self, row_range: Tuple[int, int], column_range: Tuple[int, int]
+    ) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """Returns the row, column and value of the entries within a (half-open)
+        block of the matrix."""
+
+        start, end = self.row_offsets[row_range[0]], self.row_offsets[row_range[1]]
+
+        rows = numpy.repeat(
+            numpy.arange(row_range[0], row_range[1]),
+            numpy.diff(self.row_offsets[row_range[0] : row_range[1] + 1]),
+        )
+        columns, values = self.columns[start:end], self.values[start:end]
+
+        mask = (columns >= column_range[0]) & (columns < column_range[1])
+
+        return rows[mask], columns[mask], values[mask]
+
+    def tile(
+        self, factors: Tuple[int, int], tile_index: Tuple[int, int]
+    ) -> numpy.ndarray:
+        """Returns a tile of the matrix downsampled by a given factor along each axis,
+        where each cell of the tile contains the value with the largest magnitude in
+        the corresponding block of the matrix (max-abs pooling).
+
+        Parameters
+        ----------
+        factors
+            The number of rows and columns of the matrix pooled into each cell.
+        tile_index
+            The row and column index of the tile in the grid of tiles which covers the
+            downsampled matrix.
+
+        Returns
+        -------
+            The tile with shape ``(HEATMAP_TILE_SIZE, HEATMAP_TILE_SIZE)``, where cells
+            without any entries are ``nan``.
+        """
+
+        n_rows, n_columns = self.shape
+
+        row_start = tile_index[0] * HEATMAP_TILE_SIZE * factors[0]
+        column_start = tile_index[1] * HEATMAP_TILE_SIZE * factors[1]
+
+        rows, columns, values = self._entries(
+            (
+                min(row_start, n_rows),
+                min(row_start + HEATMAP_TILE_SIZE * factors[0], n_rows),
+            ),
+            (column_start, column_start + HEATMAP_TILE_SIZE * factors[1]),
+        )
+
+        bins = ((rows - row_start) // factors[0]) * HEATMAP_TILE_SIZE + (
+            columns - column_start
+        ) // factors[1]
+
+        return _max_abs_pool(bins, values, HEATMAP_TILE_SIZE**2).reshape(
+            HEATMAP_TILE_SIZE, HEATMAP_TILE_SIZE
+        )
+
+    def max_abs_entry(
+        self, row_range: Tuple[int, int], column_range: Tuple[int, int]
+    ) -> Optional[Tuple[int, int]]:
+        """Returns the row and column of the entry with the largest magnitude within a
+        (half-open) block of the matrix, or ``None`` if the block is empty."""
+
+        n_rows, n_columns = self.shape
+
+        rows, columns, values = self._entries(
+            (min(max(row_range[0], 0), n_rows), min(max(row_range[1], 0), n_rows)),
+            column_range,
+        )
+
+        if len(values) == 0:
+            return None
+
+        index = numpy.argmax(numpy.abs(values))
+        return int(rows[index]), int(columns[index])
+
+
+class HeatmapView(NamedTuple):
+    """A downsampled view of a block of a ``GradientMatrix``."""
+
+    values: numpy.ndarray
+    """The pooled values in view."""
+
+    factors: Tuple[int, int]
+    """The number of rows and columns of the matrix pooled into each cell."""
+    offsets: Tuple[int, int]
+    """The (pooled) row and column index of the first cell in view."""
+
+
+def _max_abs_pool(
+    bins: numpy.ndarray, values: numpy.ndarray, n_bins: int
+) -> numpy.ndarray:
+    """Returns the value with the largest magnitude in each bin, or ``nan`` for
+    empty bins."""
+
+    pooled = numpy.full(n_bins, numpy.nan)
+
+    if len(values) == 0:
+        return pooled
+
+    # Sort by bin and then magnitude so the last value in each bin is the largest.
+    order = numpy.lexsort((numpy.abs(values), bins))
+    sorted_bins = bins[order]
+
+    is_last = numpy.append(sorted_bins[1:] != sorted_bins[:-1], True)
+    pooled[sorted_bins[is_last]] = values[order[is_last]]
+
+    return pooled
+
+
+def heatmap_factor(extent: int) -> int:
+    """Returns the smallest power of two pooling factor which reduces a number of
+    rows or columns to at most ``HEATMAP_TILE_SIZE`` cells."""
+
+    factor = 1
+
+    while (extent + factor - 1) // factor > HEATMAP_TILE_SIZE:
+        factor *= 2
+
+    return factor
+
+
+def build_gradient_matrix(
+    gradients: Dict[str, Dict[str, Dict[str, float]]],
+) -> GradientMatrix:
+    """Builds a sparse parameter by molecule matrix from the gradients of an analysed
+    target.
+
+    Parameters
+    ----------
+    gradients
+        The gradients of the form ``gradients[parameter_id][attribute][smiles]``.
+
+    Returns
+    -------
+        The matrix.
+    """
+
+    row_labels, column_ids = [], {}
+    columns, values, row_lengths = [], [], []
+
+    for parameter_id, attribute_gradients in gradients.items():
+
+        for attribute, molecule_gradients in attribute_gradients.items():
+
+            row_labels.append((parameter_id, attribute))
+            row_lengths.append(len(molecule_gradients))
+
+            for smiles, value in molecule_gradients.items():
+
+                columns.append(column_ids.setdefault(smiles, len(column_ids)))
+                values.append(value)
+
+    row_offsets = numpy.zeros(len(row_labels) + 1, dtype=int)
+    row_offsets[1:] = numpy.cumsum(row_lengths)
+
+    return GradientMatrix(
+        row_labels=row_labels,
+        column_smiles=[*column_ids],
+        columns=numpy.array(columns, dtype=int),
+        values=numpy.array(values, dtype=float),
+        row_offsets=row_offsets,
+    )
+
+
+def build_heatmap_view(
+    shape: Tuple[int, int],
+    row_range: Tuple[int, int],
+    column_range: Tuple[int, int],
+    get_tile: Callable[[Tuple[int, int], Tuple[int, int]], numpy.ndarray],
+) -> HeatmapView:
+    """Assembles a downsampled view of a (half-open) block of a matrix from the tiles
+    which cover it. The pooling factor along each axis is chosen so that the view
+    contains at most ``HEATMAP_TILE_SIZE`` cells along each axis, such that at most
+    four tiles are needed.
+
+    Parameters
+    ----------
+    shape
+        The shape of the full matrix.
+    row_range
+        The rows of the matrix in view.
+    column_range
+        The columns of the matrix in view.
+    get_tile
+        A function which returns the tile with a given index at a given pooling
+        factor (see ``GradientMatrix.tile``).
+
+    Returns
+    -------
+        The view.
+    """
+
+    factors = (
+        heatmap_factor(row_range[1] - row_range[0]),
+        heatmap_factor(column_range[1] - column_range[0]),
+    )
+
+    pooled_ranges = [
+        (
+            lower // factor,
+            min((upper + factor - 1) // factor, (size + factor - 1) // factor),
+        )
+        for (lower, upper), factor, size in zip(
+            (row_range, column_range), factors, shape
+        )
+    ]
+
+    values = numpy.full(
+        [max(upper - lower, 0) for lower, upper in pooled_ranges], numpy.nan
+    )
+
+    (row_lower, row_upper), (column_lower, column_upper) = pooled_ranges
+
+    for tile_row in range(
+        row_lower // HEATMAP_TILE_SIZE, (row_upper - 1) // HEATMAP_TILE_SIZE + 1
+    ):
+        for tile_column in range(
+            column_lower // HEATMAP_TILE_SIZE,
+            (column_upper - 1) // HEATMAP_TILE_SIZE + 1,
+        ):
+
+            tile = get_tile(factors, (tile_row, tile_column))
+
+            # The intersection of the tile and the view in pooled cells.
+            tile_rows = (
+                max(row_lower, tile_row * HEATMAP_TILE_SIZE),
+                min(row_upper, (tile_row + 1) * HEATMAP_TILE_SIZE),
+            )
+            tile_columns = (
+                max(column_lower, tile_column * HEATMAP_TILE_SIZE),
+                min(column_upper, (tile_column + 1) * HEATMAP_TILE_SIZE),
+            )
+
+            values[
+                tile_rows[0] - row_lower : tile_rows[1] - row_lower,
+                tile_columns[0] - column_lower : tile_columns[1] - column_lower,
+            ] = tile[
+                tile_rows[0]
+                - tile_row * HEATMAP_TILE_SIZE : tile_rows[1]
+                - tile_row * HEATMAP_TILE_SIZE,
+                tile_columns[0]
+                - tile_column * HEATMAP_TILE_SIZE : tile_columns[1]
+                - tile_column * HEATMAP_TILE_SIZE,
+            ]
+
+    return HeatmapView(
+        values=values, factors=factors, offsets=(row_lower, column_lower)
+    )
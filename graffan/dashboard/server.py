@@ -0,0 +1,41 @@
+from typing import Any, Callable
+
+
+def run_wsgi_server(
+    application: Callable[..., Any], host: str, port: int, workers: int
+):
+    """Serves a WSGI application using ``gunicorn``, forking the workers only after
+    the application has been loaded so that its data is shared between them.
+
+    Parameters
+    ----------
+    application
+        The WSGI application to serve.
+    host
+        The host to bind the server to.
+    port
+        The port to bind the server to.
+    workers
+        The number of worker processes to spawn.
+    """
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+
+        raise ImportError(
+            "gunicorn must be installed in order to serve the dashboard. It can be "
+            "installed using `conda install -c conda-forge gunicorn`."
+        )
+
+    class _Application(BaseApplication):
+        def load_config(self):
+
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("preload_app", True)
+
+        def load(self):
+            return application
+
+    _Application().run()
@@ -0,0 +1,277 @@
+from typing import NamedTuple, Optional, Tuple
+
+import numpy
+
+_POINTS_PER_CELL = 16
+
+
+class GridIndex(NamedTuple):
+    """A grid spatial index over a set of 2D points.
+
+    The points are bucketed into a grid of cells whose edges are placed at quantiles
+    of the coordinates along each axis, such that each cell contains a similar number
+    of points even when the points are heavily clustered or have long tails. The
+    points are sorted by the (row-major) index of the cell they fall in such that the
+    indices of the points in cell ``i`` are stored in
+    ``order[offsets[i]:offsets[i + 1]]``. Because the cells in each column of the
+    grid are contiguous, a rectangular block of cells can be gathered using a single
+    slice per column.
+    """
+
+    x: numpy.ndarray
+    """The x-coordinates of the indexed points."""
+    y: numpy.ndarray
+    """The y-coordinates of the indexed points."""
+
+    x_edges: numpy.ndarray
+    """The (sorted) x-coordinates of the edges between the columns of cells."""
+    y_edges: numpy.ndarray
+    """The (sorted) y-coordinates of the edges between the rows of cells."""
+    scale: numpy.ndarray
+    """The (x, y) extent of the points, which distances are measured relative to."""
+    n_cells: Tuple[int, int]
+    """The number of cells along the x- and y-axes."""
+
+    order: numpy.ndarray
+    """The indices of the points sorted by the cell they fall in."""
+    offsets: numpy.ndarray
+    """The offset into ``order`` of the first point in each cell."""
+
+    def _cell_coordinates(
+        self, x: numpy.ndarray, y: numpy.ndarray
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+
+        return (
+            numpy.searchsorted(self.x_edges, x, side="right"),
+            numpy.searchsorted(self.y_edges, y, side="right"),
+        )
+
+    def _gather_cells(
+        self, x_cells: Tuple[int, int], y_cells: Tuple[int, int]
+    ) -> numpy.ndarray:
+        """Returns the indices of the points in an (inclusive) block of cells."""
+
+        n_y = self.n_cells[1]
+
+        slices = [
+            self.order[
+                self.offsets[cell_x * n_y + y_cells[0]] : self.offsets[
+                    cell_x * n_y + y_cells[1] + 1
+                ]
+            ]
+            for cell_x in range(x_cells[0], x_cells[1] + 1)
+        ]
+
+        return numpy.concatenate(slices) if len(slices) > 0 else numpy.array([], int)
+
+    def query_box(
+        self, x_range: Tuple[float, float], y_range: Tuple[float, float]
+    ) -> numpy.ndarray:
+        """Returns the (sorted) indices of the points which lie within a box.
+
+        Parameters
+        ----------
+        x_range
+            The lower and upper bounds of the box along the x-axis.
+        y_range
+            The lower and upper bounds of the box along the y-axis.
+
+        Returns
+        -------
+            The indices of the points.
+        """
+
+        if len(self.x) == 0 or x_range[0] > x_range[1] or y_range[0] > y_range[1]:
+            return numpy.array([], dtype=int)
+
+        x_cells, y_cells = self._cell_coordinates(
+            numpy.array(x_range, dtype=float), numpy.array(y_range, dtype=float)
+        )
+
+        indices = self._gather_cells(tuple(x_cells), tuple(y_cells))
+
+        indices = indices[
+            (self.x[indices] >= x_range[0])
+            & (self.x[indices] <= x_range[1])
+            & (self.y[indices] >= y_range[0])
+            & (self.y[indices] <= y_range[1])
+        ]
+
+        return numpy.sort(indices)
+
+    def query_lasso(
+        self, polygon_x: numpy.ndarray, polygon_y: numpy.ndarray
+    ) -> numpy.ndarray:
+        """Returns the (sorted) indices of the points which lie within a (lasso)
+        polygon.
+
+        Parameters
+        ----------
+        polygon_x
+            The x-coordinates of the vertices of the polygon.
+        polygon_y
+            The y-coordinates of the vertices of the polygon.
+
+        Returns
+        -------
+            The indices of the points.
+        """
+
+        polygon_x = numpy.asarray(polygon_x, dtype=float)
+        polygon_y = numpy.asarray(polygon_y, dtype=float)
+
+        if len(polygon_x) < 3:
+            return numpy.array([], dtype=int)
+
+        # Only the points within the bounding box of the polygon need to be tested.
+        indices = self.query_box(
+            (polygon_x.min(), polygon_x.max()), (polygon_y.min(), polygon_y.max())
+        )
+
+        x, y = self.x[indices, None], self.y[indices, None]
+
+        start_x, start_y = polygon_x, polygon_y
+        end_x, end_y = numpy.roll(polygon_x, -1), numpy.roll(polygon_y, -1)
+
+        # Count the number of polygon edges which a ray cast from each point along the
+        # positive x-axis crosses, using the even-odd rule.
+        straddles = (start_y > y) != (end_y > y)
+
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+
+            crossing_x = start_x + (y - start_y) * (end_x - start_x) / (end_y - start_y)
+
+        inside = numpy.count_nonzero(straddles & (x < crossing_x), axis=1) % 2 == 1
+
+        return indices[inside]
+
+    def query_nearest(self, x: float, y: float) -> Optional[int]:
+        """Returns the index of the point nearest to a given position, where distances
+        are measured relative to the extent of the points along each axis.
+
+        Parameters
+        ----------
+        x
+            The x-coordinate of the position.
+        y
+            The y-coordinate of the position.
+
+        Returns
+        -------
+            The index of the nearest point, or ``None`` if there are no points.
+        """
+
+        if len(self.x) == 0:
+            return None
+
+        cell_x, cell_y = self._cell_coordinates(numpy.array(x), numpy.array(y))
+
+        n_x, n_y = self.n_cells
+
+        # The search terminates at the latest once the block of cells covers the
+        # whole grid, as there are then no points outside of it.
+        for radius in range(max(n_x, n_y)):
+
+            x_cells = max(cell_x - radius, 0), min(cell_x + radius, n_x - 1)
+            y_cells = max(cell_y - radius, 0), min(cell_y + radius, n_y - 1)
+
+            indices = self._gather_cells(x_cells, y_cells)
+
+            if len(indices) == 0:
+                continue
+
+            distances = numpy.hypot(
+                (self.x[indices] - x) / self.scale[0],
+                (self.y[indices] - y) / self.scale[1],
+            )
+            nearest = numpy.argmin(distances)
+
+            # Any point outside of the searched block of cells must be at least as
+            # far away as the nearest edge of the block which is not also an edge of
+            # the grid.
+            edge_distances = [
+                (
+                    (x - self.x_edges[x_cells[0] - 1]) / self.scale[0]
+                    if x_cells[0] > 0
+                    else numpy.inf
+                ),
+                (
+                    (self.x_edges[x_cells[1]] - x) / self.scale[0]
+                    if x_cells[1] < n_x - 1
+                    else numpy.inf
+                ),
+                (
+                    (y - self.y_edges[y_cells[0] - 1]) / self.scale[1]
+                    if y_cells[0] > 0
+                    else numpy.inf
+                ),
+                (
+                    (self.y_edges[y_cells[1]] - y) / self.scale[1]
+                    if y_cells[1] < n_y - 1
+                    else numpy.inf
+                ),
+            ]
+
+            if distances[nearest] <= min(edge_distances):
+                return int(indices[nearest])
+
+
+def build_grid_index(x: numpy.ndarray, y: numpy.ndarray) -> GridIndex:
+    """Builds a grid spatial index over a set of 2D points, placing the edges of the
+    cells at quantiles of the coordinates along each axis.
+
+    Parameters
+    ----------
+    x
+        The x-coordinates of the points.
+    y
+        The y-coordinates of the points.
+
+    Returns
+    -------
+        The spatial index.
+    """
+
+    x = numpy.asarray(x, dtype=float)
+    y = numpy.asarray(y, dtype=float)
+
+    n_points = len(x)
+
+    n_cells_per_axis = max(int(numpy.ceil(numpy.sqrt(n_points / _POINTS_PER_CELL))), 1)
+
+    # Repeated coordinates can lead to coincident quantiles, which would otherwise
+    # produce cells which can never contain any points.
+    quantiles = numpy.linspace(0.0, 1.0, n_cells_per_axis + 1)[1:-1]
+
+    x_edges = numpy.unique(numpy.quantile(x, quantiles)) if n_points > 0 else x[:0]
+    y_edges = numpy.unique(numpy.quantile(y, quantiles)) if n_points > 0 else y[:0]
+
+    n_cells = (len(x_edges) + 1, len(y_edges) + 1)
+
+    scale = numpy.array(
+        [numpy.ptp(x), numpy.ptp(y)] if n_points > 0 else [1.0, 1.0], dtype=float
+    )
+    scale[scale <= 0.0] = 1.0
+
+    index = GridIndex(
+        x=x,
+        y=y,
+        x_edges=x_edges,
+        y_edges=y_edges,
+        scale=scale,
+        n_cells=n_cells,
+        order=numpy.array([], dtype=int),
+        offsets=numpy.zeros(n_cells[0] * n_cells[1] + 1, dtype=int),
+    )
+
+    cell_x, cell_y = index._cell_coordinates(x, y)
+    cell_indices = cell_x * n_cells[1] + cell_y
+
+    offsets = numpy.zeros(n_cells[0] * n_cells[1] + 1, dtype=int)
+    offsets[1:] = numpy.cumsum(
+        numpy.bincount(cell_indices, minlength=n_cells[0] * n_cells[1])
+    )
+
+    return index._replace(
+        order=numpy.argsort(cell_indices, kind="stable"), offsets=offsets
+    )
@@ -0,0 +1,422 @@
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy
+
+_FILTER_PATTERN = re.compile(
+    r"^\{(?P<column>[^}]+)\}\s*"
+    r"(?P<case>[si]?)"
+    r"(?P<operator>contains|eq|ne|lt|le|gt|ge|!=|<=|>=|=|<|>)"
+    r"\s+(?P<value>.*)$"
+)
+_OPERATOR_SYMBOLS = {
+    "eq": "=",
+    "ne": "!=",
+    "lt": "<",
+    "le": "<=",
+    "gt": ">",
+    "ge": ">=",
+}
+
+TABLE_COLUMNS = {
+    "smiles": "Molecule",
+    "parameter": "Parameter",
+    "attribute": "Attribute",
+    "gradient": "Gradient",
+}
+"""The id and name of each of the columns in a gradient table."""
+
+
+class TableFilter(NamedTuple):
+    """A single filter applied to a column of a gradient table."""
+
+    column: str
+    """The id of the column to filter."""
+    operator: str
+    """The filter operator, one of ``=``, ``!=``, ``<``, ``<=``, ``>``, ``>=`` or
+    ``contains``."""
+    value: str
+    """The value to compare against."""
+    case_sensitive: bool = True
+    """Whether string comparisons should be case sensitive."""
+
+
+class CategoricalColumn(NamedTuple):
+    """A column of string values which is stored as a (sorted) list of the unique
+    values and the index of each row's value in that list."""
+
+    categories: numpy.ndarray
+    """The unique values in the column in ascending order."""
+    codes: numpy.ndarray
+    """The index into ``categories`` of the value of each row."""
+
+    def mask(self, table_filter: TableFilter) -> numpy.ndarray:
+        """Returns a mask of the rows which pass a filter. The filter is evaluated
+        once per unique value rather than once per row."""
+
+        categories, value = self.categories, table_filter.value
+
+        if not table_filter.case_sensitive:
+            categories, value = numpy.char.lower(categories), value.lower()
+
+        if table_filter.operator == "contains":
+            category_mask = numpy.char.find(categories, value) >= 0
+        else:
+            category_mask = _compare(categories, table_filter.operator, value)
+
+        return category_mask[self.codes]
+
+
+class GradientTable(NamedTuple):
+    """A columnar table of the gradients of a target type w.r.t. each refit
+    parameter attribute, together with the order of the rows when sorted by each
+    column so that the table can be sorted, filtered and paged without re-sorting."""
+
+    smiles: CategoricalColumn
+    """The molecule associated with each row."""
+    parameters: CategoricalColumn
+    """The parameter id associated with each row."""
+    attributes: CategoricalColumn
+    """The parameter attribute associated with each row."""
+
+    gradients: numpy.ndarray
+    """The gradient of each row."""
+
+    sort_orders: Dict[str, numpy.ndarray]
+    """The indices of the rows sorted (ascending) by each column."""
+
+    def __len__(self):
+        return len(self.gradients)
+
+    def _mask(self, table_filter: TableFilter) -> numpy.ndarray:
+
+        if table_filter.column == "gradient":
+
+            try:
+                value = float(table_filter.value)
+            except ValueError:
+                return numpy.zeros(len(self), dtype=bool)
+
+            if table_filter.operator == "contains":
+                return numpy.zeros(len(self), dtype=bool)
+
+            return _compare(self.gradients, table_filter.operator, value)
+
+        column = {
+            "smiles": self.smiles,
+            "parameter": self.parameters,
+            "attribute": self.attributes,
+        }[table_filter.column]
+
+        return column.mask(table_filter)
+
+    def query(
+        self,
+        filters: List[TableFilter],
+        sort_column: Optional[str] = None,
+        descending: bool = False,
+        page: int = 0,
+        page_size: int = 25,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Returns a single page of the rows of the table which pass a set of
+        filters.
+
+        Parameters
+        ----------
+        filters
+            The filters that each returned row must pass.
+        sort_column
+            The (optional) id of the column to sort the rows by.
+        descending
+            Whether to sort the rows in descending rather than ascending order.
+        page
+            The index of the page to return.
+        page_size
+            The number of rows per page.
+
+        Returns
+        -------
+            The rows on the page, and the total number of rows which passed the
+            filters.
+        """
+
+        mask = numpy.ones(len(self), dtype=bool)
+
+        for table_filter in filters:
+
+            if table_filter.column not in TABLE_COLUMNS:
+                continue
+
+            mask &= self._mask(table_filter)
+
+        order = (
+            numpy.arange(len(self))
+            if sort_column is None
+            else self.sort_orders[sort_column]
+        )
+
+        if descending:
+            order = order[::-1]
+
+        # Filtering the pre-sorted indices retains their order.
+        order = order[mask[order]]
+
+        indices = order[page * page_size : (page + 1) * page_size]
+
+        rows = [
+            {
+                "smiles": str(self.smiles.categories[self.smiles.codes[index]]),
+                "parameter": str(
+                    self.parameters.categories[self.parameters.codes[index]]
+                ),
+                "attribute": str(
+                    self.attributes.categories[self.attributes.codes[index]]
+                ),
+                "gradient": float(self.gradients[index]),
+            }
+            for index in indices
+        ]
+
+        return rows, len(order)
+
+
+def _compare(values: numpy.ndarray, operator: str, value: Any) -> numpy.ndarray:
+
+    if operator == "=":
+        return values == value
+    elif operator == "!=":
+        return values != value
+    elif operator == "<":
+        return values < value
+    elif operator == "<=":
+        return values <= value
+    elif operator == ">":
+        return values > value
+    elif operator == ">=":
+        return values >= value
+
+    raise NotImplementedError()
+
+
+def _build_categorical_column(values: List[str]) -> CategoricalColumn:
+
+    categories, codes = numpy.unique(
+        numpy.array(values, dtype=str), return_inverse=True
+    )
+    return CategoricalColumn(categories=categories, codes=codes.astype(int))
+
+
+def build_gradient_table(
+    gradients: Dict[str, Dict[str, Dict[str, float]]],
+) -> GradientTable:
+    """Builds a columnar table from the gradients of an analysed target.
+
+    Parameters
+    ----------
+    gradients
+        The gradients of the form ``gradients[parameter_id][attribute][smiles]``.
+
+    Returns
+    -------
+        The table, containing one row per gradient.
+    """
+
+    smiles, parameter_ids, attributes, values = [], [], [], []
+
+    for parameter_id, attribute_gradients in gradients.items():
+
+        for attribute, molecule_gradients in attribute_gradients.items():
+
+            smiles.extend(molecule_gradients)
+            values.extend(molecule_gradients.values())
+
+            parameter_ids.extend([parameter_id] * len(molecule_gradients))
+            attributes.extend([attribute] * len(molecule_gradients))
+
+    return _build_gradient_table(
+        {
+            "smiles": _build_categorical_column(smiles),
+            "parameter": _build_categorical_column(parameter_ids),
+            "attribute": _build_categorical_column(attributes),
+        },
+        numpy.array(values, dtype=float),
+    )
+
+
+def _build_gradient_table(
+    columns: Dict[str, CategoricalColumn], gradients: numpy.ndarray
+) -> GradientTable:
+
+    # As the categories are sorted, the order of the codes is also the order of the
+    # values.
+    sort_orders = {
+        column_id: numpy.argsort(column.codes, kind="stable")
+        for column_id, column in columns.items()
+    }
+    sort_orders["gradient"] = numpy.argsort(gradients, kind="stable")
+
+    return GradientTable(
+        smiles=columns["smiles"],
+        parameters=columns["parameter"],
+        attributes=columns["attribute"],
+        gradients=gradients,
+        sort_orders=sort_orders,
+    )
+
+
+def _join_categorical_columns(
+    columns: List[CategoricalColumn],
+) -> Tuple[numpy.ndarray, List[numpy.ndarray]]:
+    """Maps the codes of several categorical columns onto the union of their
+    categories, returning the (sorted) union and the re-mapped codes of each column.
+    """
+
+    categories, inverse = numpy.unique(
+        numpy.concatenate(
+            [numpy.array(column.categories, dtype=str) for column in columns]
+        ),
+        return_inverse=True,
+    )
+    inverse = inverse.reshape(-1)
+
+    offsets = numpy.cumsum([0, *(len(column.categories) for column in columns)])
+
+    return categories, [
+        inverse[offset : offset + len(column.categories)][column.codes]
+        for offset, column in zip(offsets, columns)
+    ]
+
+
+def combine_gradient_tables(
+    tables: List[GradientTable], weights: Optional[List[numpy.ndarray]] = None
+) -> GradientTable:
+    """Combines the gradient tables of several target types into a single table,
+    summing the (optionally weighted) gradients w.r.t. the same parameter attribute
+    of the same molecule.
+
+    The tables are joined on their columnar data directly: the categories of each
+    column are merged, the rows of every table are keyed by their re-mapped codes,
+    and the rows which share a key are summed in a single pass.
+
+    Parameters
+    ----------
+    tables
+        The tables to combine.
+    weights
+        The (optional) weight to multiply the gradient of each row of each table by.
+
+    Returns
+    -------
+        The combined table.
+    """
+
+    smiles, smiles_codes = _join_categorical_columns([table.smiles for table in tables])
+    parameters, parameter_codes = _join_categorical_columns(
+        [table.parameters for table in tables]
+    )
+    attributes, attribute_codes = _join_categorical_columns(
+        [table.attributes for table in tables]
+    )
+
+    gradients = [
+        (
+            table.gradients
+            if weights is None
+            else table.gradients * numpy.asarray(table_weights, dtype=float)
+        )
+        for table, table_weights in zip(tables, weights or [None] * len(tables))
+    ]
+
+    keys = numpy.concatenate(parameter_codes).astype(numpy.int64) * len(attributes)
+    keys = (keys + numpy.concatenate(attribute_codes)) * len(smiles)
+    keys = keys + numpy.concatenate(smiles_codes)
+
+    unique_keys, key_indices = numpy.unique(keys, return_inverse=True)
+
+    values = numpy.bincount(
+        key_indices.reshape(-1),
+        weights=numpy.concatenate([numpy.zeros(0), *gradients]),
+        minlength=len(unique_keys),
+    )
+
+    return _build_gradient_table(
+        {
+            "smiles": CategoricalColumn(smiles, unique_keys % len(smiles)),
+            "parameter": CategoricalColumn(
+                parameters, unique_keys // len(smiles) // len(attributes)
+            ),
+            "attribute": CategoricalColumn(
+                attributes, unique_keys // len(smiles) % len(attributes)
+            ),
+        },
+        values,
+    )
+
+
+def gradient_dictionary(
+    table: GradientTable,
+) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Converts a gradient table back into the dictionary form stored by an analysed
+    target, i.e. ``gradients[parameter_id][attribute][smiles]``."""
+
+    gradients = defaultdict(lambda: defaultdict(dict))
+
+    for smiles, parameter_id, attribute, value in zip(
+        table.smiles.categories[table.smiles.codes].tolist(),
+        table.parameters.categories[table.parameters.codes].tolist(),
+        table.attributes.categories[table.attributes.codes].tolist(),
+        table.gradients.tolist(),
+    ):
+        gradients[parameter_id][attribute][smiles] = value
+
+    return {
+        parameter_id: dict(attribute_gradients)
+        for parameter_id, attribute_gradients in gradients.items()
+    }
+
+
+def parse_filter_query(filter_query: Optional[str]) -> List[TableFilter]:
+    """Parses the filter query string produced by a Dash ``DataTable``, e.g.
+    ``"{smiles} contains CC && {gradient} > 0.5"``. Any parts of the query which
+    cannot be parsed are ignored.
+
+    Parameters
+    ----------
+    filter_query
+        The query to parse.
+
+    Returns
+    -------
+        The filters in the query.
+    """
+
+    if filter_query is None:
+        return []
+
+    filters = []
+
+    for filter_part in filter_query.split(" && "):
+
+        match = _FILTER_PATTERN.match(filter_part.strip())
+
+        if match is None:
+            continue
+
+        value = match.group("value").strip()
+
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"`":
+            value = value[1:-1].replace("\\" + value[0], value[0])
+
+        operator = match.group("operator")
+
+        filters.append(
+            TableFilter(
+                column=match.group("column"),
+                operator=_OPERATOR_SYMBOLS.get(operator, operator),
+                value=value,
+                case_sensitive=match.group("case") != "i",
+            )
+        )
+
+    return filters
@@ -0,0 +1,205 @@
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+import numpy
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""The upper bounds (in seconds) of the callback latency histogram buckets."""
+PAYLOAD_BUCKETS = tuple(256 * 4**i for i in range(10))
+"""The upper bounds (in bytes) of the callback payload size histogram buckets."""
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """A histogram of observed values with fixed bucket bounds, following the
+    conventions of a Prometheus histogram."""
+
+    @property
+    def count(self) -> int:
+        """The number of observed values."""
+        return int(self._counts.sum())
+
+    @property
+    def sum(self) -> float:
+        """The sum of the observed values."""
+        return self._sum
+
+    def __init__(self, buckets: Sequence[float]):
+        """
+
+        Parameters
+        ----------
+        buckets
+            The (ascending) upper bounds of the buckets. A final bucket with an upper
+            bound of infinity is always included.
+        """
+
+        self._bounds = numpy.array([*buckets, numpy.inf], dtype=float)
+        self._counts = numpy.zeros(len(self._bounds), dtype=int)
+        self._sum = 0.0
+
+    def observe(self, value: float):
+        """Records an observed value."""
+
+        self._counts[numpy.searchsorted(self._bounds, value)] += 1
+        self._sum += value
+
+    def cumulative_counts(self) -> List[Tuple[float, int]]:
+        """Returns the upper bound of each bucket and the number of observed values
+        which were less than or equal to it."""
+        return [*zip(self._bounds.tolist(), numpy.cumsum(self._counts).tolist())]
+
+    def quantile(self, q: float) -> float:
+        """Estimates a quantile of the observed values by linearly interpolating
+        within the bucket which contains it, in the same way as the Prometheus
+        ``histogram_quantile`` function.
+
+        Parameters
+        ----------
+        q
+            The quantile to estimate, between 0 and 1.
+
+        Returns
+        -------
+            The estimated quantile, or ``nan`` if no values have been observed.
+        """
+
+        count = self.count
+
+        if count == 0:
+            return numpy.nan
+
+        cumulative_counts = numpy.cumsum(self._counts)
+
+        rank = q * count
+        bucket = int(numpy.searchsorted(cumulative_counts, rank))
+
+        # Values in the unbounded bucket are reported as the largest finite bound.
+        if bucket == len(self._bounds) - 1:
+            return float(self._bounds[-2])
+
+        lower_bound = 0.0 if bucket == 0 else self._bounds[bucket - 1]
+        lower_count = 0 if bucket == 0 else cumulative_counts[bucket - 1]
+
+        fraction = (rank - lower_count) / self._counts[bucket]
+
+        return float(lower_bound + (self._bounds[bucket] - lower_bound) * fraction)
+
+
+class CallbackTelemetry:
+    """A thread-safe store of the latency and response payload size of each dashboard
+    callback. Each process (e.g. each worker when serving the dashboard using
+    ``--serve``) records its own measurements."""
+
+    def __init__(self):
+
+        self._lock = threading.Lock()
+
+        self._durations: Dict[str, Histogram] = {}
+        self._payloads: Dict[str, Histogram] = {}
+
+    def record(self, callback_name: str, duration: float, payload_size: int):
+        """Records a single call of a callback.
+
+        Parameters
+        ----------
+        callback_name
+            The name of the callback.
+        duration
+            The time (in seconds) taken to respond to the call.
+        payload_size
+            The size (in bytes) of the response.
+        """
+
+        with self._lock:
+
+            if callback_name not in self._durations:
+
+                self._durations[callback_name] = Histogram(DURATION_BUCKETS)
+                self._payloads[callback_name] = Histogram(PAYLOAD_BUCKETS)
+
+            self._durations[callback_name].observe(duration)
+            self._payloads[callback_name].observe(payload_size)
+
+    def reset(self):
+        """Clears all recorded measurements."""
+
+        with self._lock:
+
+            self._durations.clear()
+            self._payloads.clear()
+
+    def summary(self) -> List[Dict[str, float]]:
+        """Returns the number of calls and the estimated p50, p95 and p99 latency
+        (``duration_p50``, ...) and payload size (``payload_p50``, ...) of each
+        callback, sorted by callback name."""
+
+        summaries = []
+
+        with self._lock:
+
+            for callback_name in sorted(self._durations):
+
+                summary = {
+                    "callback": callback_name,
+                    "count": self._durations[callback_name].count,
+                }
+
+                for q in QUANTILES:
+
+                    summary[f"duration_p{int(q * 100)}"] = self._durations[
+                        callback_name
+                    ].quantile(q)
+                    summary[f"payload_p{int(q * 100)}"] = self._payloads[
+                        callback_name
+                    ].quantile(q)
+
+                summaries.append(summary)
+
+        return summaries
+
+    def to_prometheus(self) -> str:
+        """Returns the recorded measurements as histograms in the Prometheus text
+        exposition format."""
+
+        lines = []
+
+        with self._lock:
+
+            for metric_name, description, histograms in [
+                (
+                    "graffan_dashboard_callback_duration_seconds",
+                    "The time taken to respond to a dashboard callback.",
+                    self._durations,
+                ),
+                (
+                    "graffan_dashboard_callback_response_bytes",
+                    "The size of the response to a dashboard callback.",
+                    self._payloads,
+                ),
+            ]:
+
+                lines.append(f"# HELP {metric_name} {description}")
+                lines.append(f"# TYPE {metric_name} histogram")
+
+                for callback_name in sorted(histograms):
+
+                    histogram = histograms[callback_name]
+                    label = f'callback="{callback_name}"'
+
+                    for bound, count in histogram.cumulative_counts():
+
+                        bound = "+Inf" if numpy.isinf(bound) else repr(bound)
+                        lines.append(
+                            f'{metric_name}_bucket{{{label},le="{bound}"}} {count}'
+                        )
+
+                    lines.append(f"{metric_name}_sum{{{label}}} {histogram.sum!r}")
+                    lines.append(f"{metric_name}_count{{{label}}} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+callback_telemetry = CallbackTelemetry()
+"""The measurements of the dashboard callbacks handled by this process."""
@@ -0,0 +1,84 @@
+from typing import Dict, Optional, Tuple
+
+from graffan.library.models.analysis import AnalysedIteration
+from graffan.utilities.cache import ImageCache
+from graffan.utilities.rdkit import smiles_to_svgs
+
+
+def prerender_images(
+    analysed_iteration: AnalysedIteration,
+    directory: str,
+    max_workers: Optional[int] = None,
+    batch_size: int = 4096,
+) -> int:
+    """Renders an image of every molecule which contributes to the gradient of each
+    refit parameter, with the atoms matched by the parameter highlighted, and stores
+    them in an on-disk image cache. The matches stored in the iteration's
+    ``parameter_matches`` are re-used where available rather than re-matching the
+    SMIRKS pattern of each parameter.
+
+    Parameters
+    ----------
+    analysed_iteration
+        The analysed iteration containing the per-molecule gradients.
+    directory
+        The directory to store the images in. This can be passed to
+        ``configure_image_cache`` to make the images available to ``smiles_to_svg``.
+    max_workers
+        The maximum number of processes to render the images with.
+    batch_size
+        The number of images to render before writing them to disk.
+
+    Returns
+    -------
+        The number of images which were rendered or found in the cache.
+    """
+
+    smirks_by_id = {
+        parameter.id: parameter.smirks
+        for parameter in analysed_iteration.refit_parameters
+    }
+
+    # The (optional) pre-computed matches of each (SMILES, SMIRKS) pair.
+    pairs: Dict[Tuple[str, str], Optional[Tuple[Tuple[int, ...], ...]]] = {}
+
+    for target in analysed_iteration.targets:
+
+        for parameter_id, attribute_gradients in target.gradients.items():
+
+            if parameter_id not in smirks_by_id:
+                continue
+
+            parameter_matches = analysed_iteration.parameter_matches.get(
+                parameter_id, {}
+            )
+
+            for molecule_gradients in attribute_gradients.values():
+
+                for smiles in molecule_gradients:
+
+                    pairs[(smiles, smirks_by_id[parameter_id])] = (
+                        None
+                        if smiles not in parameter_matches
+                        else tuple(tuple(match) for match in parameter_matches[smiles])
+                    )
+
+    # Images are only stored on disk, and are rendered in batches, to keep the
+    # memory footprint bounded.
+    image_cache = ImageCache(directory, max_bytes=0)
+
+    pairs_list = [*pairs]
+    highlight_matches = [*pairs.values()]
+
+    for batch_start in range(0, len(pairs_list), batch_size):
+
+        batch_slice = slice(batch_start, batch_start + batch_size)
+
+        smiles_to_svgs(
+            pairs_list[batch_slice],
+            max_workers=max_workers,
+            image_cache=image_cache,
+            highlight_matches=highlight_matches[batch_slice],
+        )
+
+    return len(pairs_list)
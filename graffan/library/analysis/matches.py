@@ -0,0 +1,97 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from graffan.library.models.analysis import AnalysedTarget, MatchDictionary
+from graffan.library.models.smirnoff import SMIRNOFFParameter
+from graffan.utilities.rdkit import find_smirks_matches, smiles_to_rdkit
+
+
+def _match_molecule(
+    smiles: str, smirks_patterns: Tuple[str, ...]
+) -> List[List[Tuple[int, ...]]]:
+    """Finds the matches of a set of SMIRKS patterns within a single molecule."""
+
+    rdkit_molecule = smiles_to_rdkit(smiles)
+
+    return [find_smirks_matches(rdkit_molecule, smirks) for smirks in smirks_patterns]
+
+
+def build_match_index(
+    parameters: List[SMIRNOFFParameter],
+    targets: List[AnalysedTarget],
+    max_workers: Optional[int] = None,
+) -> MatchDictionary:
+    """Finds which atoms of each molecule that a refit parameter has a gradient
+    contribution from are matched by the SMIRKS pattern of that parameter.
+
+    Parameters
+    ----------
+    parameters
+        The refit parameters.
+    targets
+        The analysed targets which contain the per-molecule gradients.
+    max_workers
+        The maximum number of processes to find the matches with. If ``1``, the
+        matches will be found in the current process.
+
+    Returns
+    -------
+        The matches stored in a dictionary of the form
+        ``matches[param_id][smiles] = [(atom_index_1, ...), ...]``, where the atom
+        indices are ordered by the map indices of the SMIRKS pattern.
+    """
+
+    smirks_by_id = {parameter.id: parameter.smirks for parameter in parameters}
+
+    # Group the parameters by molecule so that each molecule only needs to be
+    # parsed once.
+    ids_by_smiles: Dict[str, Dict[str, None]] = defaultdict(dict)
+
+    for target in targets:
+
+        for parameter_id, attribute_gradients in target.gradients.items():
+
+            if parameter_id not in smirks_by_id:
+                continue
+
+            for molecule_gradients in attribute_gradients.values():
+
+                for smiles in molecule_gradients:
+                    ids_by_smiles[smiles][parameter_id] = None
+
+    smiles_list = [*ids_by_smiles]
+    ids_list = [[*ids_by_smiles[smiles]] for smiles in smiles_list]
+
+    smirks_list = [
+        tuple(smirks_by_id[parameter_id] for parameter_id in parameter_ids)
+        for parameter_ids in ids_list
+    ]
+
+    if max_workers == 1:
+        molecule_matches = map(_match_molecule, smiles_list, smirks_list)
+
+    else:
+
+        n_workers = max_workers if max_workers is not None else os.cpu_count() or 1
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+
+            molecule_matches = [
+                *executor.map(
+                    _match_molecule,
+                    smiles_list,
+                    smirks_list,
+                    chunksize=max(1, len(smiles_list) // (4 * n_workers)),
+                )
+            ]
+
+    match_index = defaultdict(dict)
+
+    for smiles, parameter_ids, matches in zip(smiles_list, ids_list, molecule_matches):
+
+        for parameter_id, parameter_matches in zip(parameter_ids, matches):
+            match_index[parameter_id][smiles] = parameter_matches
+
+    return {**match_index}
@@ -0,0 +1,359 @@
+from itertools import chain
+from typing import List, Literal, NamedTuple, Optional, Tuple
+
+import numpy
+from pydantic import BaseModel, Field
+
+from graffan.library.models.analysis import AnalysedTarget, ParameterGradientSummary
+
+QueryOrder = Literal["largest", "smallest", "absolute"]
+SummaryStatistic = Literal[
+    "n_molecules",
+    "sum",
+    "mean",
+    "std",
+    "l1_norm",
+    "l2_norm",
+    "minimum",
+    "lower_quartile",
+    "median",
+    "upper_quartile",
+    "maximum",
+]
+
+
+class GradientEntry(BaseModel):
+    """A model which stores the gradient of a target w.r.t. a single parameter
+    attribute for a single molecule."""
+
+    id: str = Field(..., description="The unique ID associated with the parameter.")
+    attribute: str = Field(
+        ..., description="The attribute of the parameter the gradient is w.r.t."
+    )
+    smiles: str = Field(..., description="The molecule the gradient was computed for.")
+
+    value: float = Field(..., description="The value of the gradient.")
+
+
+class GradientColumns(NamedTuple):
+    """A columnar representation of the gradients stored in an ``AnalysedTarget``.
+
+    The entries are sorted by ``key_indices`` such that the gradients w.r.t. the
+    ``i``'th key are stored in ``values[offsets[i]:offsets[i + 1]]``.
+    """
+
+    keys: List[Tuple[str, str]]
+    """The unique (parameter id, attribute) pairs."""
+    smiles: List[str]
+    """The unique molecules."""
+
+    key_indices: numpy.ndarray
+    """The index into ``keys`` of each entry."""
+    molecule_indices: numpy.ndarray
+    """The index into ``smiles`` of each entry."""
+    values: numpy.ndarray
+    """The value of the gradient of each entry."""
+
+    offsets: numpy.ndarray
+    """The offset of the first entry associated with each key."""
+
+    def key_slice(self, parameter_id: str, attribute: str) -> slice:
+        """Returns the slice of the entry arrays which contain the gradients w.r.t.
+        a particular parameter attribute."""
+
+        index = self.keys.index((parameter_id, attribute))
+        return slice(self.offsets[index], self.offsets[index + 1])
+
+
+def _build_offsets(key_indices: numpy.ndarray, n_keys: int) -> numpy.ndarray:
+    """Returns the offset of the first entry associated with each key from a sorted
+    array of key indices."""
+
+    offsets = numpy.zeros(n_keys + 1, dtype=int)
+    offsets[1:] = numpy.cumsum(numpy.bincount(key_indices, minlength=n_keys))
+
+    return offsets
+
+
+def build_gradient_columns(target: AnalysedTarget) -> GradientColumns:
+    """Converts the gradients stored in an analysed target into a set of columnar
+    arrays.
+
+    Notes
+    -----
+    * Where the sparse gradient arrays stored by ``map_raw_gradients`` are available
+      ``load_gradient_columns`` should be preferred as it does not require the
+      nested gradient dictionaries to be traversed.
+
+    Parameters
+    ----------
+    target
+        The analysed target.
+
+    Returns
+    -------
+        The columnar gradients.
+    """
+
+    keys, molecule_gradients = [], []
+
+    for parameter_id, attribute_gradients in target.gradients.items():
+
+        for attribute, gradients in attribute_gradients.items():
+
+            keys.append((parameter_id, attribute))
+            molecule_gradients.append(gradients)
+
+    counts = numpy.fromiter(map(len, molecule_gradients), dtype=int, count=len(keys))
+    n_entries = int(counts.sum())
+
+    key_indices = numpy.repeat(numpy.arange(len(keys)), counts)
+
+    smiles_indices = {
+        smiles: index
+        for index, smiles in enumerate(
+            dict.fromkeys(chain.from_iterable(molecule_gradients))
+        )
+    }
+    molecule_indices = numpy.fromiter(
+        map(smiles_indices.__getitem__, chain.from_iterable(molecule_gradients)),
+        dtype=int,
+        count=n_entries,
+    )
+    values = numpy.fromiter(
+        chain.from_iterable(gradients.values() for gradients in molecule_gradients),
+        dtype=float,
+        count=n_entries,
+    )
+
+    return GradientColumns(
+        keys=keys,
+        smiles=[*smiles_indices],
+        key_indices=key_indices,
+        molecule_indices=molecule_indices,
+        values=values,
+        offsets=_build_offsets(key_indices, len(keys)),
+    )
+
+
+def load_gradient_columns(file_path: str, target_type: str) -> GradientColumns:
+    """Loads the gradients of a given target type from the sparse gradient arrays
+    stored by ``map_raw_gradients`` directly into a set of columnar arrays.
+
+    Parameters
+    ----------
+    file_path
+        The path to the stored sparse gradient arrays.
+    target_type
+        The type of target to load the gradients of.
+
+    Returns
+    -------
+        The columnar gradients.
+    """
+
+    with numpy.load(file_path) as data:
+
+        target_types = [*data["target_types"]]
+
+        if target_type not in target_types:
+
+            raise KeyError(
+                f"{file_path} does not contain any gradients for {target_type} targets."
+            )
+
+        entry_mask = data["type_indices"] == target_types.index(target_type)
+
+        parameter_indices, key_indices = numpy.unique(
+            data["parameter_indices"][entry_mask], return_inverse=True
+        )
+
+        keys = [
+            (
+                str(data["parameter_ids"][index]),
+                str(data["parameter_attributes"][index]),
+            )
+            for index in parameter_indices
+        ]
+
+        # The stored entries are already sorted by type, parameter and then molecule
+        # and so the entries of each key are contiguous.
+        return GradientColumns(
+            keys=keys,
+            smiles=[*map(str, data["smiles"])],
+            key_indices=key_indices,
+            molecule_indices=data["molecule_indices"][entry_mask].astype(int),
+            values=data["values"][entry_mask],
+            offsets=_build_offsets(key_indices, len(keys)),
+        )
+
+
+def select_indices(
+    values: numpy.ndarray, k: Optional[int], order: QueryOrder
+) -> numpy.ndarray:
+    """Returns the indices of the ``k`` largest, smallest or largest in magnitude
+    values, sorted in that order. A partial partition is used so that the cost
+    scales with ``k`` rather than with the total number of values.
+
+    Parameters
+    ----------
+    values
+        The values to select from.
+    k
+        The number of indices to return. If ``None``, the indices of all the values
+        will be returned.
+    order
+        Whether to select the ``"largest"``, ``"smallest"`` or ``"absolute"``
+        largest values.
+
+    Returns
+    -------
+        The selected indices.
+    """
+
+    if order == "largest":
+        sort_keys = -values
+    elif order == "smallest":
+        sort_keys = values
+    elif order == "absolute":
+        sort_keys = -numpy.abs(values)
+    else:
+        raise NotImplementedError()
+
+    if k is not None and k <= 0:
+        return numpy.array([], dtype=int)
+
+    if k is not None and k < len(sort_keys):
+        indices = numpy.argpartition(sort_keys, k - 1)[:k]
+    else:
+        indices = numpy.arange(len(sort_keys))
+
+    return indices[numpy.argsort(sort_keys[indices], kind="stable")]
+
+
+def query_gradients(
+    columns: GradientColumns,
+    parameter_id: Optional[str] = None,
+    attribute: Optional[str] = None,
+    k: Optional[int] = None,
+    order: QueryOrder = "absolute",
+    threshold: Optional[float] = None,
+) -> List[GradientEntry]:
+    """Finds the per-molecule gradients which contribute most to the gradient w.r.t.
+    a (set of) parameter attribute(s).
+
+    Parameters
+    ----------
+    columns
+        The columnar gradients to query.
+    parameter_id
+        The id of the parameter to restrict the query to. If ``None``, all
+        parameters will be considered.
+    attribute
+        The parameter attribute to restrict the query to. If ``None``, all
+        attributes will be considered.
+    k
+        The maximum number of gradients to return.
+    order
+        Whether to return the ``"largest"``, ``"smallest"`` or ``"absolute"``
+        largest gradients.
+    threshold
+        An optional threshold which the absolute value of a gradient must be
+        greater than or equal to in order to be returned.
+
+    Returns
+    -------
+        The selected gradients sorted by ``order``.
+    """
+
+    key_mask = numpy.array(
+        [
+            (parameter_id is None or key_id == parameter_id)
+            and (attribute is None or key_attribute == attribute)
+            for key_id, key_attribute in columns.keys
+        ],
+        dtype=bool,
+    )
+
+    if len(key_mask) == 0 or not key_mask.any():
+        return []
+
+    entry_indices = numpy.concatenate(
+        [
+            numpy.arange(columns.offsets[index], columns.offsets[index + 1])
+            for index in numpy.flatnonzero(key_mask)
+        ]
+    )
+
+    if threshold is not None:
+
+        entry_indices = entry_indices[
+            numpy.abs(columns.values[entry_indices]) >= threshold
+        ]
+
+    entry_indices = entry_indices[
+        select_indices(columns.values[entry_indices], k, order)
+    ]
+
+    return [
+        GradientEntry(
+            id=columns.keys[columns.key_indices[index]][0],
+            attribute=columns.keys[columns.key_indices[index]][1],
+            smiles=columns.smiles[columns.molecule_indices[index]],
+            value=columns.values[index],
+        )
+        for index in entry_indices
+    ]
+
+
+def query_parameters(
+    target: AnalysedTarget,
+    k: Optional[int] = None,
+    order: QueryOrder = "absolute",
+    statistic: SummaryStatistic = "sum",
+    threshold: Optional[float] = None,
+) -> List[ParameterGradientSummary]:
+    """Finds the parameter attributes with the largest / smallest value of a summary
+    statistic of their per-molecule gradients.
+
+    Parameters
+    ----------
+    target
+        The analysed target to query.
+    k
+        The maximum number of parameters to return.
+    order
+        Whether to return the ``"largest"``, ``"smallest"`` or ``"absolute"``
+        largest values of the statistic.
+    statistic
+        The summary statistic to rank the parameters by.
+    threshold
+        An optional threshold which the absolute value of the statistic must be
+        greater than or equal to in order for a parameter to be returned.
+
+    Returns
+    -------
+        The summaries of the selected parameters sorted by ``order``.
+    """
+
+    if len(target.summary) == 0 and len(target.gradients) > 0:
+
+        raise ValueError(
+            "The target does not contain any summary statistics. The output may need "
+            "to be re-generated using a newer version of `graffan analyse`."
+        )
+
+    summaries = target.summary
+
+    values = numpy.array(
+        [getattr(summary, statistic) for summary in summaries], dtype=float
+    )
+
+    indices = numpy.arange(len(summaries))
+
+    if threshold is not None:
+        indices = indices[numpy.abs(values) >= threshold]
+
+    indices = indices[select_indices(values[indices], k, order)]
+
+    return [summaries[index] for index in indices]
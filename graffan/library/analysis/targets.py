@@ -1,14 +1,27 @@
 import errno
+import hashlib
+import json
 import logging
 import os
 from collections import defaultdict
-from typing import List
+from typing import List, NamedTuple, Optional, Tuple
 
 import numpy
+from numpy.lib.format import open_memmap
+from pydantic import parse_file_as
 
-from graffan.library.models.analysis import AnalysedTarget
+from graffan.library.analysis.matches import build_match_index
+from graffan.library.models.analysis import (
+    AnalysedIteration,
+    AnalysedTarget,
+    ParameterGradientSummary,
+    RawGradientMetadata,
+    TargetError,
+)
+from graffan.library.models.smirnoff import SMIRNOFFParameter
 from graffan.library.models.targets import FittingTarget, MultiMoleculeTarget
 from graffan.utilities.forcebalance import (
+    extract_prior_widths,
     extract_target_parameters,
     extract_targets,
     load_fb_force_field,
@@ -17,6 +30,48 @@ from graffan.utilities.forcebalance import (
 
 logger = logging.getLogger(__name__)
 
+TARGET_TYPES = {
+    "TorsionProfile_SMIRNOFF": "torsion",
+    "VIBRATION_SMIRNOFF": "vibration",
+    "OptGeoTarget_SMIRNOFF": "optgeo",
+}
+SUPPORTED_TARGET_TYPES = ["TorsionProfile_SMIRNOFF", "VIBRATION_SMIRNOFF"]
+
+MVAL_GRADIENTS_FILE_NAME = "mval_gradients.npy"
+JACOBIAN_FILE_NAME = "jacobian.npy"
+METADATA_FILE_NAME = "metadata.json"
+ERRORS_FILE_NAME = "errors.json"
+COMPLETED_FILE_NAME = "completed.npy"
+MAPPED_GRADIENTS_FILE_NAME = "mapped_gradients.npz"
+
+
+class RawGradients(NamedTuple):
+    """The raw gradients of a set of fitting targets w.r.t. the ForceBalance
+    mathematical parameters, as well as the information needed to map them onto
+    the physical parameters."""
+
+    iteration: int
+    """The optimization iteration which the gradients were taken from."""
+
+    targets: List[FittingTarget]
+    """The fitting targets which correspond to each row of ``mval_gradients``."""
+    parameters: List[SMIRNOFFParameter]
+    """The refit parameters which correspond to each row of ``jacobian``."""
+
+    mval_gradients: numpy.ndarray
+    """The (n_targets, n_mvals) matrix of gradients w.r.t. mathematical parameters."""
+    jacobian: numpy.ndarray
+    """The (n_pvals, n_mvals) matrix which maps mathematical gradients to physical
+    gradients."""
+
+    errors: List[TargetError]
+    """Any targets whose gradients could not be extracted. The gradients of these
+    targets will be zero."""
+
+    prior_widths: Optional[numpy.ndarray] = None
+    """The width of the prior of each of the refit ``parameters``. If ``None``, a
+    width of one is assumed for each parameter."""
+
 
 def extract_target_gradients(
     target_directory: str, target: FittingTarget
@@ -41,7 +96,7 @@ def extract_target_gradients(
     if not (os.path.isfile(output_path)):
         raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), output_path)
 
-    if target.type in ["TorsionProfile_SMIRNOFF", "VIBRATION_SMIRNOFF"]:
+    if target.type in SUPPORTED_TARGET_TYPES:
         pass
 
     else:
@@ -51,89 +106,986 @@ def extract_target_gradients(
     return output_dictionary["G"]
 
 
-def analyze_targets(root_directory: str, iteration: int) -> List[AnalysedTarget]:
-    """Analyses the outputs of a set of fitting targets found within a ForceBalance
-    fitting directory at a particular iteration.
+def extract_target_smiles(target: FittingTarget) -> str:
+    """Returns the SMILES pattern of the molecule which a fitting target was
+    computed for.
 
     Parameters
     ----------
-    root_directory
-        The directory containing the fitting inputs and outputs.
-    iteration
-        The iteration to analyze.
+    target
+        The fitting target of interest.
 
     Returns
     -------
-        A set of analyzed results for each type of fitting target.
+        The SMILES pattern of the molecule.
     """
 
-    iteration_string = "iter_" + str(iteration).zfill(4)
+    if isinstance(target, MultiMoleculeTarget):
+
+        if len(target.molecules) != 1:
+            raise NotImplementedError()
+
+        return target.molecules[0]
+
+    return target.molecule
+
+
+def extract_target_weight(target: FittingTarget) -> float:
+    """Returns the weight of a fitting target, as set by its ``weight`` option in
+    the main ForceBalance options file. Targets without the option have a weight of
+    one, matching the ForceBalance default.
+
+    Parameters
+    ----------
+    target
+        The fitting target of interest.
+
+    Returns
+    -------
+        The weight of the target.
+    """
+    return float(target.options.get("weight", 1.0))
+
+
+def _mean_target_weights(
+    type_indices: numpy.ndarray, molecule_indices: numpy.ndarray, weights: numpy.ndarray
+) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """Computes the mean weight of the targets of each type which were computed for
+    each molecule.
+
+    Returns
+    -------
+        The index of the type, the index of the molecule and the mean weight of each
+        unique type and molecule pair.
+    """
+
+    n_molecules = int(molecule_indices.max(initial=-1)) + 1
+
+    keys = type_indices.astype(numpy.int64) * n_molecules + molecule_indices
+    unique_keys, key_indices = numpy.unique(keys, return_inverse=True)
+
+    key_indices = key_indices.reshape(-1)
+
+    mean_weights = numpy.bincount(key_indices, weights=weights) / numpy.bincount(
+        key_indices
+    )
+
+    return unique_keys // n_molecules, unique_keys % n_molecules, mean_weights
+
+
+class _GradientEntries(NamedTuple):
+    """A sparse representation of a set of per-molecule gradients, sorted by a single
+    integer key which encodes the target type, parameter and molecule of each
+    gradient (see ``_encode_keys``)."""
+
+    keys: numpy.ndarray
+
+    values: numpy.ndarray
+    weighted_values: numpy.ndarray
+    prior_scaled_values: numpy.ndarray
+
+
+_VALUE_FIELDS = ("values", "weighted_values", "prior_scaled_values")
+
+
+def _encode_keys(
+    type_indices: numpy.ndarray,
+    parameter_indices: numpy.ndarray,
+    molecule_indices: numpy.ndarray,
+    n_parameters: int,
+    n_molecules: int,
+) -> numpy.ndarray:
+    """Encodes the target type, parameter and molecule of a set of gradients as a
+    single integer key, such that sorting by key sorts by target type, then parameter
+    and then molecule."""
+
+    keys = type_indices.astype(numpy.int64) * n_parameters + parameter_indices
+    return keys * n_molecules + molecule_indices
+
+
+def _decode_keys(
+    keys: numpy.ndarray, n_parameters: int, n_molecules: int
+) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """Decodes a set of keys created using ``_encode_keys`` into the index of the
+    target type, parameter and molecule of each."""
+
+    return (
+        keys // n_molecules // n_parameters,
+        keys // n_molecules % n_parameters,
+        keys % n_molecules,
+    )
+
+
+def estimate_chunk_size(memory_budget: int, n_mvals: int, n_pvals: int) -> int:
+    """Estimates the number of targets which can be mapped at once while keeping the
+    memory used by the intermediate arrays within a given budget.
+
+    Notes
+    -----
+    * The budget only covers the arrays used to map a single chunk of targets. The
+      sparse gradients retained from each chunk until they are merged, the merged
+      gradients themselves, and the nested gradient dictionaries and JSON built from
+      them are not included, as their size is set by the number of non-zero
+      gradients rather than by the number of targets mapped at once.
+
+    Parameters
+    ----------
+    memory_budget
+        The memory budget [bytes].
+    n_mvals
+        The number of mathematical parameters.
+    n_pvals
+        The number of physical parameters.
+
+    Returns
+    -------
+        The number of targets to map at once.
+    """
+
+    # Each target requires a row of raw gradients, a row of mapped gradients and a
+    # boolean mask. In the worst case every mapped gradient is non-zero, in which
+    # case each also requires its row and column (2 x 8 bytes), an entry key and
+    # three values (4 x 8 bytes), and the sort order, inverse and unique keys used to
+    # sum the entries of the same molecule (3 x 8 bytes).
+    bytes_per_entry = 2 * 8 + 4 * 8 + 3 * 8
+    bytes_per_target = 8 * n_mvals + 8 * n_pvals + n_pvals + bytes_per_entry * n_pvals
+
+    return max(1, memory_budget // bytes_per_target)
+
+
+def _extract_fb_inputs(
+    root_directory: str,
+) -> Tuple[List[FittingTarget], List[SMIRNOFFParameter], numpy.ndarray, numpy.ndarray]:
+    """Extracts the supported fitting targets, the refit parameters, the
+    mathematical to physical parameter Jacobian and the prior width of each refit
+    parameter from a ForceBalance fitting directory."""
 
     # Load in the definitions of the refit parameters.
     fb_force_field = load_fb_force_field(root_directory)
 
     parameters = extract_target_parameters(fb_force_field)
     jacobian = mvals_to_pvals_jacobian(fb_force_field)
+    prior_widths = extract_prior_widths(fb_force_field)
+
+    return (
+        _extract_supported_targets(root_directory),
+        parameters,
+        jacobian,
+        prior_widths,
+    )
+
+
+def _extract_supported_targets(root_directory: str) -> List[FittingTarget]:
+    """Extracts the fitting targets of a supported type from a ForceBalance fitting
+    directory."""
 
-    # Determine which targets are present.
-    targets: List[FittingTarget] = extract_targets(root_directory)
+    targets: List[FittingTarget] = []
+    skipped_types = set()
 
-    targets_by_type = defaultdict(list)
+    for target in extract_targets(root_directory):
 
-    for target in targets:
-        targets_by_type[target.type].append(target)
+        if target.type in SUPPORTED_TARGET_TYPES:
+
+            targets.append(target)
+            continue
+
+        if target.type not in skipped_types:
+
+            logger.warning(
+                f"{target.type} targets are not yet supported and will be skipped."
+            )
+            skipped_types.add(target.type)
+
+    return targets
+
+
+def _hash_targets(targets: List[FittingTarget]) -> str:
+    """Returns a hash of a list of fitting targets which can be used to check whether
+    a checkpoint was created for the same targets."""
+
+    return hashlib.sha256(
+        "\n".join(target.json(sort_keys=True) for target in targets).encode()
+    ).hexdigest()
+
+
+def _validate_checkpoint(root_directory: str, iteration: int, output_directory: str):
+    """Raises an exception if the raw gradients checkpointed in an output directory
+    were not extracted from the same iteration and fitting targets that are being
+    resumed."""
+
+    metadata = RawGradientMetadata.parse_file(
+        os.path.join(output_directory, METADATA_FILE_NAME)
+    )
+
+    if metadata.iteration != iteration:
+
+        raise ValueError(
+            f"The checkpoint stored in {output_directory} was created for iteration "
+            f"{metadata.iteration} and so cannot be resumed for iteration {iteration}."
+        )
+
+    if metadata.targets_hash != _hash_targets(
+        _extract_supported_targets(root_directory)
+    ):
+
+        raise ValueError(
+            f"The fitting targets of the checkpoint stored in {output_directory} do "
+            f"not match those found in {root_directory}, and so it cannot be resumed."
+        )
+
+
+def extract_raw_gradients(
+    root_directory: str,
+    iteration: int,
+    output_directory: Optional[str] = None,
+    resume: bool = False,
+    checkpoint_frequency: int = 100,
+) -> RawGradients:
+    """Extracts the raw gradients of each supported fitting target found within a
+    ForceBalance fitting directory at a particular iteration.
+
+    Any targets whose gradients could not be extracted will have their gradients set
+    to zero and be recorded in the ``errors`` of the returned object.
+
+    Parameters
+    ----------
+    root_directory
+        The directory containing the fitting inputs and outputs.
+    iteration
+        The iteration to extract the gradients of.
+    output_directory
+        An optional directory to store the raw gradients in (see
+        ``save_raw_gradients``). If provided, the gradients of each target will be
+        written directly to a memory mapped file rather than being held in memory,
+        and the progress of the extraction periodically checkpointed.
+    resume
+        Whether to resume from the last checkpoint stored in the output directory,
+        only extracting the gradients of targets which have not yet been
+        successfully extracted. A fresh extraction will be started if no
+        checkpoint is found. An exception is raised if the checkpoint was created
+        for a different iteration or set of fitting targets.
+    checkpoint_frequency
+        The number of targets to extract between each checkpoint.
+
+    Returns
+    -------
+        The extracted gradients stacked into a single matrix, along with the
+        Jacobian required to map them onto the physical parameters.
+    """
+
+    iteration_string = "iter_" + str(iteration).zfill(4)
+
+    completed_path = (
+        None
+        if output_directory is None
+        else os.path.join(output_directory, COMPLETED_FILE_NAME)
+    )
+
+    if resume and output_directory is None:
+        raise ValueError("An output directory must be provided in order to resume.")
+
+    if resume and os.path.isfile(completed_path):
+
+        _validate_checkpoint(root_directory, iteration, output_directory)
+
+        raw_gradients = load_raw_gradients(output_directory, mmap_mode="r+")
+
+        targets = raw_gradients.targets
+        parameters = raw_gradients.parameters
+        jacobian = numpy.asarray(raw_gradients.jacobian)
+        prior_widths = raw_gradients.prior_widths
+
+        mval_gradients = raw_gradients.mval_gradients
+        completed = numpy.load(completed_path, mmap_mode="r+")
+
+        logger.info(
+            f"resuming from a checkpoint with {int(completed.sum())} of "
+            f"{len(targets)} targets completed."
+        )
+
+    else:
+
+        if resume:
+            logger.info("no checkpoint was found - starting from scratch.")
+
+        targets, parameters, jacobian, prior_widths = _extract_fb_inputs(root_directory)
+        shape = (len(targets), jacobian.shape[1])
+
+        if output_directory is None:
+
+            mval_gradients = numpy.zeros(shape)
+            completed = numpy.zeros(len(targets), dtype=bool)
+
+        else:
+
+            os.makedirs(output_directory, exist_ok=True)
+
+            _save_raw_gradient_metadata(
+                RawGradients(
+                    iteration=iteration,
+                    targets=targets,
+                    parameters=parameters,
+                    mval_gradients=None,
+                    jacobian=jacobian,
+                    errors=[],
+                    prior_widths=prior_widths,
+                ),
+                output_directory,
+            )
+
+            mval_gradients = open_memmap(
+                os.path.join(output_directory, MVAL_GRADIENTS_FILE_NAME),
+                mode="w+",
+                dtype=float,
+                shape=shape,
+            )
+            completed = open_memmap(
+                completed_path, mode="w+", dtype=bool, shape=(len(targets),)
+            )
 
     # Extract the gradients from each target.
-    analyzed_targets: List[AnalysedTarget] = []
+    errors: List[TargetError] = []
+
+    def checkpoint():
+
+        if output_directory is None:
+            return
+
+        # Make sure the gradients are on disk before they are marked as completed.
+        mval_gradients.flush()
+        completed.flush()
 
-    target_types = {
-        "TorsionProfile_SMIRNOFF": "torsion",
-        "VIBRATION_SMIRNOFF": "vibration",
-        "OptGeoTarget_SMIRNOFF": "optgeo",
-    }
+        _save_target_errors(errors, output_directory)
 
-    for target_type in targets_by_type:
+    n_extracted = 0
 
-        target_gradients = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))
+    for index in numpy.flatnonzero(~completed):
 
-        if target_type not in ["TorsionProfile_SMIRNOFF", "VIBRATION_SMIRNOFF"]:
+        target = targets[index]
+
+        target_directory = os.path.join(
+            root_directory, "optimize.tmp", target.name, iteration_string
+        )
+
+        try:
+            mval_gradients[index, :] = extract_target_gradients(
+                target_directory, target
+            )
+        except Exception as e:
 
             logger.warning(
-                f"{target_type} targets are not yet supported and will be skipped."
+                f"the gradients of {target.name} could not be extracted: {e}"
             )
+
+            mval_gradients[index, :] = 0.0
+            errors.append(
+                TargetError(name=target.name, type=target.type, message=str(e))
+            )
+
             continue
 
-        for target in targets_by_type[target_type]:
+        completed[index] = True
+        n_extracted += 1
+
+        # Only successfully extracted targets count towards the next checkpoint.
+        if n_extracted % checkpoint_frequency == 0:
+            checkpoint()
+
+    checkpoint()
+
+    return RawGradients(
+        iteration=iteration,
+        targets=targets,
+        parameters=parameters,
+        mval_gradients=mval_gradients,
+        jacobian=jacobian,
+        errors=errors,
+        prior_widths=prior_widths,
+    )
+
+
+def _save_raw_gradient_metadata(raw_gradients: RawGradients, directory: str):
+    """Stores the Jacobian and metadata associated with a set of raw gradients."""
+
+    numpy.save(os.path.join(directory, JACOBIAN_FILE_NAME), raw_gradients.jacobian)
 
-            if isinstance(target, MultiMoleculeTarget):
+    metadata = RawGradientMetadata(
+        iteration=raw_gradients.iteration,
+        targets=raw_gradients.targets,
+        refit_parameters=raw_gradients.parameters,
+        targets_hash=_hash_targets(raw_gradients.targets),
+        prior_widths=(
+            []
+            if raw_gradients.prior_widths is None
+            else numpy.asarray(raw_gradients.prior_widths).tolist()
+        ),
+    )
 
-                if len(target.molecules) != 1:
-                    raise NotImplementedError()
+    with open(os.path.join(directory, METADATA_FILE_NAME), "w") as file:
+        file.write(metadata.json(sort_keys=True, indent=2, separators=(",", ": ")))
 
-                smiles = target.molecules[0]
+    _save_target_errors(raw_gradients.errors, directory)
 
-            else:
-                smiles = target.molecule
 
-            # Extract the raw mathematical gradients.
-            target_directory = os.path.join(
-                root_directory, "optimize.tmp", target.name, iteration_string
+def _save_target_errors(errors: List[TargetError], directory: str):
+    """Stores the errors encountered while extracting a set of raw gradients."""
+
+    with open(os.path.join(directory, ERRORS_FILE_NAME), "w") as file:
+        file.write(json.dumps([error.dict() for error in errors], indent=2))
+
+
+def save_raw_gradients(raw_gradients: RawGradients, directory: str):
+    """Stores a set of raw gradients in a directory as a pair of ``.npy`` files (which
+    can be memory mapped when loaded) and a JSON file containing the metadata
+    required to interpret them.
+
+    Parameters
+    ----------
+    raw_gradients
+        The gradients to store.
+    directory
+        The directory to store the gradients in. This will be created if it does not
+        already exist.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+
+    numpy.save(
+        os.path.join(directory, MVAL_GRADIENTS_FILE_NAME), raw_gradients.mval_gradients
+    )
+    _save_raw_gradient_metadata(raw_gradients, directory)
+
+
+def load_raw_gradients(directory: str, mmap_mode: Optional[str] = "r") -> RawGradients:
+    """Loads a set of raw gradients which were stored using ``save_raw_gradients``.
+
+    Parameters
+    ----------
+    directory
+        The directory containing the stored gradients.
+    mmap_mode
+        The mode to memory map the stored arrays with. See ``numpy.load`` for
+        details. If ``None`` the arrays will be read fully into memory.
+
+    Returns
+    -------
+        The loaded gradients.
+    """
+
+    metadata = RawGradientMetadata.parse_file(
+        os.path.join(directory, METADATA_FILE_NAME)
+    )
+
+    errors_path = os.path.join(directory, ERRORS_FILE_NAME)
+
+    errors = (
+        []
+        if not os.path.isfile(errors_path)
+        else parse_file_as(List[TargetError], errors_path)
+    )
+
+    return RawGradients(
+        iteration=metadata.iteration,
+        targets=metadata.targets,
+        parameters=metadata.refit_parameters,
+        mval_gradients=numpy.load(
+            os.path.join(directory, MVAL_GRADIENTS_FILE_NAME), mmap_mode=mmap_mode
+        ),
+        jacobian=numpy.load(
+            os.path.join(directory, JACOBIAN_FILE_NAME), mmap_mode=mmap_mode
+        ),
+        errors=errors,
+        prior_widths=(
+            None
+            if len(metadata.prior_widths) == 0
+            else numpy.array(metadata.prior_widths)
+        ),
+    )
+
+
+def _merge_gradient_entries(entries: _GradientEntries) -> _GradientEntries:
+    """Sums any gradients in a set of sparse gradients which share the same key, i.e.
+    which are of the same target type and are w.r.t. the same molecule and
+    parameter. The merged entries are sorted by key.
+    """
+
+    unique_keys, key_indices = numpy.unique(entries.keys, return_inverse=True)
+    key_indices = key_indices.reshape(-1)
+
+    return _GradientEntries(
+        keys=unique_keys,
+        **{
+            field: numpy.bincount(
+                key_indices,
+                weights=getattr(entries, field),
+                minlength=len(unique_keys),
             )
-            target_mval_gradients = extract_target_gradients(target_directory, target)
+            for field in _VALUE_FIELDS
+        },
+    )
+
+
+def _map_gradient_chunk(
+    mval_gradients: numpy.ndarray,
+    jacobian: numpy.ndarray,
+    target_type_indices: numpy.ndarray,
+    target_molecule_indices: numpy.ndarray,
+    target_weights: numpy.ndarray,
+    prior_widths: numpy.ndarray,
+    threshold: float,
+    n_molecules: int,
+) -> _GradientEntries:
+    """Maps the raw gradients of a chunk of targets onto the physical parameters,
+    and sums the gradients of any targets which were computed for the same molecule.
+    The weighted and prior scaled variants of each non-zero gradient are computed
+    alongside it.
+    """
+
+    # Map the FB mathematical gradients to physical gradients.
+    pval_gradients = numpy.asarray(mval_gradients) @ jacobian.T
+
+    rows, columns = numpy.nonzero(numpy.abs(pval_gradients) > threshold)
+    values = pval_gradients[rows, columns]
+
+    entries = _GradientEntries(
+        keys=_encode_keys(
+            target_type_indices[rows],
+            columns,
+            target_molecule_indices[rows],
+            pval_gradients.shape[1],
+            n_molecules,
+        ),
+        values=values,
+        weighted_values=values * target_weights[rows],
+        prior_scaled_values=values * prior_widths[columns],
+    )
+
+    return _merge_gradient_entries(entries)
+
+
+def _save_mapped_gradients(
+    entries: _GradientEntries,
+    smiles: List[str],
+    parameters: List[SMIRNOFFParameter],
+    file_path: str,
+):
+    """Stores a set of merged sparse gradients as a set of flat arrays which can be
+    queried without re-building the nested gradient dictionaries. The file contains
+    the ``smiles``, ``parameter_ids``, ``parameter_attributes`` and analysed
+    ``target_types`` which are indexed into by the ``molecule_indices``,
+    ``parameter_indices`` and ``type_indices`` of each gradient entry, as well as the
+    ``values``, ``weighted_values`` and ``prior_scaled_values`` of each entry. Only
+    target types with at least one gradient entry are stored.
+    """
+
+    type_indices, parameter_indices, molecule_indices = _decode_keys(
+        entries.keys, len(parameters), len(smiles)
+    )
+
+    present_type_indices, type_indices = numpy.unique(type_indices, return_inverse=True)
+
+    numpy.savez(
+        file_path,
+        smiles=numpy.array(smiles, dtype=str),
+        parameter_ids=numpy.array(
+            [parameter.id for parameter in parameters], dtype=str
+        ),
+        parameter_attributes=numpy.array(
+            [parameter.attribute for parameter in parameters], dtype=str
+        ),
+        target_types=numpy.array(
+            [
+                TARGET_TYPES[SUPPORTED_TARGET_TYPES[type_index]]
+                for type_index in present_type_indices
+            ],
+            dtype=str,
+        ),
+        type_indices=type_indices.reshape(-1),
+        parameter_indices=parameter_indices,
+        molecule_indices=molecule_indices,
+        **{field: getattr(entries, field) for field in _VALUE_FIELDS},
+    )
+
+
+def summarize_gradients(
+    parameter_indices: numpy.ndarray,
+    values: numpy.ndarray,
+    parameters: List[SMIRNOFFParameter],
+) -> List[ParameterGradientSummary]:
+    """Computes summary statistics of a set of per-molecule gradients w.r.t. each
+    parameter attribute.
+
+    Parameters
+    ----------
+    parameter_indices
+        The index into ``parameters`` of each per-molecule gradient.
+    values
+        The value of each per-molecule gradient.
+    parameters
+        The parameters which the gradients are w.r.t.
+
+    Returns
+    -------
+        The summary statistics of each parameter attribute with at least one
+        gradient.
+    """
+
+    n_parameters = len(parameters)
+
+    n_molecules = numpy.bincount(parameter_indices, minlength=n_parameters)
+    columns = numpy.flatnonzero(n_molecules)
+
+    if len(columns) == 0:
+        return []
+
+    sums = numpy.bincount(parameter_indices, weights=values, minlength=n_parameters)
+    means = sums / numpy.maximum(n_molecules, 1)
+
+    variances = numpy.bincount(
+        parameter_indices,
+        weights=(values - means[parameter_indices]) ** 2,
+        minlength=n_parameters,
+    ) / numpy.maximum(n_molecules, 1)
+
+    l1_norms = numpy.bincount(
+        parameter_indices, weights=numpy.abs(values), minlength=n_parameters
+    )
+    l2_norms = numpy.sqrt(
+        numpy.bincount(parameter_indices, weights=values**2, minlength=n_parameters)
+    )
+
+    # Compute the quantiles of each parameter by linearly interpolating between the
+    # sorted values, matching the default behaviour of ``numpy.quantile``.
+    sorted_values = values[numpy.lexsort((values, parameter_indices))]
+    offsets = numpy.concatenate([[0], numpy.cumsum(n_molecules)])
+
+    positions = numpy.outer(
+        numpy.array([0.0, 0.25, 0.5, 0.75, 1.0]), n_molecules[columns] - 1
+    )
+    lower = numpy.floor(positions).astype(int)
+    upper = numpy.ceil(positions).astype(int)
+
+    lower_values = sorted_values[offsets[columns] + lower]
+    upper_values = sorted_values[offsets[columns] + upper]
+
+    quantiles = lower_values + (positions - lower) * (upper_values - lower_values)
+
+    return [
+        ParameterGradientSummary(
+            id=parameters[column].id,
+            attribute=parameters[column].attribute,
+            n_molecules=n_molecules[column],
+            sum=sums[column],
+            mean=means[column],
+            std=numpy.sqrt(variances[column]),
+            l1_norm=l1_norms[column],
+            l2_norm=l2_norms[column],
+            minimum=quantiles[0, i],
+            lower_quartile=quantiles[1, i],
+            median=quantiles[2, i],
+            upper_quartile=quantiles[3, i],
+            maximum=quantiles[4, i],
+        )
+        for i, column in enumerate(columns)
+    ]
+
+
+def map_raw_gradients(
+    raw_gradients: RawGradients,
+    threshold: float = 1.0e-8,
+    chunk_size: Optional[int] = None,
+    mapped_gradients_path: Optional[str] = None,
+) -> List[AnalysedTarget]:
+    """Maps a set of raw gradients w.r.t. the mathematical parameters onto the
+    physical parameters and collects them by target type.
+
+    Parameters
+    ----------
+    raw_gradients
+        The raw gradients to map.
+    threshold
+        Gradients with an absolute value less than or equal to this threshold will
+        be treated as zero and not stored.
+    chunk_size
+        The number of targets to map at once. If ``None`` all targets will be
+        mapped at once.
+    mapped_gradients_path
+        An optional path to also store the mapped gradients at as a set of flat,
+        sparse arrays (see ``load_gradient_columns``).
+
+    Returns
+    -------
+        A set of analyzed results for each type of fitting target.
+    """
+
+    n_targets = len(raw_gradients.targets)
+    n_parameters = len(raw_gradients.parameters)
+
+    prior_widths = (
+        numpy.ones(n_parameters)
+        if raw_gradients.prior_widths is None
+        else numpy.asarray(raw_gradients.prior_widths, dtype=float)
+    )
 
-            # Map the FB mathematical gradients to physical gradients.
-            target_pval_gradients = jacobian @ target_mval_gradients
+    # Assign each molecule a single integer id up front so that the gradients of
+    # each chunk can be merged without comparing SMILES patterns.
+    smiles, target_molecule_indices = numpy.unique(
+        [extract_target_smiles(target) for target in raw_gradients.targets],
+        return_inverse=True,
+    )
+    smiles = smiles.tolist()
+    n_molecules = len(smiles)
 
-            # Store the gradients.
-            for parameter, gradient in zip(parameters, target_pval_gradients):
+    target_molecule_indices = target_molecule_indices.reshape(-1).astype(int)
+    target_type_indices = numpy.array(
+        [SUPPORTED_TARGET_TYPES.index(target.type) for target in raw_gradients.targets],
+        dtype=int,
+    )
+    target_weights = numpy.array(
+        [extract_target_weight(target) for target in raw_gradients.targets],
+        dtype=float,
+    )
 
-                if not numpy.isclose(gradient, 0.0):
-                    target_gradients[parameter.id][parameter.attribute][
-                        smiles
-                    ] += gradient
+    chunk_size = n_targets if chunk_size is None else chunk_size
+
+    # Only the sparse gradients of each chunk are retained, and are merged once all
+    # chunks have been mapped, so that the dense mapped gradients of at most a single
+    # chunk are held in memory at once.
+    chunks: List[_GradientEntries] = []
+
+    for chunk_start in range(0, n_targets, max(chunk_size, 1)):
+
+        chunk_slice = slice(chunk_start, chunk_start + chunk_size)
+
+        chunks.append(
+            _map_gradient_chunk(
+                raw_gradients.mval_gradients[chunk_slice],
+                raw_gradients.jacobian,
+                target_type_indices[chunk_slice],
+                target_molecule_indices[chunk_slice],
+                target_weights[chunk_slice],
+                prior_widths,
+                threshold,
+                n_molecules,
+            )
+        )
+
+    entries = _merge_gradient_entries(
+        _GradientEntries(
+            keys=numpy.concatenate(
+                [numpy.zeros(0, dtype=numpy.int64), *(chunk.keys for chunk in chunks)]
+            ),
+            **{
+                field: numpy.concatenate(
+                    [numpy.zeros(0), *(getattr(chunk, field) for chunk in chunks)]
+                )
+                for field in _VALUE_FIELDS
+            },
+        )
+    )
+
+    if mapped_gradients_path is not None:
+
+        _save_mapped_gradients(
+            entries, smiles, raw_gradients.parameters, mapped_gradients_path
+        )
+
+    entry_type_indices, entry_parameter_indices, entry_molecule_indices = _decode_keys(
+        entries.keys, n_parameters, n_molecules
+    )
+
+    # Collect the gradients by target type in the order the types first appear.
+    target_types = [*dict.fromkeys(target.type for target in raw_gradients.targets)]
+
+    # Targets whose gradients could not be extracted should not contribute to the
+    # mean weight of the targets computed for a molecule.
+    failed_names = {error.name for error in raw_gradients.errors}
+    succeeded = numpy.array(
+        [target.name not in failed_names for target in raw_gradients.targets],
+        dtype=bool,
+    )
+
+    weight_type_indices, weight_molecule_indices, weights = _mean_target_weights(
+        target_type_indices[succeeded],
+        target_molecule_indices[succeeded],
+        target_weights[succeeded],
+    )
+
+    analyzed_targets: List[AnalysedTarget] = []
+
+    for target_type in target_types:
+
+        type_mask = entry_type_indices == SUPPORTED_TARGET_TYPES.index(target_type)
+
+        molecule_indices = entry_molecule_indices[type_mask]
+        parameter_indices = entry_parameter_indices[type_mask]
+        values = entries.values[type_mask]
+
+        target_gradients, weighted_gradients, prior_scaled_gradients = (
+            defaultdict(lambda: defaultdict(dict)) for _ in range(3)
+        )
+
+        # Store the gradients and their weighted and prior scaled variants.
+        for molecule_index, parameter_index, *variant_values in zip(
+            molecule_indices,
+            parameter_indices,
+            values,
+            entries.weighted_values[type_mask],
+            entries.prior_scaled_values[type_mask],
+        ):
+
+            parameter = raw_gradients.parameters[parameter_index]
+
+            for gradients, value in zip(
+                (target_gradients, weighted_gradients, prior_scaled_gradients),
+                variant_values,
+            ):
+                gradients[parameter.id][parameter.attribute][
+                    smiles[molecule_index]
+                ] = value
+
+        weight_mask = weight_type_indices == SUPPORTED_TARGET_TYPES.index(target_type)
 
         analyzed_targets.append(
-            AnalysedTarget(type=target_types[target_type], gradients=target_gradients)
+            AnalysedTarget(
+                type=TARGET_TYPES[target_type],
+                gradients=target_gradients,
+                weighted_gradients=weighted_gradients,
+                prior_scaled_gradients=prior_scaled_gradients,
+                weights={
+                    smiles[molecule_index]: weight
+                    for molecule_index, weight in zip(
+                        weight_molecule_indices[weight_mask].tolist(),
+                        weights[weight_mask].tolist(),
+                    )
+                },
+                summary=summarize_gradients(
+                    parameter_indices, values, raw_gradients.parameters
+                ),
+            )
         )
 
     return analyzed_targets
+
+
+def analyze_iteration(
+    root_directory: str,
+    iteration: int,
+    output_directory: Optional[str] = None,
+    memory_budget: Optional[int] = None,
+    resume: bool = False,
+    match_parameters: bool = True,
+    max_workers: Optional[int] = None,
+) -> AnalysedIteration:
+    """Analyses the outputs of a set of fitting targets found within a ForceBalance
+    fitting directory at a particular iteration.
+
+    Parameters
+    ----------
+    root_directory
+        The directory containing the fitting inputs and outputs.
+    iteration
+        The iteration to analyze.
+    output_directory
+        An optional directory to store the raw gradient matrix and Jacobian in so
+        that they can later be re-mapped without re-loading the ForceBalance
+        outputs (see ``load_raw_gradients`` and ``map_raw_gradients``). The
+        extraction of the raw gradients will be periodically checkpointed to this
+        directory.
+    memory_budget
+        An optional budget [bytes] for the memory used by the intermediate arrays
+        while mapping the raw gradients. If provided, the targets will be mapped in
+        chunks whose size is chosen to fit within the budget. See
+        ``estimate_chunk_size`` for what the budget does and does not cover.
+    resume
+        Whether to resume from the last checkpoint stored in the output directory.
+    match_parameters
+        Whether to find which atoms of each molecule are matched by the SMIRKS
+        pattern of each refit parameter (see ``build_match_index``).
+    max_workers
+        The maximum number of processes to use when matching the refit parameters.
+
+    Returns
+    -------
+        The analysed iteration, including any targets which could not be analysed.
+    """
+
+    raw_gradients = extract_raw_gradients(
+        root_directory, iteration, output_directory, resume
+    )
+
+    mapped_gradients_path = (
+        None
+        if output_directory is None
+        else os.path.join(output_directory, MAPPED_GRADIENTS_FILE_NAME)
+    )
+
+    if memory_budget is None:
+
+        analysed_targets = map_raw_gradients(
+            raw_gradients, mapped_gradients_path=mapped_gradients_path
+        )
+
+    else:
+
+        chunk_size = estimate_chunk_size(
+            memory_budget,
+            raw_gradients.jacobian.shape[1],
+            raw_gradients.jacobian.shape[0],
+        )
+
+        analysed_targets = map_raw_gradients(
+            raw_gradients,
+            chunk_size=chunk_size,
+            mapped_gradients_path=mapped_gradients_path,
+        )
+
+    parameter_matches = (
+        {}
+        if not match_parameters
+        else build_match_index(raw_gradients.parameters, analysed_targets, max_workers)
+    )
+
+    return AnalysedIteration(
+        iteration=iteration,
+        refit_parameters=raw_gradients.parameters,
+        targets=analysed_targets,
+        errors=raw_gradients.errors,
+        parameter_matches=parameter_matches,
+    )
+
+
+def analyze_targets(
+    root_directory: str,
+    iteration: int,
+    output_directory: Optional[str] = None,
+    memory_budget: Optional[int] = None,
+) -> List[AnalysedTarget]:
+    """Analyses the outputs of a set of fitting targets found within a ForceBalance
+    fitting directory at a particular iteration.
+
+    Parameters
+    ----------
+    root_directory
+        The directory containing the fitting inputs and outputs.
+    iteration
+        The iteration to analyze.
+    output_directory
+        An optional directory to store the raw gradient matrix and Jacobian in (see
+        ``analyze_iteration``).
+    memory_budget
+        An optional budget [bytes] for the memory used while mapping the raw
+        gradients (see ``analyze_iteration``).
+
+    Returns
+    -------
+        A set of analyzed results for each type of fitting target.
+    """
+
+    return analyze_iteration(
+        root_directory,
+        iteration,
+        output_directory,
+        memory_budget,
+        match_parameters=False,
+    ).targets
@@ -0,0 +1,158 @@
+import functools
+import os
+import re
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy
+
+from graffan.library.analysis.targets import (
+    METADATA_FILE_NAME,
+    TARGET_TYPES,
+    RawGradients,
+    extract_target_smiles,
+    load_raw_gradients,
+)
+
+ITERATION_FILE_PATTERN = re.compile(r"^iteration_(\d+)\.json$")
+
+
+class _RawGradientIndex(NamedTuple):
+    """Memory mapped raw gradients together with lookups from a molecule and
+    parameter onto the rows of the gradient and Jacobian matrices."""
+
+    raw_gradients: RawGradients
+
+    target_rows: Dict[Tuple[str, str], numpy.ndarray]
+    """The rows of ``mval_gradients`` associated with each (target type, smiles)."""
+    parameter_rows: Dict[Tuple[str, str], int]
+    """The row of ``jacobian`` associated with each (parameter id, attribute)."""
+
+
+def find_iteration_files(directory: str) -> Dict[int, str]:
+    """Finds the ``iteration_XXXX.json`` files created by ``graffan analyse`` in a
+    directory.
+
+    Parameters
+    ----------
+    directory
+        The directory to search.
+
+    Returns
+    -------
+        The path to the file of each iteration, sorted by iteration.
+    """
+
+    iteration_files = {}
+
+    for file_name in os.listdir(directory):
+
+        match = ITERATION_FILE_PATTERN.match(file_name)
+
+        if match is None:
+            continue
+
+        iteration_files[int(match.group(1))] = os.path.join(directory, file_name)
+
+    return {
+        iteration: iteration_files[iteration] for iteration in sorted(iteration_files)
+    }
+
+
+def raw_gradient_directory(iteration_file: str) -> Optional[str]:
+    """Returns the side-car directory containing the raw gradients which were stored
+    alongside an ``iteration_XXXX.json`` file, or ``None`` if there is not one."""
+
+    directory = os.path.splitext(iteration_file)[0]
+
+    return (
+        directory
+        if os.path.isfile(os.path.join(directory, METADATA_FILE_NAME))
+        else None
+    )
+
+
+@functools.lru_cache(maxsize=16)
+def _load_raw_gradient_index(directory: str, modified_time: float) -> _RawGradientIndex:
+
+    raw_gradients = load_raw_gradients(directory, mmap_mode="r")
+
+    target_rows: Dict[Tuple[str, str], list] = {}
+
+    for row, target in enumerate(raw_gradients.targets):
+
+        target_rows.setdefault(
+            (TARGET_TYPES[target.type], extract_target_smiles(target)), []
+        ).append(row)
+
+    parameter_rows = {}
+
+    for row, parameter in enumerate(raw_gradients.parameters):
+        parameter_rows.setdefault((parameter.id, parameter.attribute), row)
+
+    return _RawGradientIndex(
+        raw_gradients=raw_gradients,
+        target_rows={
+            key: numpy.array(rows, dtype=int) for key, rows in target_rows.items()
+        },
+        parameter_rows=parameter_rows,
+    )
+
+
+def extract_raw_gradient(
+    directory: str,
+    target_type: str,
+    parameter_id: str,
+    attribute: str,
+    smiles: str,
+    threshold: float = 1.0e-8,
+) -> Optional[float]:
+    """Computes the gradient of the targets of a given type which were computed for
+    a particular molecule w.r.t. a single parameter attribute directly from a set of
+    stored raw gradients.
+
+    Only the rows of the (memory mapped) gradient and Jacobian matrices which are
+    needed are read, so this is much cheaper than loading the full analysed
+    iteration when only a handful of gradients are required. The value matches the
+    one which ``map_raw_gradients`` would produce.
+
+    Parameters
+    ----------
+    directory
+        The directory containing the raw gradients stored by ``save_raw_gradients``.
+    target_type
+        The type of target (e.g. ``"torsion"``).
+    parameter_id
+        The id of the parameter.
+    attribute
+        The parameter attribute.
+    smiles
+        The molecule of interest.
+    threshold
+        Per-target gradients with an absolute value less than or equal to this
+        threshold will be treated as zero.
+
+    Returns
+    -------
+        The gradient, or ``None`` if there are no targets of this type for the
+        molecule, the parameter attribute was not refit, or all of the per-target
+        gradients are below the threshold (i.e. when ``map_raw_gradients`` would not
+        store a gradient).
+    """
+
+    modified_time = os.path.getmtime(os.path.join(directory, METADATA_FILE_NAME))
+    index = _load_raw_gradient_index(os.path.abspath(directory), modified_time)
+
+    target_rows = index.target_rows.get((target_type, smiles))
+    parameter_row = index.parameter_rows.get((parameter_id, attribute))
+
+    if target_rows is None or parameter_row is None:
+        return None
+
+    values = (
+        numpy.asarray(index.raw_gradients.mval_gradients[target_rows])
+        @ index.raw_gradients.jacobian[parameter_row]
+    )
+
+    values = values[numpy.abs(values) > threshold]
+
+    return None if len(values) == 0 else float(values.sum())
@@ -1,12 +1,14 @@
 from datetime import datetime
-from typing import Dict, List, Literal
+from typing import Dict, List, Literal, Optional, Tuple
 
 from pydantic import BaseModel, Field
 
 from graffan.library.models.smirnoff import SMIRNOFFParameter
+from graffan.library.models.targets import FittingTarget
 from graffan.utilities.provenance import default_analysis_provenance
 
 GradientDictionary = Dict[str, Dict[str, Dict[str, float]]]
+MatchDictionary = Dict[str, Dict[str, List[Tuple[int, ...]]]]
 
 
 class AnalysisProvenance(BaseModel):
@@ -23,6 +25,86 @@ class AnalysisProvenance(BaseModel):
     )
 
 
+class RawGradientMetadata(BaseModel):
+    """A model which stores the information required to interpret the raw gradient
+    matrix and Jacobian which are stored alongside an analysed result."""
+
+    iteration: int = Field(
+        ...,
+        description="The optimization iteration which the gradients were taken "
+        "from.",
+    )
+
+    targets: List[FittingTarget] = Field(
+        ...,
+        description="The fitting targets which correspond to each row of the raw "
+        "gradient matrix.",
+    )
+    refit_parameters: List[SMIRNOFFParameter] = Field(
+        ...,
+        description="The parameters which correspond to each row of the Jacobian.",
+    )
+    targets_hash: Optional[str] = Field(
+        None,
+        description="A SHA256 hash of the fitting targets, used to check that a "
+        "checkpoint is only resumed for the same set of targets.",
+    )
+    prior_widths: List[float] = Field(
+        default_factory=list,
+        description="The width of the prior of each refit parameter. If empty, a "
+        "width of one is assumed for each parameter.",
+    )
+
+
+class TargetError(BaseModel):
+    """A model which stores information about a fitting target which could not be
+    analysed."""
+
+    name: str = Field(..., description="The name of the fitting target.")
+    type: str = Field(..., description="The type of the fitting target.")
+
+    message: str = Field(
+        ..., description="A description of the error which was encountered."
+    )
+
+
+class ParameterGradientSummary(BaseModel):
+    """A model which stores summary statistics of the per-molecule gradients of a
+    fitting target type w.r.t. a single parameter attribute."""
+
+    id: str = Field(..., description="The unique ID associated with the parameter.")
+    attribute: str = Field(
+        ..., description="The attribute of the parameter the gradients are w.r.t."
+    )
+
+    n_molecules: int = Field(
+        ..., description="The number of molecules with a non-zero gradient."
+    )
+
+    sum: float = Field(..., description="The sum of the per-molecule gradients.")
+    mean: float = Field(..., description="The mean of the per-molecule gradients.")
+    std: float = Field(
+        ..., description="The standard deviation of the per-molecule gradients."
+    )
+
+    l1_norm: float = Field(
+        ..., description="The L1 norm of the per-molecule gradients."
+    )
+    l2_norm: float = Field(
+        ..., description="The L2 norm of the per-molecule gradients."
+    )
+
+    minimum: float = Field(..., description="The smallest per-molecule gradient.")
+    lower_quartile: float = Field(
+        ..., description="The 25th percentile of the per-molecule gradients."
+    )
+    median: float = Field(..., description="The median of the per-molecule gradients.")
+    upper_quartile: float = Field(
+        ..., description="The 75th percentile of the per-molecule gradients."
+    )
+    maximum: float = Field(..., description="The largest per-molecule gradient.")
+
+
 class AnalysedTarget(BaseModel):
     """A model which stores the analysed output of a fitting target. Currently this
     only contains information about per-molecule gradients."""
@@ -35,6 +117,34 @@ class AnalysedTarget(BaseModel):
         description="The gradients stored in a dictionary of the form: "
         "``gradients[param_id][param_attr][smiles] = value``.",
     )
+    weights: Dict[str, float] = Field(
+        default_factory=dict,
+        description="The ``weight`` option of the fitting targets of this type which "
+        "were computed for each molecule, stored in a dictionary of the form: "
+        "``weights[smiles] = weight``. Where more than one target was computed for a "
+        "molecule the mean of their weights is stored. Molecules without an entry "
+        "have a weight of one.",
+    )
+
+    weighted_gradients: GradientDictionary = Field(
+        default_factory=dict,
+        description="The gradients of each target multiplied by its ``weight`` "
+        "option before being summed over the targets computed for each molecule, "
+        "stored in the same form as ``gradients``.",
+    )
+    prior_scaled_gradients: GradientDictionary = Field(
+        default_factory=dict,
+        description="The gradients multiplied by the width of the prior of the "
+        "parameter they are w.r.t., i.e. the change in the objective function per "
+        "prior width change in the parameter, stored in the same form as "
+        "``gradients``.",
+    )
+
+    summary: List[ParameterGradientSummary] = Field(
+        default_factory=list,
+        description="Summary statistics of the gradients w.r.t. each parameter "
+        "attribute which has at least one non-zero gradient.",
+    )
 
 
 class AnalysedIteration(BaseModel):
@@ -55,3 +165,16 @@ class AnalysedIteration(BaseModel):
     targets: List[AnalysedTarget] = Field(
         ..., description="The analysed outputs of each target type."
     )
+
+    errors: List[TargetError] = Field(
+        default_factory=list,
+        description="Any fitting targets which could not be analysed and so were not "
+        "included in the analysed outputs.",
+    )
+
+    parameter_matches: MatchDictionary = Field(
+        default_factory=dict,
+        description="The atoms of each molecule matched by the SMIRKS pattern of each "
+        "refit parameter, stored in a dictionary of the form: "
+        "``parameter_matches[param_id][smiles] = [(atom_index_1, ...), ...]``.",
+    )
@@ -14,3 +14,37 @@ def test_analyze(force_balance_directory, runner):
             raise result.exception
 
         assert os.path.isfile("iteration_0000.json")
+
+        assert os.path.isfile(os.path.join("iteration_0000", "mval_gradients.npy"))
+        assert os.path.isfile(os.path.join("iteration_0000", "jacobian.npy"))
+
+
+def test_analyze_resume(force_balance_directory, runner):
+
+    with temporary_cd(force_balance_directory):
+
+        result = runner.invoke(analyse_cli)
+
+        if result.exit_code != 0:
+            raise result.exception
+
+        result = runner.invoke(analyse_cli, ["--resume"])
+
+        if result.exit_code != 0:
+            raise result.exception
+
+        assert os.path.isfile(os.path.join("iteration_0000", "completed.npy"))
+
+
+def test_analyze_prerender_images(force_balance_directory, runner):
+
+    with temporary_cd(force_balance_directory):
+
+        result = runner.invoke(
+            analyse_cli, ["--prerender-images", "--max-workers", "1"]
+        )
+
+        if result.exit_code != 0:
+            raise result.exception
+
+        assert len(os.listdir(os.path.join("iteration_0000", "images"))) > 0
@@ -0,0 +1,118 @@
+import os
+
+import numpy
+import pytest
+
+from graffan.cli.query import query_cli
+from graffan.library.analysis.targets import (
+    MAPPED_GRADIENTS_FILE_NAME,
+    RawGradients,
+    map_raw_gradients,
+)
+from graffan.library.models.analysis import AnalysedIteration, AnalysedTarget
+from graffan.library.models.smirnoff import SMIRNOFFParameter
+from graffan.library.models.targets import TorsionTarget
+
+
+def test_query(isolated_runner):
+
+    with open("iteration_0000.json", "w") as file:
+
+        file.write(
+            AnalysedIteration(
+                iteration=0,
+                refit_parameters=[],
+                targets=[
+                    AnalysedTarget(
+                        type="torsion", gradients={"b1": {"k": {"C": 1.0, "CC": -2.0}}}
+                    )
+                ],
+            ).json()
+        )
+
+    result = isolated_runner.invoke(
+        query_cli,
+        ["--target", "torsion", "--parameter", "b1", "-k", "1", "iteration_0000.json"],
+    )
+
+    if result.exit_code != 0:
+        raise result.exception
+
+    assert result.output == "b1\tk\tCC\t-2.0\n"
+
+
+def test_query_mapped_gradients(isolated_runner):
+
+    with open("iteration_0000.json", "w") as file:
+
+        file.write(
+            AnalysedIteration(iteration=0, refit_parameters=[], targets=[]).json()
+        )
+
+    os.makedirs("iteration_0000")
+
+    numpy.savez(
+        os.path.join("iteration_0000", MAPPED_GRADIENTS_FILE_NAME),
+        smiles=numpy.array(["C", "CC"]),
+        parameter_ids=numpy.array(["b1"]),
+        parameter_attributes=numpy.array(["k"]),
+        target_types=numpy.array(["torsion", "vibration"]),
+        type_indices=numpy.array([0, 0, 1]),
+        parameter_indices=numpy.array([0, 0, 0]),
+        molecule_indices=numpy.array([0, 1, 1]),
+        values=numpy.array([1.0, -2.0, 3.0]),
+    )
+
+    result = isolated_runner.invoke(
+        query_cli,
+        ["--target", "torsion", "--parameter", "b1", "-k", "1", "iteration_0000.json"],
+    )
+
+    if result.exit_code != 0:
+        raise result.exception
+
+    assert result.output == "b1\tk\tCC\t-2.0\n"
+
+
+@pytest.mark.parametrize("target_type", ["vibration", "optgeo"])
+def test_query_mapped_gradients_missing_target(isolated_runner, target_type):
+
+    raw_gradients = RawGradients(
+        iteration=0,
+        targets=[TorsionTarget(name="target-0", molecule="CC", options={})],
+        parameters=[
+            SMIRNOFFParameter(
+                handler="Bonds", smirks="[#6:1]-[#6:2]", attribute="k", id="b1"
+            )
+        ],
+        mval_gradients=numpy.array([[1.0]]),
+        jacobian=numpy.array([[1.0]]),
+        errors=[],
+    )
+
+    os.makedirs("iteration_0000")
+
+    analysed_targets = map_raw_gradients(
+        raw_gradients,
+        mapped_gradients_path=os.path.join(
+            "iteration_0000", MAPPED_GRADIENTS_FILE_NAME
+        ),
+    )
+
+    with open("iteration_0000.json", "w") as file:
+
+        file.write(
+            AnalysedIteration(
+                iteration=0,
+                refit_parameters=raw_gradients.parameters,
+                targets=analysed_targets,
+            ).json()
+        )
+
+    result = isolated_runner.invoke(
+        query_cli,
+        ["--target", target_type, "--parameter", "b1", "iteration_0000.json"],
+    )
+
+    assert result.exit_code == 2
+    assert f"does not contain any {target_type} targets" in result.output
@@ -1,5 +1,7 @@
 from graffan.cli.visualise import visualise_cli
+from graffan.dashboard import data
 from graffan.dashboard.app import DashboardApp
+from graffan.dashboard.data import IterationStore
 from graffan.library.models.analysis import AnalysedIteration
 
 
@@ -17,3 +19,83 @@ def test_visualize(isolated_runner, monkeypatch):
 
     if result.exit_code != 0:
         raise result.exception
+
+
+def test_visualize_serve(isolated_runner, monkeypatch):
+
+    served_kwargs = {}
+
+    monkeypatch.setattr(
+        DashboardApp, "serve", lambda *args, **kwargs: served_kwargs.update(kwargs)
+    )
+
+    with open("iteration_0000.json", "w") as file:
+
+        file.write(
+            AnalysedIteration(iteration=0, refit_parameters=[], targets=[]).json()
+        )
+
+    result = isolated_runner.invoke(
+        visualise_cli,
+        ["iteration_0000.json", "--serve", "--workers", "2", "--port", "8051"],
+    )
+
+    if result.exit_code != 0:
+        raise result.exception
+
+    assert served_kwargs["workers"] == 2
+    assert served_kwargs["port"] == 8051
+
+
+def test_visualize_directory(isolated_runner, monkeypatch):
+
+    monkeypatch.setattr(data, "_DATASETS", data._DATASETS)
+
+    launched_args = []
+
+    monkeypatch.setattr(
+        DashboardApp, "launch", lambda *args, **kwargs: launched_args.extend(args)
+    )
+
+    for iteration in range(2):
+
+        with open(f"iteration_{iteration:04d}.json", "w") as file:
+
+            file.write(
+                AnalysedIteration(
+                    iteration=iteration, refit_parameters=[], targets=[]
+                ).json()
+            )
+
+    result = isolated_runner.invoke(
+        visualise_cli, [".", "--max-loaded-iterations", "1"]
+    )
+
+    if result.exit_code != 0:
+        raise result.exception
+
+    (iteration_store,) = launched_args
+
+    assert isinstance(iteration_store, IterationStore)
+    assert iteration_store.iterations == [0, 1]
+
+
+def test_visualize_export(isolated_runner, monkeypatch):
+
+    monkeypatch.setattr(DashboardApp, "launch", lambda *args, **kwargs: None)
+
+    with open("iteration_0000.json", "w") as file:
+
+        file.write(
+            AnalysedIteration(iteration=0, refit_parameters=[], targets=[]).json()
+        )
+
+    result = isolated_runner.invoke(
+        visualise_cli, ["iteration_0000.json", "--export", "report.html"]
+    )
+
+    if result.exit_code != 0:
+        raise result.exception
+
+    with open("report.html") as file:
+        assert "report-data" in file.read()
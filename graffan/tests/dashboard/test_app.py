@@ -0,0 +1,115 @@
+from graffan.dashboard.app import (
+    GRID_PAGE_SIZE_STATE,
+    METRICS_ROUTE,
+    MOLECULE_IMAGE_ROUTE,
+    DashboardApp,
+)
+from graffan.dashboard.data import register_dataset
+from graffan.dashboard.telemetry import callback_telemetry
+from graffan.library.models.analysis import AnalysedIteration, AnalysedTarget
+from graffan.library.models.smirnoff import SMIRNOFFParameter
+
+
+def test_create_app():
+
+    analysed_iteration = AnalysedIteration(iteration=0, refit_parameters=[], targets=[])
+
+    app_a = DashboardApp.create_app(analysed_iteration)
+    app_b = DashboardApp.create_app(analysed_iteration)
+
+    assert app_a is not app_b
+
+    server_callbacks = [
+        key for key, value in app_a.callback_map.items() if "callback" in value
+    ]
+    # Only the plot, hover image, region grid, iteration, trajectory, table,
+    # heatmap and telemetry panel callbacks should need the server.
+    assert len(server_callbacks) == 8
+    assert len(app_a.callback_map) == 13
+
+
+def test_create_app_grid_page_size():
+
+    analysed_iteration = AnalysedIteration(iteration=0, refit_parameters=[], targets=[])
+
+    app_a = DashboardApp.create_app(analysed_iteration, grid_page_size=4)
+    app_b = DashboardApp.create_app(analysed_iteration, grid_page_size=0)
+
+    # The page size should be stored in the layout of each app rather than being
+    # shared between them.
+    assert app_a.layout[GRID_PAGE_SIZE_STATE].data == 4
+    assert app_b.layout[GRID_PAGE_SIZE_STATE].data == 1
+
+
+def test_serve_molecule_image():
+
+    analysed_iteration = AnalysedIteration(
+        iteration=0,
+        refit_parameters=[
+            SMIRNOFFParameter(
+                handler="Bonds", smirks="[#6X4:1]-[#8:2]", attribute="k", id="b1"
+            )
+        ],
+        targets=[AnalysedTarget(type="torsion", gradients={"b1": {"k": {"CO": 1.0}}})],
+    )
+
+    app = DashboardApp.create_app(analysed_iteration)
+    dataset_id = register_dataset(analysed_iteration).id
+
+    client = app.server.test_client()
+
+    response = client.get(f"{MOLECULE_IMAGE_ROUTE}/{dataset_id}/0.svg?parameter=b1")
+
+    assert response.status_code == 200
+    assert response.mimetype == "image/svg+xml"
+    assert "immutable" in response.headers["Cache-Control"]
+
+    etag = response.headers["ETag"]
+
+    response = client.get(
+        f"{MOLECULE_IMAGE_ROUTE}/{dataset_id}/0.svg?parameter=b1",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 304
+
+    response = client.get(f"{MOLECULE_IMAGE_ROUTE}/{dataset_id}/0.svg")
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    assert client.get(f"{MOLECULE_IMAGE_ROUTE}/{dataset_id}/1.svg").status_code == 404
+    assert client.get(f"{MOLECULE_IMAGE_ROUTE}/unknown/0.svg").status_code == 404
+
+
+def test_callback_telemetry():
+
+    analysed_iteration = AnalysedIteration(iteration=0, refit_parameters=[], targets=[])
+
+    app = DashboardApp.create_app(analysed_iteration)
+    callback_telemetry.reset()
+
+    client = app.server.test_client()
+
+    response = client.post(
+        "/_dash-update-component",
+        json={
+            "output": "telemetry-table.children",
+            "outputs": {"id": "telemetry-table", "property": "children"},
+            "inputs": [
+                {"id": "telemetry-interval", "property": "n_intervals", "value": 1},
+                {"id": "telemetry-collapse", "property": "is_open", "value": False},
+            ],
+            "changedPropIds": ["telemetry-interval.n_intervals"],
+        },
+    )
+    assert response.status_code == 204
+
+    (summary,) = callback_telemetry.summary()
+
+    assert summary["callback"] == "update_telemetry_panel"
+    assert summary["count"] == 1
+
+    response = client.get(METRICS_ROUTE)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert 'callback="update_telemetry_panel"' in response.get_data(as_text=True)
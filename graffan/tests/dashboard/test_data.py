@@ -0,0 +1,315 @@
+import os
+import weakref
+
+import numpy
+import pytest
+
+from graffan.dashboard import data
+from graffan.dashboard.data import (
+    SUMMED_TARGET_TYPE,
+    WEIGHTED_TARGET_TYPE,
+    DashboardData,
+    IterationStore,
+    configure_dataset_cache,
+    get_dataset,
+    register_dataset,
+    register_dataset_file,
+)
+from graffan.library.analysis.targets import RawGradients, save_raw_gradients
+from graffan.library.models.analysis import AnalysedIteration, AnalysedTarget
+from graffan.library.models.smirnoff import SMIRNOFFParameter
+from graffan.library.models.targets import TorsionTarget
+
+
+@pytest.fixture()
+def analysed_iteration() -> AnalysedIteration:
+
+    return AnalysedIteration(
+        iteration=0,
+        refit_parameters=[],
+        targets=[
+            AnalysedTarget(
+                type="torsion",
+                gradients={
+                    "b1": {
+                        "k": {"C": 1.0, "CC": -2.0, "CCC": 3.0, "CCCC": 0.5},
+                        "length": {"C": 4.0, "CC": 1.0, "CCC": -1.0},
+                    }
+                },
+            )
+        ],
+    )
+
+
+def test_register_dataset(analysed_iteration):
+
+    dataset = register_dataset(analysed_iteration)
+    assert get_dataset(dataset.id) is dataset
+
+    assert register_dataset(analysed_iteration).id == dataset.id
+
+
+def test_register_dataset_evicted(analysed_iteration, monkeypatch):
+
+    # Restore the default cache once the test has finished.
+    monkeypatch.setattr(data, "_DATASETS", data._DATASETS)
+    configure_dataset_cache(1)
+
+    dataset = register_dataset(analysed_iteration)
+
+    dataset_id = dataset.id
+    dataset_reference = weakref.ref(dataset)
+
+    register_dataset(analysed_iteration.copy(update={"iteration": 1}))
+    del dataset
+
+    # The evicted dataset should be freed, and re-built when it is next retrieved.
+    assert dataset_reference() is None
+
+    rebuilt_dataset = get_dataset(dataset_id)
+
+    assert rebuilt_dataset.id == dataset_id
+    assert rebuilt_dataset.analysed_iteration is analysed_iteration
+
+
+@pytest.mark.parametrize(
+    "selection",
+    [
+        ("vdw", "b1", "k", "length"),
+        ("torsion", "b2", "k", "length"),
+        ("torsion", "b1", "k", "epsilon"),
+    ],
+)
+def test_plot_points_invalid(analysed_iteration, selection):
+
+    assert DashboardData(analysed_iteration).plot_points(*selection) is None
+
+
+def test_plot_points(analysed_iteration):
+
+    dataset = DashboardData(analysed_iteration, max_cached_plots=1)
+
+    plot_points = dataset.plot_points("torsion", "b1", "k", "length")
+
+    assert plot_points.smiles == ["C", "CC", "CCC"]
+    assert numpy.allclose(plot_points.x, [1.0, -2.0, 3.0])
+    assert numpy.allclose(plot_points.y, [4.0, 1.0, -1.0])
+
+    assert dataset.plot_points("torsion", "b1", "k", "length") is plot_points
+
+    dataset.plot_points("torsion", "b1", "length", "k")
+    assert dataset.plot_points("torsion", "b1", "k", "length") is not plot_points
+
+
+@pytest.mark.parametrize(
+    "x_range, y_range, expected_indices",
+    [
+        ((-numpy.inf, numpy.inf), (-numpy.inf, numpy.inf), [0, 1, 2]),
+        ((0.0, 3.0), (-numpy.inf, numpy.inf), [0, 2]),
+        ((0.0, 3.0), (0.0, 5.0), [0]),
+        ((5.0, 6.0), (0.0, 5.0), []),
+    ],
+)
+def test_query_box(analysed_iteration, x_range, y_range, expected_indices):
+
+    plot_points = DashboardData(analysed_iteration).plot_points(
+        "torsion", "b1", "k", "length"
+    )
+
+    assert plot_points.query_box(x_range, y_range).tolist() == expected_indices
+
+
+def test_indices(analysed_iteration):
+
+    analysed_iteration.refit_parameters = [
+        SMIRNOFFParameter(
+            handler="Bonds", smirks="[#6:1]-[#6:2]", attribute=attribute, id="b1"
+        )
+        for attribute in ["k", "length"]
+    ]
+
+    dataset = DashboardData(analysed_iteration)
+
+    assert [*dataset.targets] == ["torsion"]
+    assert dataset.targets["torsion"] is analysed_iteration.targets[0]
+
+    assert [*dataset.parameters] == ["b1"]
+    assert dataset.parameters["b1"] is analysed_iteration.refit_parameters[0]
+
+    assert dataset.selection_index == {
+        "targets": {
+            "torsion": {
+                "parameters": ["b1"],
+                "attributes": {"b1": ["k", "length"]},
+            }
+        },
+        "smirks": {"b1": "[#6:1]-[#6:2]"},
+    }
+
+
+def test_combined_targets(analysed_iteration):
+
+    analysed_iteration.targets[0].weights = {"C": 2.0}
+    analysed_iteration.targets.append(
+        AnalysedTarget(
+            type="vibration",
+            gradients={"b1": {"k": {"C": 1.0, "CO": 2.0}}, "b2": {"k": {"C": 3.0}}},
+            weights={"C": 0.5, "CO": 0.5},
+        )
+    )
+
+    dataset = DashboardData(analysed_iteration)
+
+    assert [*dataset.selection_index["targets"]] == [
+        "torsion",
+        "vibration",
+        SUMMED_TARGET_TYPE,
+        WEIGHTED_TARGET_TYPE,
+    ]
+    assert dataset.selection_index["targets"][SUMMED_TARGET_TYPE] == {
+        "parameters": ["b1", "b2"],
+        "attributes": {"b1": ["k", "length"], "b2": ["k"]},
+    }
+
+    summed_gradients = dataset.gradients(SUMMED_TARGET_TYPE)
+
+    assert summed_gradients["b1"]["k"] == {
+        "C": 2.0,
+        "CC": -2.0,
+        "CCC": 3.0,
+        "CCCC": 0.5,
+        "CO": 2.0,
+    }
+    assert summed_gradients["b2"]["k"] == {"C": 3.0}
+    assert dataset.gradients(SUMMED_TARGET_TYPE) is summed_gradients
+
+    weighted_gradients = dataset.gradients(WEIGHTED_TARGET_TYPE)
+
+    assert weighted_gradients["b1"]["k"] == {
+        "C": 2.5,
+        "CC": -2.0,
+        "CCC": 3.0,
+        "CCCC": 0.5,
+        "CO": 1.0,
+    }
+    assert weighted_gradients["b1"]["length"] == {"C": 8.0, "CC": 1.0, "CCC": -1.0}
+
+    plot_points = dataset.plot_points(WEIGHTED_TARGET_TYPE, "b1", "k", "length")
+    assert numpy.allclose(plot_points.x, [2.5, -2.0, 3.0])
+
+    assert dataset.gradient_matrix(WEIGHTED_TARGET_TYPE).shape == (3, 5)
+
+
+def test_combined_targets_weighted_gradients(analysed_iteration):
+
+    analysed_iteration.targets[0].weighted_gradients = {"b1": {"k": {"C": 5.0}}}
+    analysed_iteration.targets.append(
+        AnalysedTarget(
+            type="vibration",
+            gradients={"b1": {"k": {"C": 1.0}}},
+            weighted_gradients={"b1": {"k": {"C": 0.25}}},
+            weights={"C": 100.0},
+        )
+    )
+
+    dataset = DashboardData(analysed_iteration)
+
+    # The stored weighted gradients should be preferred over the mean weights.
+    assert dataset.gradients(WEIGHTED_TARGET_TYPE) == {"b1": {"k": {"C": 5.25}}}
+
+
+def test_molecule_ids(analysed_iteration):
+
+    dataset = DashboardData(analysed_iteration)
+
+    assert dataset.molecule_smiles == ["C", "CC", "CCC", "CCCC"]
+
+    assert dataset.molecule_id("CC") == 1
+    assert dataset.molecule_id("CO") is None
+
+    assert dataset.display_smiles(2) == "CCC"
+
+
+def test_register_dataset_file(tmpdir, analysed_iteration, monkeypatch):
+
+    # Restore the default cache once the test has finished.
+    monkeypatch.setattr(data, "_DATASETS", data._DATASETS)
+    configure_dataset_cache(1)
+
+    file_paths = []
+
+    for iteration in range(2):
+
+        file_path = os.path.join(str(tmpdir), f"iteration_{iteration:04d}.json")
+        file_paths.append(file_path)
+
+        with open(file_path, "w") as file:
+            file.write(analysed_iteration.copy(update={"iteration": iteration}).json())
+
+    dataset_ids = [register_dataset_file(file_path) for file_path in file_paths]
+    assert len(data._DATASETS) == 0
+
+    dataset_a = get_dataset(dataset_ids[0])
+    assert dataset_a.analysed_iteration.iteration == 0
+    assert get_dataset(dataset_ids[0]) is dataset_a
+
+    # Only a single dataset should be retained in memory.
+    assert get_dataset(dataset_ids[1]).analysed_iteration.iteration == 1
+    assert len(data._DATASETS) == 1
+
+    assert get_dataset(dataset_ids[0]) is not dataset_a
+
+    with pytest.raises(KeyError):
+        get_dataset("unknown")
+
+
+def test_iteration_store(tmpdir, analysed_iteration):
+
+    for iteration, scale in enumerate([1.0, 2.0]):
+
+        analysed_iteration.targets[0].gradients["b1"]["k"]["C"] = scale
+
+        with open(
+            os.path.join(str(tmpdir), f"iteration_{iteration:04d}.json"), "w"
+        ) as file:
+            file.write(analysed_iteration.copy(update={"iteration": iteration}).json())
+
+    # Store the raw gradients of the second iteration alongside it.
+    save_raw_gradients(
+        RawGradients(
+            iteration=1,
+            targets=[TorsionTarget(name="target-0", molecule="C", options={})],
+            parameters=[
+                SMIRNOFFParameter(
+                    handler="Bonds", smirks="[#6:1]-[#6:2]", attribute="k", id="b1"
+                )
+            ],
+            mval_gradients=numpy.array([[3.0]]),
+            jacobian=numpy.array([[1.0]]),
+            errors=[],
+        ),
+        os.path.join(str(tmpdir), "iteration_0001"),
+    )
+
+    iteration_store = IterationStore.from_directory(str(tmpdir))
+    assert iteration_store.iterations == [0, 1]
+
+    assert get_dataset(iteration_store.dataset_id(1)).analysed_iteration.iteration == 1
+
+    assert iteration_store.trajectory("torsion", "b1", "k", "C") == ([0, 1], [1.0, 3.0])
+    assert iteration_store.trajectory("torsion", "b1", "length", "C") == (
+        [0, 1],
+        [4.0, None],
+    )
+    assert iteration_store.trajectory("vdw", "b1", "k", "C") == ([0, 1], [None, None])
+
+    with pytest.raises(FileNotFoundError):
+        IterationStore.from_directory(os.path.join(str(tmpdir), "iteration_0001"))
+
+
+def test_iteration_store_from_iteration(analysed_iteration):
+
+    iteration_store = IterationStore.from_iteration(analysed_iteration)
+
+    assert iteration_store.iterations == [0]
+    assert iteration_store.trajectory("torsion", "b1", "k", "CC") == ([0], [-2.0])
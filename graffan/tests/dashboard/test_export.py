@@ -0,0 +1,121 @@
+import base64
+import gzip
+import json
+import os
+
+import numpy
+
+from graffan.dashboard.data import DashboardData
+from graffan.dashboard.export import (
+    build_report_data,
+    build_report_images,
+    export_report,
+)
+from graffan.library.models.analysis import AnalysedIteration, AnalysedTarget
+from graffan.library.models.smirnoff import SMIRNOFFParameter
+from graffan.utilities.rdkit import smiles_to_svg
+
+
+def _build_dataset() -> DashboardData:
+
+    return DashboardData(
+        AnalysedIteration(
+            iteration=0,
+            refit_parameters=[],
+            targets=[
+                AnalysedTarget(
+                    type="torsion",
+                    gradients={
+                        "b1": {
+                            "k": {"CO": 1.0, "CCO": -2.0},
+                            "length": {"CCO": 0.5},
+                        },
+                        "b2": {"k": {"CCCO": 3.0}},
+                    },
+                )
+            ],
+        )
+    )
+
+
+def test_build_report_data():
+
+    dataset = _build_dataset()
+    report_data = build_report_data(dataset)
+
+    assert report_data["selection"] == dataset.selection_index
+    assert report_data["smiles"] == ["CO", "CCO", "CCCO"]
+
+    b1_data = report_data["gradients"]["torsion"]["b1"]
+
+    assert numpy.frombuffer(base64.b64decode(b1_data["molecules"]), "<i4").tolist() == [
+        0,
+        1,
+    ]
+    assert numpy.allclose(
+        numpy.frombuffer(base64.b64decode(b1_data["values"]["k"]), "<f4"),
+        [1.0, -2.0],
+    )
+    assert numpy.allclose(
+        numpy.frombuffer(base64.b64decode(b1_data["values"]["length"]), "<f4"),
+        [numpy.nan, 0.5],
+        equal_nan=True,
+    )
+
+
+def test_export_report(tmpdir):
+
+    dataset = _build_dataset()
+
+    file_path = os.path.join(str(tmpdir), "report.html")
+    export_report(dataset, file_path, include_images=False)
+
+    with open(file_path) as file:
+        contents = file.read()
+
+    encoded_data = contents.split('id="report-data">')[1].split("</script>")[0]
+
+    assert json.loads(gzip.decompress(base64.b64decode(encoded_data))) == (
+        build_report_data(dataset)
+    )
+    assert 'id="report-images"></script>' in contents
+
+
+def test_export_report_images(tmpdir):
+
+    parameter = SMIRNOFFParameter(
+        handler="Bonds", smirks="[#6X4:1]-[#8:2]", attribute="k", id="b1"
+    )
+
+    dataset = DashboardData(
+        AnalysedIteration(
+            iteration=0,
+            refit_parameters=[parameter],
+            targets=[
+                AnalysedTarget(
+                    type="torsion",
+                    gradients={"b1": {"k": {"CO": 1.0}}, "b2": {"k": {"CO": 2.0}}},
+                )
+            ],
+            parameter_matches={"b1": {"CO": [(0, 1)]}},
+        )
+    )
+
+    file_path = os.path.join(str(tmpdir), "report.html")
+    export_report(dataset, file_path, max_workers=1)
+
+    with open(file_path) as file:
+        contents = file.read()
+
+    encoded_images = contents.split('id="report-images">')[1].split("</script>")[0]
+    images = json.loads(gzip.decompress(base64.b64decode(encoded_images)))
+
+    expected_images = build_report_images(dataset, max_workers=1)
+
+    assert expected_images["index"] == {"b1": {0: 0}, "b2": {0: 1}}
+    assert images["svgs"] == expected_images["svgs"]
+
+    # The image shown for the refit parameter should highlight its matched atoms.
+    assert images["svgs"][0] == smiles_to_svg("CO", parameter.smirks, ((0, 1),))
+    assert images["svgs"][0] != images["svgs"][1]
+    assert images["svgs"][1] == smiles_to_svg("CO", None)
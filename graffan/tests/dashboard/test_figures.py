@@ -0,0 +1,125 @@
+import numpy
+import pytest
+
+from graffan.dashboard import figures, heatmap
+from graffan.dashboard.data import DashboardData, PlotPoints
+from graffan.dashboard.figures import (
+    build_heatmap_figure,
+    build_scatter_figure,
+    cached_scatter_figure,
+)
+from graffan.dashboard.spatial import build_grid_index
+from graffan.library.models.analysis import AnalysedIteration, AnalysedTarget
+
+
+def _build_plot_points(n_points: int) -> PlotPoints:
+
+    x = numpy.linspace(0.0, 1.0, n_points)
+    y = numpy.linspace(-1.0, 0.0, n_points)
+
+    return PlotPoints(
+        smiles=["C" * (i + 1) for i in range(n_points)],
+        x=x,
+        y=y,
+        index=build_grid_index(x, y),
+    )
+
+
+@pytest.mark.parametrize(
+    "n_points, expected_type", [(4, "scatter"), (7, "scattergl"), (11, "heatmap")]
+)
+def test_build_scatter_figure(monkeypatch, n_points, expected_type):
+
+    monkeypatch.setattr(figures, "WEBGL_THRESHOLD", 5)
+    monkeypatch.setattr(figures, "DENSITY_THRESHOLD", 10)
+
+    figure = build_scatter_figure(_build_plot_points(n_points), "x", "y")
+
+    assert [trace.type for trace in figure.data] == [expected_type, "bar", "bar"]
+
+    assert figure.data[1].y.sum() == n_points
+    assert figure.data[2].x.sum() == n_points
+
+    if expected_type == "heatmap":
+        assert numpy.nansum(numpy.array(figure.data[0].z, dtype=float)) == n_points
+    else:
+        assert len(figure.data[0].hovertext) == n_points
+
+
+def test_build_scatter_figure_zoomed(monkeypatch):
+
+    monkeypatch.setattr(figures, "DENSITY_THRESHOLD", 10)
+
+    figure = build_scatter_figure(
+        _build_plot_points(11), "x", "y", x_range=(0.0, 0.45), y_range=None
+    )
+
+    assert figure.data[0].type == "scatter"
+    assert list(figure.data[0].hovertext) == ["C" * (i + 1) for i in range(5)]
+
+    assert tuple(figure.layout.xaxis.range) == (0.0, 0.45)
+
+
+def test_cached_scatter_figure():
+
+    dataset = DashboardData(
+        AnalysedIteration(
+            iteration=0,
+            refit_parameters=[],
+            targets=[
+                AnalysedTarget(
+                    type="torsion",
+                    gradients={"b1": {"k": {"C": 1.0}, "length": {"C": 2.0}}},
+                )
+            ],
+        )
+    )
+
+    figure = cached_scatter_figure(dataset, "torsion", "b1", "k", "length")
+    assert figure["layout"]["uirevision"] == "torsion b1 k length"
+
+    assert cached_scatter_figure(dataset, "torsion", "b1", "k", "length") is figure
+    assert (
+        cached_scatter_figure(dataset, "torsion", "b1", "k", "length", (0.0, 1.0))
+        is not figure
+    )
+
+    assert cached_scatter_figure(dataset, "torsion", "b2", "k", "length") is None
+
+
+def test_build_heatmap_figure(monkeypatch):
+
+    monkeypatch.setattr(heatmap, "HEATMAP_TILE_SIZE", 2)
+
+    dataset = DashboardData(
+        AnalysedIteration(
+            iteration=0,
+            refit_parameters=[],
+            targets=[
+                AnalysedTarget(
+                    type="torsion",
+                    gradients={
+                        "b1": {"k": {"C": 1.0, "CC": -2.0, "CCC": 3.0}},
+                        "b2": {"k": {"CC": -4.0}},
+                    },
+                )
+            ],
+        )
+    )
+
+    assert build_heatmap_figure(dataset, "vibration") is None
+
+    figure, factors = build_heatmap_figure(dataset, "torsion")
+
+    assert factors == (1, 2)
+    assert numpy.allclose(
+        figure.data[0].z, [[-2.0, 3.0], [-4.0, numpy.nan]], equal_nan=True
+    )
+    assert numpy.allclose(figure.data[0].x, [0.5, 2.5])
+    assert [*figure.layout.yaxis.ticktext] == ["b1 k", "b2 k"]
+
+    figure, factors = build_heatmap_figure(dataset, "torsion", x_range=(1.6, 2.4))
+
+    assert factors == (1, 1)
+    assert numpy.allclose(figure.data[0].z, [[3.0], [numpy.nan]], equal_nan=True)
+    assert numpy.allclose(figure.data[0].x, [2.0])
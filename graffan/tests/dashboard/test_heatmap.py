@@ -0,0 +1,164 @@
+import numpy
+import pytest
+
+from graffan.dashboard import heatmap
+from graffan.dashboard.heatmap import (
+    GradientMatrix,
+    build_gradient_matrix,
+    build_heatmap_view,
+    heatmap_factor,
+)
+
+
+@pytest.fixture()
+def dense_matrix() -> numpy.ndarray:
+
+    random = numpy.random.RandomState(1)
+
+    values = random.normal(size=(37, 53))
+    values[random.uniform(size=values.shape) < 0.5] = numpy.nan
+
+    return values
+
+
+@pytest.fixture()
+def gradient_matrix(dense_matrix) -> GradientMatrix:
+
+    n_rows, n_columns = dense_matrix.shape
+
+    return build_gradient_matrix(
+        {
+            f"p{row}": {
+                "k": {
+                    f"C{column}": dense_matrix[row, column]
+                    for column in range(n_columns)
+                    if not numpy.isnan(dense_matrix[row, column])
+                }
+            }
+            for row in range(n_rows)
+        }
+    )
+
+
+def _brute_force_pool(dense_matrix, factors, row_range, column_range):
+
+    n_rows = (row_range[1] - row_range[0] + factors[0] - 1) // factors[0]
+    n_columns = (column_range[1] - column_range[0] + factors[1] - 1) // factors[1]
+
+    pooled = numpy.full((n_rows, n_columns), numpy.nan)
+
+    for row in range(n_rows):
+        for column in range(n_columns):
+
+            block = dense_matrix[
+                row_range[0] + row * factors[0] : row_range[0] + (row + 1) * factors[0],
+                column_range[0]
+                + column * factors[1] : column_range[0]
+                + (column + 1) * factors[1],
+            ]
+            block = block[~numpy.isnan(block)]
+
+            if len(block) > 0:
+                pooled[row, column] = block[numpy.argmax(numpy.abs(block))]
+
+    return pooled
+
+
+def test_build_gradient_matrix(gradient_matrix, dense_matrix):
+
+    assert gradient_matrix.shape == dense_matrix.shape
+    assert gradient_matrix.row_labels[1] == ("p1", "k")
+
+    dense = numpy.full(gradient_matrix.shape, numpy.nan)
+
+    for row in range(gradient_matrix.shape[0]):
+
+        start, end = gradient_matrix.row_offsets[row : row + 2]
+        columns = [
+            int(smiles[1:])
+            for smiles in numpy.array(gradient_matrix.column_smiles)[
+                gradient_matrix.columns[start:end]
+            ]
+        ]
+        dense[row, columns] = gradient_matrix.values[start:end]
+
+    assert numpy.allclose(dense, dense_matrix, equal_nan=True)
+
+
+@pytest.mark.parametrize(
+    "extent, expected_factor", [(0, 1), (1, 1), (4, 1), (5, 2), (9, 4), (16, 4)]
+)
+def test_heatmap_factor(extent, expected_factor, monkeypatch):
+
+    monkeypatch.setattr(heatmap, "HEATMAP_TILE_SIZE", 4)
+    assert heatmap_factor(extent) == expected_factor
+
+
+@pytest.mark.parametrize(
+    "row_range, column_range",
+    [
+        ((0, 37), (0, 53)),
+        ((3, 20), (10, 45)),
+        ((5, 6), (7, 8)),
+        ((30, 37), (0, 2)),
+    ],
+)
+def test_build_heatmap_view(
+    gradient_matrix, dense_matrix, row_range, column_range, monkeypatch
+):
+
+    monkeypatch.setattr(heatmap, "HEATMAP_TILE_SIZE", 4)
+
+    # Reorder the dense columns to match the order of the sparse matrix.
+    dense_matrix = dense_matrix[
+        :, [int(smiles[1:]) for smiles in gradient_matrix.column_smiles]
+    ]
+
+    requested_tiles = []
+
+    def get_tile(factors, tile_index):
+        requested_tiles.append(tile_index)
+        return gradient_matrix.tile(factors, tile_index)
+
+    view = build_heatmap_view(gradient_matrix.shape, row_range, column_range, get_tile)
+
+    assert all(size <= heatmap.HEATMAP_TILE_SIZE for size in view.values.shape)
+    assert len(requested_tiles) <= 4
+
+    pooled_start = (
+        view.offsets[0] * view.factors[0],
+        view.offsets[1] * view.factors[1],
+    )
+
+    expected_values = _brute_force_pool(
+        dense_matrix,
+        view.factors,
+        (pooled_start[0], gradient_matrix.shape[0]),
+        (pooled_start[1], gradient_matrix.shape[1]),
+    )[: view.values.shape[0], : view.values.shape[1]]
+
+    assert numpy.allclose(view.values, expected_values, equal_nan=True)
+
+    # The view should cover the requested range.
+    assert pooled_start[0] <= row_range[0]
+    assert pooled_start[1] <= column_range[0]
+    assert pooled_start[0] + view.values.shape[0] * view.factors[0] >= row_range[1]
+    assert pooled_start[1] + view.values.shape[1] * view.factors[1] >= column_range[1]
+
+
+def test_max_abs_entry(gradient_matrix, dense_matrix):
+
+    dense_matrix = dense_matrix[
+        :, [int(smiles[1:]) for smiles in gradient_matrix.column_smiles]
+    ]
+
+    row, column = gradient_matrix.max_abs_entry((2, 10), (5, 20))
+
+    block = numpy.abs(dense_matrix[2:10, 5:20])
+    expected_row, expected_column = numpy.unravel_index(
+        numpy.nanargmax(block), block.shape
+    )
+
+    assert (row, column) == (expected_row + 2, expected_column + 5)
+
+    assert gradient_matrix.max_abs_entry((0, 0), (0, 53)) is None
@@ -0,0 +1,121 @@
+import numpy
+import pytest
+
+from graffan.dashboard.spatial import build_grid_index
+
+
+@pytest.fixture(scope="module")
+def points():
+
+    random = numpy.random.default_rng(0)
+    return random.normal(size=1000), random.normal(scale=100.0, size=1000)
+
+
+def test_build_grid_index(points):
+
+    index = build_grid_index(*points)
+
+    assert index.n_cells == (8, 8)
+    assert index.offsets[-1] == len(points[0])
+    assert sorted(index.order.tolist()) == list(range(len(points[0])))
+
+
+def test_build_grid_index_heavy_tailed():
+
+    random = numpy.random.default_rng(0)
+
+    x = random.standard_cauchy(size=10000)
+    y = numpy.concatenate([numpy.zeros(5000), random.standard_cauchy(size=5000)])
+
+    index = build_grid_index(x, y)
+
+    # The points should be spread across the cells rather than (almost) all falling
+    # into the cells closest to the origin.
+    assert numpy.diff(index.offsets).max() < len(x) / 10
+
+    for position in [(0.0, 0.0), (1.0e3, -5.0), (-0.1, 1.0e4)]:
+
+        distances = numpy.hypot(
+            (x - position[0]) / index.scale[0], (y - position[1]) / index.scale[1]
+        )
+        assert index.query_nearest(*position) == numpy.argmin(distances)
+
+    expected_indices = numpy.flatnonzero(
+        (x >= -1.0) & (x <= 1.0) & (y >= 0.0) & (y <= 2.0)
+    )
+    assert index.query_box((-1.0, 1.0), (0.0, 2.0)).tolist() == (
+        expected_indices.tolist()
+    )
+
+
+def test_build_grid_index_degenerate():
+
+    index = build_grid_index(numpy.array([1.0, 1.0]), numpy.array([2.0, 2.0]))
+
+    assert index.query_box((0.0, 2.0), (0.0, 3.0)).tolist() == [0, 1]
+    assert index.query_nearest(5.0, 5.0) == 0
+
+
+@pytest.mark.parametrize(
+    "x_range, y_range",
+    [
+        ((-numpy.inf, numpy.inf), (-numpy.inf, numpy.inf)),
+        ((-0.5, 0.5), (-50.0, 10.0)),
+        ((2.0, 10.0), (-1000.0, 1000.0)),
+        ((10.0, 20.0), (-1000.0, 1000.0)),
+        ((1.0, -1.0), (-1000.0, 1000.0)),
+    ],
+)
+def test_query_box(points, x_range, y_range):
+
+    x, y = points
+
+    expected_indices = numpy.flatnonzero(
+        (x >= x_range[0]) & (x <= x_range[1]) & (y >= y_range[0]) & (y <= y_range[1])
+    )
+
+    index = build_grid_index(x, y)
+    assert index.query_box(x_range, y_range).tolist() == expected_indices.tolist()
+
+
+def test_query_lasso(points):
+
+    x, y = points
+
+    # A triangle with vertices at (-1, -100), (1, -100) and (0, 100).
+    polygon_x, polygon_y = [-1.0, 1.0, 0.0], [-100.0, -100.0, 100.0]
+
+    half_width = (100.0 - y) / 200.0
+    expected_indices = numpy.flatnonzero((y > -100.0) & (numpy.abs(x) < half_width))
+
+    index = build_grid_index(x, y)
+    assert index.query_lasso(polygon_x, polygon_y).tolist() == (
+        expected_indices.tolist()
+    )
+
+    assert index.query_lasso([0.0, 1.0], [0.0, 1.0]).tolist() == []
+
+
+@pytest.mark.parametrize(
+    "position", [(0.0, 0.0), (1.5, -120.0), (-10.0, 500.0), (3.0, 0.0)]
+)
+def test_query_nearest(points, position):
+
+    x, y = points
+
+    index = build_grid_index(x, y)
+
+    distances = numpy.hypot(
+        (x - position[0]) / index.scale[0], (y - position[1]) / index.scale[1]
+    )
+
+    assert index.query_nearest(*position) == numpy.argmin(distances)
+
+
+def test_query_empty():
+
+    index = build_grid_index(numpy.array([]), numpy.array([]))
+
+    assert index.query_box((-1.0, 1.0), (-1.0, 1.0)).tolist() == []
+    assert index.query_lasso([0.0, 1.0, 0.0], [0.0, 0.0, 1.0]).tolist() == []
+    assert index.query_nearest(0.0, 0.0) is None
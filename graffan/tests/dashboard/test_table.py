@@ -0,0 +1,203 @@
+import numpy
+import pytest
+
+from graffan.dashboard.data import DashboardData
+from graffan.dashboard.table import (
+    TableFilter,
+    build_gradient_table,
+    combine_gradient_tables,
+    gradient_dictionary,
+    parse_filter_query,
+)
+from graffan.library.models.analysis import AnalysedIteration, AnalysedTarget
+
+
+@pytest.fixture()
+def gradients():
+
+    return {
+        "b1": {
+            "k": {"C": 1.0, "CC": -2.0, "CCC": 3.0, "CO": 0.5},
+            "length": {"C": 4.0, "CC": 1.0, "CCC": -1.0},
+        },
+        "a1": {"angle": {"CCO": 2.5, "C": -0.5}},
+    }
+
+
+@pytest.mark.parametrize(
+    "filter_query, expected_filters",
+    [
+        (None, []),
+        ("", []),
+        ('{smiles} contains "CC"', [TableFilter("smiles", "contains", "CC")]),
+        ("{smiles} icontains co", [TableFilter("smiles", "contains", "co", False)]),
+        ("{gradient} s> 0.5", [TableFilter("gradient", ">", "0.5")]),
+        (
+            "{gradient} ge -1 && {attribute} eq 'k'",
+            [TableFilter("gradient", ">=", "-1"), TableFilter("attribute", "=", "k")],
+        ),
+        ("{gradient} unknown 1", []),
+    ],
+)
+def test_parse_filter_query(filter_query, expected_filters):
+    assert parse_filter_query(filter_query) == expected_filters
+
+
+def test_build_gradient_table(gradients):
+
+    table = build_gradient_table(gradients)
+
+    assert len(table) == 9
+
+    assert [*table.parameters.categories] == ["a1", "b1"]
+    assert [*table.attributes.categories] == ["angle", "k", "length"]
+
+    for column_id, column in [
+        ("smiles", table.smiles),
+        ("parameter", table.parameters),
+        ("attribute", table.attributes),
+    ]:
+        values = column.categories[column.codes]
+        assert (numpy.diff(column.codes[table.sort_orders[column_id]]) >= 0).all()
+        assert sorted(values) == [*values[table.sort_orders[column_id]]]
+
+    assert (numpy.diff(table.gradients[table.sort_orders["gradient"]]) >= 0).all()
+
+
+@pytest.mark.parametrize(
+    "filters, sort_column, descending, page, page_size",
+    [
+        ([], None, False, 0, 25),
+        ([], "gradient", True, 0, 25),
+        ([], "smiles", False, 1, 4),
+        ([TableFilter("parameter", "=", "b1")], "gradient", False, 0, 25),
+        ([TableFilter("smiles", "contains", "cc", False)], "attribute", True, 0, 3),
+        (
+            [TableFilter("gradient", ">", "0"), TableFilter("attribute", "!=", "k")],
+            "smiles",
+            False,
+            0,
+            25,
+        ),
+        ([TableFilter("gradient", "=", "abc")], None, False, 0, 25),
+    ],
+)
+def test_query_gradient_table(
+    gradients, filters, sort_column, descending, page, page_size
+):
+
+    table = build_gradient_table(gradients)
+
+    expected_rows = [
+        {
+            "smiles": smiles,
+            "parameter": parameter_id,
+            "attribute": attribute,
+            "gradient": gradient,
+        }
+        for parameter_id, attribute_gradients in gradients.items()
+        for attribute, molecule_gradients in attribute_gradients.items()
+        for smiles, gradient in molecule_gradients.items()
+    ]
+
+    def passes(row, table_filter):
+
+        value = row[table_filter.column]
+
+        if table_filter.column == "gradient":
+
+            try:
+                filter_value = float(table_filter.value)
+            except ValueError:
+                return False
+
+        elif table_filter.case_sensitive:
+            filter_value = table_filter.value
+        else:
+            value, filter_value = value.lower(), table_filter.value.lower()
+
+        return {
+            "=": value == filter_value,
+            "!=": value != filter_value,
+            ">": value > filter_value,
+            "contains": str(filter_value) in str(value),
+        }[table_filter.operator]
+
+    expected_rows = [
+        row
+        for row in expected_rows
+        if all(passes(row, table_filter) for table_filter in filters)
+    ]
+
+    if sort_column is not None:
+
+        expected_rows = sorted(
+            expected_rows, key=lambda row: row[sort_column], reverse=descending
+        )
+
+    rows, n_rows = table.query(filters, sort_column, descending, page, page_size)
+
+    assert n_rows == len(expected_rows)
+    assert len(rows) == len(expected_rows[page * page_size : (page + 1) * page_size])
+
+    if sort_column is None:
+        assert all(row in expected_rows for row in rows)
+    else:
+        assert [row[sort_column] for row in rows] == [
+            row[sort_column]
+            for row in expected_rows[page * page_size : (page + 1) * page_size]
+        ]
+
+
+def test_dashboard_gradient_table(gradients):
+
+    dataset = DashboardData(
+        AnalysedIteration(
+            iteration=0,
+            refit_parameters=[],
+            targets=[AnalysedTarget(type="torsion", gradients=gradients)],
+        )
+    )
+
+    assert dataset.gradient_table("vibration") is None
+
+    table = dataset.gradient_table("torsion")
+
+    assert len(table) == 9
+    assert dataset.gradient_table("torsion") is table
+
+
+def test_combine_gradient_tables(gradients):
+
+    other_gradients = {
+        "b1": {"k": {"CC": 2.0, "N": 1.0}},
+        "b2": {"k": {"C": -1.0}},
+    }
+
+    tables = [build_gradient_table(gradients), build_gradient_table(other_gradients)]
+
+    summed_table = combine_gradient_tables(tables)
+
+    assert gradient_dictionary(summed_table) == {
+        "a1": {"angle": {"C": -0.5, "CCO": 2.5}},
+        "b1": {
+            "k": {"C": 1.0, "CC": 0.0, "CCC": 3.0, "CO": 0.5, "N": 1.0},
+            "length": {"C": 4.0, "CC": 1.0, "CCC": -1.0},
+        },
+        "b2": {"k": {"C": -1.0}},
+    }
+
+    weighted_table = combine_gradient_tables(
+        tables, [numpy.full(len(tables[0]), 2.0), numpy.full(len(tables[1]), 0.5)]
+    )
+    weighted_gradients = gradient_dictionary(weighted_table)
+
+    assert numpy.isclose(weighted_gradients["b1"]["k"]["CC"], -3.0)
+    assert numpy.isclose(weighted_gradients["b2"]["k"]["C"], -0.5)
+
+    rows, n_rows = weighted_table.query([], sort_column="gradient", page_size=1)
+
+    assert n_rows == 11
+    assert rows == [
+        {"smiles": "CC", "parameter": "b1", "attribute": "k", "gradient": -3.0}
+    ]
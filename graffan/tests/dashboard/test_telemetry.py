@@ -0,0 +1,79 @@
+import numpy
+import pytest
+
+from graffan.dashboard.telemetry import CallbackTelemetry, Histogram
+
+
+def test_histogram():
+
+    histogram = Histogram([1.0, 2.0, 4.0])
+    assert numpy.isnan(histogram.quantile(0.5))
+
+    for value in [0.5, 1.0, 1.5, 3.0, 10.0]:
+        histogram.observe(value)
+
+    assert histogram.count == 5
+    assert numpy.isclose(histogram.sum, 16.0)
+
+    assert histogram.cumulative_counts() == [
+        (1.0, 2),
+        (2.0, 3),
+        (4.0, 4),
+        (numpy.inf, 5),
+    ]
+
+
+@pytest.mark.parametrize(
+    "q, expected_value", [(0.2, 0.5), (0.4, 1.0), (0.5, 1.5), (0.7, 3.0), (0.99, 4.0)]
+)
+def test_histogram_quantile(q, expected_value):
+
+    histogram = Histogram([1.0, 2.0, 4.0])
+
+    for value in [0.5, 1.0, 1.5, 3.0, 10.0]:
+        histogram.observe(value)
+
+    assert numpy.isclose(histogram.quantile(q), expected_value)
+
+
+def test_callback_telemetry():
+
+    telemetry = CallbackTelemetry()
+
+    telemetry.record("build_plot", 0.02, 1000)
+    telemetry.record("build_plot", 0.2, 100000)
+    telemetry.record("hover_data_point", 0.001, 10)
+
+    summary = telemetry.summary()
+
+    assert [entry["callback"] for entry in summary] == [
+        "build_plot",
+        "hover_data_point",
+    ]
+    assert summary[0]["count"] == 2
+    assert 0.01 <= summary[0]["duration_p50"] <= 0.025
+    assert 0.1 <= summary[0]["duration_p99"] <= 0.25
+    assert {*summary[1]} == {
+        "callback",
+        "count",
+        *(f"{label}_p{q}" for label in ["duration", "payload"] for q in [50, 95, 99]),
+    }
+
+    metrics = telemetry.to_prometheus()
+
+    assert "# TYPE graffan_dashboard_callback_duration_seconds histogram" in metrics
+    assert (
+        'graffan_dashboard_callback_duration_seconds_bucket{callback="build_plot",'
+        'le="0.025"} 1' in metrics
+    )
+    assert (
+        'graffan_dashboard_callback_duration_seconds_bucket{callback="build_plot",'
+        'le="+Inf"} 2' in metrics
+    )
+    assert (
+        'graffan_dashboard_callback_response_bytes_count{callback="hover_data_point"}'
+        " 1" in metrics
+    )
+
+    telemetry.reset()
+    assert telemetry.summary() == []
@@ -0,0 +1,81 @@
+import os
+
+from rdkit import Chem
+
+from graffan.library.analysis.images import prerender_images
+from graffan.library.models.analysis import AnalysedIteration, AnalysedTarget
+from graffan.library.models.smirnoff import SMIRNOFFParameter
+from graffan.utilities import rdkit as rdkit_utilities
+from graffan.utilities.cache import ImageCache
+from graffan.utilities.rdkit import svg_cache_key
+
+
+def test_prerender_images(tmpdir):
+
+    analysed_iteration = AnalysedIteration(
+        iteration=0,
+        refit_parameters=[
+            SMIRNOFFParameter(
+                handler="Bonds", smirks="[#6X4:1]-[#8:2]", attribute="k", id="b1"
+            ),
+            SMIRNOFFParameter(
+                handler="Bonds", smirks="[#6X4:1]-[#8:2]", attribute="length", id="b1"
+            ),
+        ],
+        targets=[
+            AnalysedTarget(
+                type="torsion",
+                gradients={"b1": {"k": {"CO": 1.0}, "length": {"CO": 1.0, "CCO": 1.0}}},
+            )
+        ],
+    )
+
+    n_images = prerender_images(analysed_iteration, str(tmpdir), max_workers=1)
+    assert n_images == 2
+
+    image_cache = ImageCache(str(tmpdir))
+
+    for smiles in ["CO", "CCO"]:
+
+        cache_key = svg_cache_key(smiles, "[#6X4:1]-[#8:2]")
+
+        assert os.path.isfile(
+            os.path.join(str(tmpdir), cache_key[:2], f"{cache_key}.svg")
+        )
+        assert image_cache.get(cache_key) is not None
+
+
+def test_prerender_images_matches(tmpdir, monkeypatch):
+
+    analysed_iteration = AnalysedIteration(
+        iteration=0,
+        refit_parameters=[
+            SMIRNOFFParameter(
+                handler="Bonds", smirks="[#6X4:1]-[#8:2]", attribute="k", id="b1"
+            ),
+        ],
+        targets=[
+            AnalysedTarget(
+                type="torsion", gradients={"b1": {"k": {"CO": 1.0, "CCO": 1.0}}}
+            )
+        ],
+        parameter_matches={"b1": {"CO": [(0, 1)]}},
+    )
+
+    # The stored matches should be re-used rather than re-matching the SMIRKS.
+    matched_smiles = []
+
+    def find_smirks_matches(molecule, smirks):
+        matched_smiles.append(Chem.MolToSmiles(molecule))
+        return []
+
+    monkeypatch.setattr(rdkit_utilities, "find_smirks_matches", find_smirks_matches)
+
+    assert prerender_images(analysed_iteration, str(tmpdir), max_workers=1) == 2
+    assert matched_smiles == ["CCO"]
+
+    image_cache = ImageCache(str(tmpdir))
+
+    assert image_cache.get(svg_cache_key("CO", "[#6X4:1]-[#8:2]")) == (
+        rdkit_utilities._render_svg("CO", "[#6X4:1]-[#8:2]", ((0, 1),), 300)
+    )
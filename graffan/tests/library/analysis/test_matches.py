@@ -0,0 +1,35 @@
+import pytest
+
+from graffan.library.analysis.matches import build_match_index
+from graffan.library.models.analysis import AnalysedTarget
+from graffan.library.models.smirnoff import SMIRNOFFParameter
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_build_match_index(max_workers):
+
+    parameters = [
+        SMIRNOFFParameter(
+            handler="Bonds", smirks="[#6X4:1]-[#8:2]", attribute="k", id="b1"
+        ),
+        SMIRNOFFParameter(
+            handler="Bonds", smirks="[#6X4:1]-[#8:2]", attribute="length", id="b1"
+        ),
+        SMIRNOFFParameter(
+            handler="Bonds", smirks="[#6X4:1]-[#6X4:2]", attribute="k", id="b2"
+        ),
+    ]
+    targets = [
+        AnalysedTarget(
+            type="torsion",
+            gradients={"b1": {"k": {"CO": 1.0}, "length": {"CCO": 1.0}}},
+        ),
+        AnalysedTarget(type="vibration", gradients={"b2": {"k": {"CCO": 1.0}}}),
+    ]
+
+    match_index = build_match_index(parameters, targets, max_workers)
+
+    assert match_index == {
+        "b1": {"CO": [(0, 1)], "CCO": [(1, 2)]},
+        "b2": {"CCO": [(0, 1), (1, 0)]},
+    }
@@ -0,0 +1,201 @@
+import os
+
+import numpy
+import pytest
+
+from graffan.library.analysis.query import (
+    build_gradient_columns,
+    load_gradient_columns,
+    query_gradients,
+    query_parameters,
+    select_indices,
+)
+from graffan.library.analysis.targets import RawGradients, map_raw_gradients
+from graffan.library.models.analysis import AnalysedTarget, ParameterGradientSummary
+from graffan.library.models.smirnoff import SMIRNOFFParameter
+from graffan.library.models.targets import TorsionTarget, VibrationTarget
+
+
+@pytest.fixture()
+def analysed_target() -> AnalysedTarget:
+
+    return AnalysedTarget(
+        type="torsion",
+        gradients={
+            "b1": {"k": {"C": 1.0, "CC": -4.0, "CCC": 2.0}, "length": {"C": 3.0}},
+            "b2": {"k": {"CC": 0.5}},
+        },
+        summary=[
+            ParameterGradientSummary(
+                id=parameter_id,
+                attribute=attribute,
+                n_molecules=1,
+                sum=value,
+                mean=value,
+                std=0.0,
+                l1_norm=abs(value),
+                l2_norm=abs(value),
+                minimum=value,
+                lower_quartile=value,
+                median=-value,
+                upper_quartile=value,
+                maximum=value,
+            )
+            for parameter_id, attribute, value in [
+                ("b1", "k", -1.0),
+                ("b1", "length", 3.0),
+                ("b2", "k", 0.5),
+            ]
+        ],
+    )
+
+
+@pytest.mark.parametrize(
+    "k, order, expected",
+    [
+        (2, "largest", [3, 1]),
+        (2, "smallest", [0, 2]),
+        (2, "absolute", [0, 3]),
+        (None, "largest", [3, 1, 4, 2, 0]),
+        (10, "smallest", [0, 2, 4, 1, 3]),
+        (0, "largest", []),
+    ],
+)
+def test_select_indices(k, order, expected):
+
+    values = numpy.array([-5.0, 1.0, -0.5, 4.0, 0.0])
+    assert select_indices(values, k, order).tolist() == expected
+
+
+def test_build_gradient_columns(analysed_target):
+
+    columns = build_gradient_columns(analysed_target)
+
+    assert columns.keys == [("b1", "k"), ("b1", "length"), ("b2", "k")]
+    assert columns.smiles == ["C", "CC", "CCC"]
+
+    assert columns.offsets.tolist() == [0, 3, 4, 5]
+    assert columns.values[columns.key_slice("b1", "length")].tolist() == [3.0]
+
+
+def test_load_gradient_columns(tmpdir):
+
+    random = numpy.random.RandomState(0)
+
+    raw_gradients = RawGradients(
+        iteration=0,
+        targets=[
+            (TorsionTarget if index % 3 else VibrationTarget)(
+                name=f"target-{index}",
+                molecule="C" * (1 + random.randint(8)),
+                options={},
+            )
+            for index in range(20)
+        ],
+        parameters=[
+            SMIRNOFFParameter(
+                handler="Bonds", smirks="[#6:1]-[#1:2]", attribute="k", id=f"b{index}"
+            )
+            for index in range(4)
+        ],
+        mval_gradients=random.normal(size=(20, 4))
+        * (random.uniform(size=(20, 4)) < 0.5),
+        jacobian=random.normal(size=(4, 4)),
+        errors=[],
+    )
+
+    file_path = os.path.join(tmpdir, "mapped_gradients.npz")
+    analysed_targets = map_raw_gradients(raw_gradients, mapped_gradients_path=file_path)
+
+    assert len(analysed_targets) == 2
+
+    for analysed_target in analysed_targets:
+
+        expected_columns = build_gradient_columns(analysed_target)
+        columns = load_gradient_columns(file_path, analysed_target.type)
+
+        assert columns.keys == expected_columns.keys
+        assert columns.offsets.tolist() == expected_columns.offsets.tolist()
+
+        for key in expected_columns.keys:
+
+            expected_slice = expected_columns.key_slice(*key)
+            expected_gradients = {
+                expected_columns.smiles[molecule_index]: value
+                for molecule_index, value in zip(
+                    expected_columns.molecule_indices[expected_slice],
+                    expected_columns.values[expected_slice],
+                )
+            }
+
+            key_slice = columns.key_slice(*key)
+            gradients = {
+                columns.smiles[molecule_index]: value
+                for molecule_index, value in zip(
+                    columns.molecule_indices[key_slice], columns.values[key_slice]
+                )
+            }
+
+            assert gradients == expected_gradients
+
+
+def test_load_gradient_columns_missing_type(tmpdir):
+
+    file_path = os.path.join(tmpdir, "mapped_gradients.npz")
+
+    numpy.savez(file_path, target_types=numpy.array(["torsion"]))
+
+    with pytest.raises(KeyError, match="does not contain any gradients for optgeo"):
+        load_gradient_columns(file_path, "optgeo")
+
+
+@pytest.mark.parametrize(
+    "parameter_id, attribute, k, order, threshold, expected",
+    [
+        ("b1", "k", 2, "absolute", None, [("k", "CC"), ("k", "CCC")]),
+        ("b1", "k", 1, "largest", None, [("k", "CCC")]),
+        ("b1", None, 2, "largest", None, [("length", "C"), ("k", "CCC")]),
+        ("b1", "k", None, "absolute", 1.5, [("k", "CC"), ("k", "CCC")]),
+        ("b3", None, None, "absolute", None, []),
+    ],
+)
+def test_query_gradients(
+    analysed_target, parameter_id, attribute, k, order, threshold, expected
+):
+
+    entries = query_gradients(
+        build_gradient_columns(analysed_target),
+        parameter_id,
+        attribute,
+        k,
+        order,
+        threshold,
+    )
+
+    assert [(entry.attribute, entry.smiles) for entry in entries] == expected
+
+
+def test_query_parameters(analysed_target):
+
+    summaries = query_parameters(analysed_target, 2, "absolute", "sum")
+    assert [(summary.id, summary.attribute) for summary in summaries] == [
+        ("b1", "length"),
+        ("b1", "k"),
+    ]
+
+    summaries = query_parameters(analysed_target, None, "smallest", "sum", 0.75)
+    assert [(summary.id, summary.attribute) for summary in summaries] == [
+        ("b1", "k"),
+        ("b1", "length"),
+    ]
+
+    summaries = query_parameters(analysed_target, 1, "largest", "median")
+    assert [(summary.id, summary.attribute) for summary in summaries] == [("b1", "k")]
+
+
+def test_query_parameters_no_summary(analysed_target):
+
+    analysed_target.summary = []
+
+    with pytest.raises(ValueError, match="does not contain any summary statistics"):
+        query_parameters(analysed_target)
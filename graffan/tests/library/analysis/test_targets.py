@@ -1,6 +1,25 @@
 import os
 
-from graffan.library.analysis.targets import analyze_targets, extract_target_gradients
+import numpy
+import pytest
+
+from graffan.library.analysis.targets import (
+    METADATA_FILE_NAME,
+    RawGradients,
+    analyze_iteration,
+    analyze_targets,
+    estimate_chunk_size,
+    extract_raw_gradients,
+    extract_target_gradients,
+    extract_target_weight,
+    load_raw_gradients,
+    map_raw_gradients,
+    save_raw_gradients,
+    summarize_gradients,
+)
+from graffan.library.models.analysis import RawGradientMetadata, TargetError
+from graffan.library.models.smirnoff import SMIRNOFFParameter
+from graffan.library.models.targets import TorsionTarget, VibrationTarget
 
 
 def test_extract_target_gradients(dummy_fitting_target, force_balance_directory):
@@ -18,6 +37,19 @@ def test_extract_target_gradients(dummy_fitting_target, force_balance_directory)
     assert gradient.shape == (1,)
 
 
+def test_extract_raw_gradients(force_balance_directory):
+
+    raw_gradients = extract_raw_gradients(force_balance_directory, 0)
+
+    assert raw_gradients.iteration == 0
+
+    assert len(raw_gradients.targets) == 1
+    assert len(raw_gradients.parameters) == 1
+
+    assert raw_gradients.mval_gradients.shape == (1, 1)
+    assert raw_gradients.jacobian.shape == (1, 1)
+
+
 def test_analyze_targets(force_balance_directory):
 
     analysed_targets = analyze_targets(force_balance_directory, 0)
@@ -30,3 +62,363 @@ def test_analyze_targets(force_balance_directory):
     assert "b83" in analysed_target.gradients
     assert "k" in analysed_target.gradients["b83"]
     assert "[H][C:2]([H])([H:1])[O:3][H:4]" in analysed_target.gradients["b83"]["k"]
+
+    assert len(analysed_target.summary) == 1
+    assert analysed_target.summary[0].id == "b83"
+    assert analysed_target.summary[0].n_molecules == 1
+
+
+def test_analyze_targets_raw_output(force_balance_directory, tmpdir):
+
+    output_directory = os.path.join(str(tmpdir), "raw-output")
+
+    analysed_targets = analyze_targets(
+        force_balance_directory, 0, output_directory=output_directory
+    )
+
+    raw_gradients = load_raw_gradients(output_directory)
+
+    assert isinstance(raw_gradients.mval_gradients, numpy.memmap)
+    assert isinstance(raw_gradients.jacobian, numpy.memmap)
+
+    assert len(raw_gradients.targets) == 1
+    assert raw_gradients.parameters[0].id == "b83"
+
+    assert map_raw_gradients(raw_gradients) == analysed_targets
+
+
+def test_map_raw_gradients_chunked(force_balance_directory):
+
+    raw_gradients = extract_raw_gradients(force_balance_directory, 0)
+
+    expected_targets = map_raw_gradients(raw_gradients)
+    analysed_targets = map_raw_gradients(raw_gradients, chunk_size=1)
+
+    assert analysed_targets == expected_targets
+
+
+def test_map_raw_gradients_chunked_shared_molecules():
+
+    random = numpy.random.RandomState(0)
+
+    # Use more targets than molecules so that the gradients of most molecules are
+    # split across several chunks.
+    raw_gradients = RawGradients(
+        iteration=0,
+        targets=[
+            (TorsionTarget if index % 3 else VibrationTarget)(
+                name=f"target-{index}",
+                molecule="C" * (1 + random.randint(8)),
+                options={"weight": str(random.uniform(0.5, 2.0))},
+            )
+            for index in range(40)
+        ],
+        parameters=[
+            SMIRNOFFParameter(
+                handler="Bonds",
+                smirks="[#6:1]-[#1:2]",
+                attribute="k",
+                id=f"b{index}",
+            )
+            for index in range(5)
+        ],
+        mval_gradients=random.normal(size=(40, 5))
+        * (random.uniform(size=(40, 5)) < 0.5),
+        jacobian=random.normal(size=(5, 5)),
+        errors=[],
+        prior_widths=random.uniform(0.1, 2.0, size=5),
+    )
+
+    expected_targets = map_raw_gradients(raw_gradients)
+    analysed_targets = map_raw_gradients(raw_gradients, chunk_size=7)
+
+    assert [target.type for target in analysed_targets] == [
+        target.type for target in expected_targets
+    ]
+
+    for analysed_target, expected_target in zip(analysed_targets, expected_targets):
+
+        for field in ["gradients", "weighted_gradients", "prior_scaled_gradients"]:
+
+            analysed_gradients = getattr(analysed_target, field)
+            expected_gradients = getattr(expected_target, field)
+
+            assert analysed_gradients.keys() == expected_gradients.keys()
+
+            for parameter_id, attribute_gradients in expected_gradients.items():
+
+                molecule_gradients = attribute_gradients["k"]
+                analysed_molecule_gradients = analysed_gradients[parameter_id]["k"]
+
+                assert analysed_molecule_gradients.keys() == molecule_gradients.keys()
+                assert numpy.allclose(
+                    [
+                        analysed_molecule_gradients[smiles]
+                        for smiles in molecule_gradients
+                    ],
+                    [*molecule_gradients.values()],
+                )
+
+        assert analysed_target.weights == expected_target.weights
+
+
+def test_analyze_targets_memory_budget(force_balance_directory, tmpdir):
+
+    output_directory = os.path.join(str(tmpdir), "raw-output")
+
+    analysed_targets = analyze_targets(
+        force_balance_directory, 0, output_directory, memory_budget=1
+    )
+
+    assert analysed_targets == analyze_targets(force_balance_directory, 0)
+    assert os.path.isfile(os.path.join(output_directory, "mval_gradients.npy"))
+
+
+@pytest.mark.parametrize(
+    "memory_budget, expected", [(0, 1), (2 * (8 * 2 + 8 * 3 + 3 + 72 * 3), 2)]
+)
+def test_estimate_chunk_size(memory_budget, expected):
+    assert estimate_chunk_size(memory_budget, 2, 3) == expected
+
+
+def test_map_raw_gradients_threshold(force_balance_directory):
+
+    raw_gradients = extract_raw_gradients(force_balance_directory, 0)
+
+    analysed_targets = map_raw_gradients(raw_gradients, threshold=numpy.inf)
+
+    assert len(analysed_targets) == 1
+    assert len(analysed_targets[0].gradients) == 0
+
+
+@pytest.mark.parametrize("options, expected", [({}, 1.0), ({"weight": "0.25"}, 0.25)])
+def test_extract_target_weight(options, expected):
+
+    target = TorsionTarget(name="target", molecule="C", options=options)
+    assert numpy.isclose(extract_target_weight(target), expected)
+
+
+def test_map_raw_gradients_weights():
+
+    targets = [
+        TorsionTarget(name="t-0", molecule="C", options={"weight": "1.0"}),
+        TorsionTarget(name="t-1", molecule="C", options={"weight": "2.0"}),
+        TorsionTarget(name="t-2", molecule="CC", options={}),
+        VibrationTarget(name="v-0", molecule="C", options={"weight": "0.5"}),
+    ]
+
+    analysed_targets = map_raw_gradients(
+        RawGradients(
+            iteration=0,
+            targets=targets,
+            parameters=[
+                SMIRNOFFParameter(
+                    handler="Bonds", smirks="[#6:1]-[#1:2]", attribute="k", id="b1"
+                )
+            ],
+            mval_gradients=numpy.ones((4, 1)),
+            jacobian=numpy.ones((1, 1)),
+            errors=[],
+        )
+    )
+
+    assert [target.type for target in analysed_targets] == ["torsion", "vibration"]
+
+    assert analysed_targets[0].weights == {"C": 1.5, "CC": 1.0}
+    assert analysed_targets[1].weights == {"C": 0.5}
+
+
+def test_map_raw_gradients_weights_failed_target():
+
+    targets = [
+        TorsionTarget(name="t-0", molecule="C", options={"weight": "1.0"}),
+        TorsionTarget(name="t-1", molecule="C", options={"weight": "3.0"}),
+    ]
+
+    analysed_targets = map_raw_gradients(
+        RawGradients(
+            iteration=0,
+            targets=targets,
+            parameters=[
+                SMIRNOFFParameter(
+                    handler="Bonds", smirks="[#6:1]-[#1:2]", attribute="k", id="b1"
+                )
+            ],
+            # The gradients of a failed target are set to zero when extracted.
+            mval_gradients=numpy.array([[2.0], [0.0]]),
+            jacobian=numpy.ones((1, 1)),
+            errors=[TargetError(name="t-1", type="torsion", message="failed")],
+        )
+    )
+
+    # The failed target should not dilute the weight of the remaining target.
+    assert analysed_targets[0].weights == {"C": 1.0}
+    assert analysed_targets[0].weighted_gradients == {"b1": {"k": {"C": 2.0}}}
+
+
+def test_map_raw_gradients_variants(tmpdir):
+
+    targets = [
+        TorsionTarget(name="t-0", molecule="C", options={"weight": "1.0"}),
+        TorsionTarget(name="t-1", molecule="C", options={"weight": "2.0"}),
+        TorsionTarget(name="t-2", molecule="CC", options={}),
+    ]
+
+    raw_gradients = RawGradients(
+        iteration=0,
+        targets=targets,
+        parameters=[
+            SMIRNOFFParameter(
+                handler="Bonds", smirks="[#6:1]-[#1:2]", attribute=attribute, id="b1"
+            )
+            for attribute in ["k", "length"]
+        ],
+        mval_gradients=numpy.array([[1.0, 1.0], [3.0, -2.0], [2.0, 0.5]]),
+        jacobian=numpy.array([[1.0, 0.0], [0.0, 2.0]]),
+        errors=[],
+        prior_widths=numpy.array([0.5, 10.0]),
+    )
+
+    analysed_target = map_raw_gradients(raw_gradients)[0]
+
+    assert analysed_target.gradients == {
+        "b1": {"k": {"C": 4.0, "CC": 2.0}, "length": {"C": -2.0, "CC": 1.0}}
+    }
+    assert analysed_target.weighted_gradients == {
+        "b1": {"k": {"C": 7.0, "CC": 2.0}, "length": {"C": -6.0, "CC": 1.0}}
+    }
+    assert analysed_target.prior_scaled_gradients == {
+        "b1": {"k": {"C": 2.0, "CC": 1.0}, "length": {"C": -20.0, "CC": 10.0}}
+    }
+
+    # The prior widths should be retained when the raw gradients are stored.
+    save_raw_gradients(raw_gradients, str(tmpdir))
+
+    assert numpy.allclose(load_raw_gradients(str(tmpdir)).prior_widths, [0.5, 10.0])
+    assert map_raw_gradients(load_raw_gradients(str(tmpdir))) == [analysed_target]
+
+
+def test_summarize_gradients():
+
+    parameters = [
+        SMIRNOFFParameter(
+            handler="Bonds", smirks="[#6X4:1]-[#1:2]", attribute=attribute, id="b83"
+        )
+        for attribute in ["k", "length"]
+    ]
+
+    summaries = summarize_gradients(
+        numpy.array([0, 0]), numpy.array([1.0, -3.0]), parameters
+    )
+    assert len(summaries) == 1
+
+    summary = summaries[0]
+
+    assert summary.id == "b83"
+    assert summary.attribute == "k"
+    assert summary.n_molecules == 2
+
+    assert numpy.isclose(summary.sum, -2.0)
+    assert numpy.isclose(summary.mean, -1.0)
+    assert numpy.isclose(summary.std, 2.0)
+    assert numpy.isclose(summary.l1_norm, 4.0)
+    assert numpy.isclose(summary.l2_norm, numpy.sqrt(10.0))
+
+    assert numpy.isclose(summary.minimum, -3.0)
+    assert numpy.isclose(summary.median, -1.0)
+    assert numpy.isclose(summary.maximum, 1.0)
+
+
+def test_analyze_iteration(force_balance_directory):
+
+    analysed_iteration = analyze_iteration(force_balance_directory, 0, max_workers=1)
+
+    assert len(analysed_iteration.refit_parameters) == 1
+    assert len(analysed_iteration.targets) == 1
+
+    smiles = "[H][C:2]([H])([H:1])[O:3][H:4]"
+
+    assert smiles in analysed_iteration.parameter_matches["b83"]
+    assert len(analysed_iteration.parameter_matches["b83"][smiles]) == 3
+
+
+def test_analyze_iteration_errors(dummy_fitting_target, force_balance_directory):
+
+    os.unlink(
+        os.path.join(
+            force_balance_directory,
+            "optimize.tmp",
+            dummy_fitting_target.name,
+            "iter_0000",
+            "objective.p",
+        )
+    )
+
+    analysed_iteration = analyze_iteration(force_balance_directory, 0)
+
+    assert len(analysed_iteration.errors) == 1
+    assert analysed_iteration.errors[0].name == dummy_fitting_target.name
+
+    assert len(analysed_iteration.targets) == 1
+    assert len(analysed_iteration.targets[0].gradients) == 0
+
+
+def test_analyze_iteration_resume(
+    dummy_fitting_target, force_balance_directory, tmpdir
+):
+
+    output_directory = os.path.join(str(tmpdir), "raw-output")
+
+    expected_iteration = analyze_iteration(force_balance_directory, 0, output_directory)
+    assert len(expected_iteration.errors) == 0
+
+    # Remove the target output - this should not be re-loaded when resuming as it
+    # was already successfully extracted.
+    os.unlink(
+        os.path.join(
+            force_balance_directory,
+            "optimize.tmp",
+            dummy_fitting_target.name,
+            "iter_0000",
+            "objective.p",
+        )
+    )
+
+    analysed_iteration = analyze_iteration(
+        force_balance_directory, 0, output_directory, resume=True
+    )
+
+    assert len(analysed_iteration.errors) == 0
+    assert analysed_iteration.targets == expected_iteration.targets
+
+
+def test_extract_raw_gradients_resume_no_directory(force_balance_directory):
+
+    with pytest.raises(ValueError, match="An output directory must be provided"):
+        extract_raw_gradients(force_balance_directory, 0, resume=True)
+
+
+def test_extract_raw_gradients_resume_wrong_iteration(force_balance_directory, tmpdir):
+
+    output_directory = os.path.join(str(tmpdir), "raw-output")
+    extract_raw_gradients(force_balance_directory, 0, output_directory)
+
+    with pytest.raises(ValueError, match="was created for iteration 0 and so cannot"):
+        extract_raw_gradients(force_balance_directory, 1, output_directory, resume=True)
+
+
+def test_extract_raw_gradients_resume_wrong_targets(force_balance_directory, tmpdir):
+
+    output_directory = os.path.join(str(tmpdir), "raw-output")
+    extract_raw_gradients(force_balance_directory, 0, output_directory)
+
+    metadata_path = os.path.join(output_directory, METADATA_FILE_NAME)
+
+    metadata = RawGradientMetadata.parse_file(metadata_path)
+    metadata.targets_hash = "stale"
+
+    with open(metadata_path, "w") as file:
+        file.write(metadata.json())
+
+    with pytest.raises(ValueError, match="do not match those found in"):
+        extract_raw_gradients(force_balance_directory, 0, output_directory, resume=True)
@@ -0,0 +1,86 @@
+import os
+
+import numpy
+import pytest
+
+from graffan.library.analysis.targets import (
+    RawGradients,
+    map_raw_gradients,
+    save_raw_gradients,
+)
+from graffan.library.analysis.trajectories import (
+    extract_raw_gradient,
+    find_iteration_files,
+    raw_gradient_directory,
+)
+from graffan.library.models.smirnoff import SMIRNOFFParameter
+from graffan.library.models.targets import TorsionTarget
+
+
+@pytest.fixture()
+def raw_gradients() -> RawGradients:
+
+    return RawGradients(
+        iteration=0,
+        targets=[
+            TorsionTarget(name=f"target-{index}", molecule=smiles, options={})
+            for index, smiles in enumerate(["CO", "CO", "CCO"])
+        ],
+        parameters=[
+            SMIRNOFFParameter(
+                handler="Bonds", smirks="[#6X4:1]-[#8:2]", attribute=attribute, id="b1"
+            )
+            for attribute in ["k", "length"]
+        ],
+        mval_gradients=numpy.array([[1.0, 2.0], [3.0, 4.0], [0.0, -1.0]]),
+        jacobian=numpy.array([[1.0, 0.0], [1.0, 1.0]]),
+        errors=[],
+    )
+
+
+def test_find_iteration_files(tmpdir):
+
+    for file_name in ["iteration_0010.json", "iteration_0002.json", "other.json"]:
+
+        with open(os.path.join(str(tmpdir), file_name), "w") as file:
+            file.write("{}")
+
+    assert find_iteration_files(str(tmpdir)) == {
+        2: os.path.join(str(tmpdir), "iteration_0002.json"),
+        10: os.path.join(str(tmpdir), "iteration_0010.json"),
+    }
+
+
+def test_raw_gradient_directory(tmpdir, raw_gradients):
+
+    iteration_file = os.path.join(str(tmpdir), "iteration_0000.json")
+    assert raw_gradient_directory(iteration_file) is None
+
+    save_raw_gradients(raw_gradients, os.path.join(str(tmpdir), "iteration_0000"))
+    assert raw_gradient_directory(iteration_file) == os.path.join(
+        str(tmpdir), "iteration_0000"
+    )
+
+
+def test_extract_raw_gradient(tmpdir, raw_gradients):
+
+    save_raw_gradients(raw_gradients, str(tmpdir))
+
+    (expected_target,) = map_raw_gradients(raw_gradients)
+
+    for attribute in ["k", "length"]:
+
+        for smiles in ["CO", "CCO"]:
+
+            value = extract_raw_gradient(
+                str(tmpdir), "torsion", "b1", attribute, smiles
+            )
+            expected_value = expected_target.gradients["b1"][attribute].get(smiles)
+
+            assert (value is None and expected_value is None) or numpy.isclose(
+                value, expected_value
+            )
+
+    assert extract_raw_gradient(str(tmpdir), "vibration", "b1", "k", "CO") is None
+    assert extract_raw_gradient(str(tmpdir), "torsion", "b2", "k", "CO") is None
+    assert extract_raw_gradient(str(tmpdir), "torsion", "b1", "k", "C") is None
@@ -0,0 +1,78 @@
+import os
+
+from graffan.utilities.cache import ImageCache, LRUCache
+
+
+def test_build_key():
+
+    assert ImageCache.build_key("CO", None, 300) == ImageCache.build_key(
+        "CO", None, 300
+    )
+    assert ImageCache.build_key("CO", None, 300) != ImageCache.build_key(
+        "CO", None, 200
+    )
+
+
+def test_memory_cache():
+
+    image_cache = ImageCache(max_bytes=8)
+
+    image_cache.set("a", "1234")
+    image_cache.set("b", "5678")
+
+    assert image_cache.memory_bytes == 8
+
+    # Access "a" so that "b" is the least recently used image.
+    assert image_cache.get("a") == "1234"
+
+    image_cache.set("c", "90")
+
+    assert image_cache.get("a") == "1234"
+    assert image_cache.get("b") is None
+    assert image_cache.get("c") == "90"
+
+    assert image_cache.memory_bytes == 6
+
+    # Images larger than the budget should not be retained.
+    image_cache.set("d", "123456789")
+    assert image_cache.get("d") is None
+
+
+def test_disk_cache(tmpdir):
+
+    key = ImageCache.build_key("CO")
+
+    image_cache = ImageCache(str(tmpdir))
+    image_cache.set(key, "<svg></svg>")
+
+    assert os.path.isfile(os.path.join(str(tmpdir), key[:2], f"{key}.svg"))
+
+    # A second cache should be able to retrieve the image from disk.
+    image_cache = ImageCache(str(tmpdir))
+    assert image_cache.get(key) == "<svg></svg>"
+    assert image_cache.memory_bytes == len("<svg></svg>")
+
+    image_cache.clear_memory()
+    assert image_cache.memory_bytes == 0
+
+    assert image_cache.get(key) == "<svg></svg>"
+
+
+def test_lru_cache():
+
+    cache = LRUCache(max_size=2)
+
+    assert cache.get_or_build("a", lambda: 1) == 1
+    assert cache.get_or_build("b", lambda: 2) == 2
+    # "a" is already cached so should not be re-built.
+    assert cache.get_or_build("a", lambda: 3) == 1
+
+    # "b" is now the least recently used value and so should be evicted.
+    assert cache.get_or_build("c", lambda: 4) == 4
+    assert len(cache) == 2
+
+    assert cache.get_or_build("b", lambda: 5) == 5
+    assert cache.get_or_build("a", lambda: 6) == 6
+
+    cache.clear()
+    assert len(cache) == 0
@@ -1,5 +1,6 @@
 from graffan.library.models.targets import TorsionTarget
 from graffan.utilities.forcebalance import (
+    extract_prior_widths,
     extract_target_parameters,
     extract_targets,
     load_fb_force_field,
@@ -34,3 +35,12 @@ def test_extract_target_parameters(force_balance_directory):
 
     assert len(parameters) == 1
     assert parameters[0].handler == "Bonds"
+
+
+def test_extract_prior_widths(force_balance_directory):
+
+    fb_force_field = load_fb_force_field(force_balance_directory)
+    prior_widths = extract_prior_widths(fb_force_field)
+
+    assert prior_widths.shape == (1,)
+    assert (prior_widths > 0.0).all()
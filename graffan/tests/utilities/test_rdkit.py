@@ -1,9 +1,64 @@
+import os
+
+import numpy
 import pytest
+from rdkit import Chem
+
+from graffan.utilities.cache import ImageCache
+from graffan.utilities.rdkit import (
+    assign_2d_coordinates,
+    configure_image_cache,
+    find_smirks_matches,
+    smiles_to_display_smiles,
+    smiles_to_grid_svg,
+    smiles_to_svg,
+    smiles_to_svgs,
+    svg_cache_key,
+)
+
+
+def test_assign_2d_coordinates():
+
+    molecule_a = Chem.MolFromSmiles("[CH3:1][OH:2]")
+    assign_2d_coordinates(molecule_a)
+
+    molecule_b = Chem.MolFromSmiles("[OH:2][CH3:1]")
+    assign_2d_coordinates(molecule_b)
+
+    assert molecule_a.GetNumConformers() == 1
+    assert molecule_b.GetNumConformers() == 1
+
+    # The same molecule should be depicted consistently regardless of atom order.
+    positions_a = molecule_a.GetConformer().GetPositions()
+    positions_b = molecule_b.GetConformer().GetPositions()
+
+    assert numpy.allclose(positions_a[0], positions_b[1])
+    assert numpy.allclose(positions_a[1], positions_b[0])
+
 
-from graffan.utilities.rdkit import smiles_to_grid_svg, smiles_to_svg
+@pytest.mark.parametrize(
+    "smiles, smirks, expected",
+    [
+        ("CO", "[#6:1]-[#8:2]", [(0, 1)]),
+        ("CO", "[#8:2]-[#6:1]", [(0, 1)]),
+        ("CO", "[#6X4:1]-[#1:2]", [(0, 2), (0, 3), (0, 4)]),
+        ("CO", "[#7:1]", []),
+        ("c1ccccc1", "[#6X3:1]-[#1:2]", [(i, i + 6) for i in range(6)]),
+    ],
+)
+def test_find_smirks_matches(smiles, smirks, expected):
 
+    matches = find_smirks_matches(Chem.MolFromSmiles(smiles), smirks)
+    assert sorted(matches) == expected
 
-@pytest.mark.parametrize("highlight_smirks", [None, "CO"])
+
+def test_find_smirks_matches_invalid():
+
+    with pytest.raises(ValueError, match="could not be parsed"):
+        find_smirks_matches(Chem.MolFromSmiles("C"), "[#6:1")
+
+
+@pytest.mark.parametrize("highlight_smirks", [None, "CO", "[#6X4:1]-[#1:2]"])
 def test_smiles_to_svg(highlight_smirks):
     # It's difficult to test this as it's a graphical function. For now make sure
     # it doesn't error and something is produced.
@@ -11,8 +66,61 @@ def test_smiles_to_svg(highlight_smirks):
     assert len(output) > 0
 
 
+def test_smiles_to_svg_cached(tmpdir):
+
+    image_cache = configure_image_cache(str(tmpdir))
+
+    try:
+
+        output = smiles_to_svg("CO", "[#6:1]-[#8:2]")
+        assert image_cache.memory_bytes == len(output.encode())
+
+        image_cache.clear_memory()
+
+        assert smiles_to_svg("CO", "[#6:1]-[#8:2]") == output
+        assert len(os.listdir(str(tmpdir))) == 1
+
+    finally:
+        configure_image_cache()
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_smiles_to_svgs(max_workers):
+
+    image_cache = ImageCache()
+    image_cache.set(svg_cache_key("C", None), "<svg>cached</svg>")
+
+    pairs = [("C", None), ("CO", "[#6:1]-[#8:2]"), ("CCO", None)]
+
+    outputs = smiles_to_svgs(pairs, max_workers=max_workers, image_cache=image_cache)
+
+    assert outputs[0] == "<svg>cached</svg>"
+    assert outputs[1] == smiles_to_svg("CO", "[#6:1]-[#8:2]")
+
+    assert image_cache.get(svg_cache_key("CCO", None)) == outputs[2]
+
+
 def test_smiles_to_grid_svg():
     # It's difficult to test this as it's a graphical function. For now make sure
     # it doesn't error and something is produced.
     output = smiles_to_grid_svg(["CO", "CCO"])
     assert len(output) > 0
+
+
+def test_smiles_to_grid_svg_cached():
+
+    image_cache = configure_image_cache()
+
+    output = smiles_to_grid_svg(["CO", "CCO"])
+    assert image_cache.memory_bytes == len(output.encode())
+
+    assert smiles_to_grid_svg(["CO", "CCO"]) == output
+    assert image_cache.memory_bytes == len(output.encode())
+
+
+@pytest.mark.parametrize(
+    "smiles, expected_smiles",
+    [("OC", "CO"), ("[H:3][C:1]([H:4])([H:5])[O:2][H:6]", "CO")],
+)
+def test_smiles_to_display_smiles(smiles, expected_smiles):
+    assert smiles_to_display_smiles(smiles) == expected_smiles
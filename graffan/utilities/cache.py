@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable, Optional
+
+
+class ImageCache:
+    """A two level cache of rendered images. Images are stored in an in-memory LRU
+    cache which is bounded by the total size of the stored images, which is in turn
+    (optionally) backed by an on-disk content addressed store which can be shared
+    between processes and persists between sessions.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = 64 * 1024**2):
+        """
+
+        Parameters
+        ----------
+        directory
+            The (optional) directory to persist the cached images in.
+        max_bytes
+            The maximum total size [bytes] of the images to retain in memory.
+        """
+
+        self._directory = directory
+        self._max_bytes = max_bytes
+
+        self._memory_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_bytes = 0
+
+        self._lock = Lock()
+
+    @property
+    def directory(self) -> Optional[str]:
+        """The directory the cached images are persisted in."""
+        return self._directory
+
+    @property
+    def memory_bytes(self) -> int:
+        """The total size [bytes] of the images currently retained in memory."""
+        return self._memory_bytes
+
+    @staticmethod
+    def build_key(*components: Any) -> str:
+        """Builds a content addressed key from a set of JSON serializable components
+        which uniquely define an image."""
+
+        return hashlib.sha256(json.dumps(components).encode()).hexdigest()
+
+    def _file_path(self, key: str) -> str:
+        return os.path.join(self._directory, key[:2], f"{key}.svg")
+
+    def _store_in_memory(self, key: str, image: str):
+
+        n_bytes = len(image.encode())
+
+        if n_bytes > self._max_bytes:
+            return
+
+        with self._lock:
+
+            if key in self._memory_cache:
+
+                self._memory_cache.move_to_end(key)
+                return
+
+            self._memory_cache[key] = image
+            self._memory_bytes += n_bytes
+
+            while self._memory_bytes > self._max_bytes:
+
+                _, evicted_image = self._memory_cache.popitem(last=False)
+                self._memory_bytes -= len(evicted_image.encode())
+
+    def get(self, key: str) -> Optional[str]:
+        """Retrieves an image from the cache.
+
+        Parameters
+        ----------
+        key
+            The key associated with the image.
+
+        Returns
+        -------
+            The cached image if present, otherwise ``None``.
+        """
+
+        with self._lock:
+
+            if key in self._memory_cache:
+
+                self._memory_cache.move_to_end(key)
+                return self._memory_cache[key]
+
+        if self._directory is None or not os.path.isfile(self._file_path(key)):
+            return None
+
+        with open(self._file_path(key)) as file:
+            image = file.read()
+
+        self._store_in_memory(key, image)
+        return image
+
+    def set(self, key: str, image: str):
+        """Stores an image in the cache.
+
+        Parameters
+        ----------
+        key
+            The key associated with the image.
+        image
+            The image to store.
+        """
+
+        self._store_in_memory(key, image)
+
+        if self._directory is None:
+            return
+
+        file_path = self._file_path(key)
+
+        if os.path.isfile(file_path):
+            return
+
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        # Write to a temporary file first so that other processes never see a
+        # partially written image.
+        with tempfile.NamedTemporaryFile(
+            "w", dir=os.path.dirname(file_path), suffix=".tmp", delete=False
+        ) as file:
+            file.write(image)
+
+        os.replace(file.name, file_path)
+
+    def clear_memory(self):
+        """Removes all images from the in-memory cache."""
+
+        with self._lock:
+
+            self._memory_cache.clear()
+            self._memory_bytes = 0
+
+
+class LRUCache:
+    """A thread-safe, in-memory cache which retains a bounded number of the most
+    recently used values."""
+
+    def __init__(self, max_size: int):
+        """
+
+        Parameters
+        ----------
+        max_size
+            The maximum number of values to retain.
+        """
+
+        self._max_size = max_size
+        self._values: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._values)
+
+    def get_or_build(self, key: Hashable, builder: Callable[[], Any]) -> Any:
+        """Retrieves a value from the cache, building and storing it first if it is
+        not already present.
+
+        Parameters
+        ----------
+        key
+            The key associated with the value.
+        builder
+            A function which builds the value. This is called outside of the cache
+            lock so that slow builds do not block other threads.
+
+        Returns
+        -------
+            The cached value.
+        """
+
+        with self._lock:
+
+            if key in self._values:
+
+                self._values.move_to_end(key)
+                return self._values[key]
+
+        value = builder()
+
+        with self._lock:
+
+            self._values[key] = value
+
+            while len(self._values) > self._max_size:
+                self._values.popitem(last=False)
+
+        return value
+
+    def clear(self):
+        """Removes all values from the cache."""
+
+        with self._lock:
+            self._values.clear()
@@ -58,6 +58,25 @@ def mvals_to_pvals_jacobian(
     return jacobian
 
 
+def extract_prior_widths(force_field: "FF") -> numpy.ndarray:
+    """Extracts the width of the prior of each parameter being refit from a force
+    balance force field object. These are the rescaling factors which force balance
+    derives from the ``priors`` section of the main options file.
+
+    Parameters
+    ----------
+    force_field
+        The force balance force field object.
+
+    Returns
+    -------
+        The prior width of each parameter, in the same order as the parameters
+        returned by ``extract_target_parameters``.
+    """
+
+    return numpy.array(force_field.rs, dtype=float)
+
+
 def load_fb_force_field(root_directory: str) -> "FF":
     """Attempts to load the force field being refit from a force balance optimization
     directory.
@@ -1,16 +1,238 @@
 import functools
-from typing import List, Optional
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
 
+import rdkit
 from rdkit import Chem
 from rdkit.Chem import Draw
 from rdkit.Chem.Draw import rdMolDraw2D
 
+from graffan.utilities.cache import ImageCache
 
-@functools.lru_cache(1024)
-def smiles_to_svg(smiles: str, highlight_smirks: Optional[str]) -> str:
+RENDERER_VERSION = "1"
+"""The version of the molecule renderer. This should be incremented whenever the
+way molecules are rendered changes so that any cached images are invalidated."""
+
+_MAX_MATCHES = 2**32 - 1
+
+_image_cache = ImageCache()
+
+
+@functools.lru_cache(4096)
+def _smirks_to_query(smirks: str) -> Tuple[Chem.Mol, Tuple[int, ...]]:
+    """Compiles a SMIRKS pattern into an RDKit query molecule.
+
+    Parameters
+    ----------
+    smirks
+        The SMIRKS pattern to compile.
+
+    Returns
+    -------
+        The query molecule and the indices of its tagged atoms, sorted by their
+        map index.
+    """
+
+    query = Chem.MolFromSmarts(smirks)
+
+    if query is None:
+        raise ValueError(f"{smirks} could not be parsed as a SMIRKS pattern.")
+
+    index_map = {
+        atom.GetAtomMapNum(): atom.GetIdx()
+        for atom in query.GetAtoms()
+        if atom.GetAtomMapNum() > 0
+    }
+
+    return query, tuple(index_map[map_index] for map_index in sorted(index_map))
+
+
+def find_smirks_matches(rdkit_molecule: Chem.Mol, smirks: str) -> List[Tuple[int, ...]]:
+    """Finds all of the (non-unique) matches of a SMIRKS pattern within a molecule.
+
+    Matching is performed against a copy of the molecule with explicit hydrogens
+    added and the MDL aromaticity model applied, mirroring the behaviour of the
+    ``openforcefield`` RDKit toolkit wrapper.
+
+    Parameters
+    ----------
+    rdkit_molecule
+        The molecule to match against.
+    smirks
+        The SMIRKS pattern to match.
+
+    Returns
+    -------
+        The indices of the molecule atoms which matched the tagged atoms of the
+        SMIRKS pattern, ordered by map index. Any hydrogens which were not present
+        in the original molecule will have an index greater than or equal to its
+        number of atoms.
+    """
+
+    query, tagged_indices = _smirks_to_query(smirks)
+
+    molecule = Chem.AddHs(rdkit_molecule)
+
+    Chem.Kekulize(molecule, clearAromaticFlags=True)
+    Chem.SetAromaticity(molecule, Chem.AromaticityModel.AROMATICITY_MDL)
+
+    full_matches = molecule.GetSubstructMatches(
+        query, uniquify=False, maxMatches=_MAX_MATCHES, useChirality=True
+    )
+
+    return [tuple(match[index] for index in tagged_indices) for match in full_matches]
+
+
+def smiles_to_rdkit(smiles: str, remove_hydrogens: bool = False) -> Chem.Mol:
+    """Parses a SMILES pattern into an RDKit molecule, retaining any explicit
+    hydrogen atoms by default so that atom indices are consistent with the pattern.
+
+    Parameters
+    ----------
+    smiles
+        The SMILES pattern.
+    remove_hydrogens
+        Whether to remove any explicit hydrogen atoms.
+
+    Returns
+    -------
+        The parsed molecule.
+    """
+
+    smiles_parser = Chem.rdmolfiles.SmilesParserParams()
+    smiles_parser.removeHs = remove_hydrogens
+
+    rdkit_molecule = Chem.MolFromSmiles(smiles, smiles_parser)
+
+    if rdkit_molecule is None:
+        raise ValueError(f"{smiles} could not be parsed as a SMILES pattern.")
+
+    return rdkit_molecule
+
+
+def smiles_to_display_smiles(smiles: str) -> str:
+    """Converts a (potentially mapped, explicit hydrogen) SMILES pattern into a
+    canonical, implicit hydrogen SMILES pattern suitable for displaying to users.
+
+    Parameters
+    ----------
+    smiles
+        The SMILES pattern.
+
+    Returns
+    -------
+        The display SMILES pattern.
+    """
+
+    rdkit_molecule = smiles_to_rdkit(smiles, remove_hydrogens=True)
+
+    for atom in rdkit_molecule.GetAtoms():
+        atom.SetAtomMapNum(0)
+
+    return Chem.MolToSmiles(rdkit_molecule)
+
+
+@functools.lru_cache(4096)
+def _canonical_depiction(canonical_smiles: str) -> Chem.Mol:
+    """Computes a 2D depiction of a molecule defined by a canonical SMILES pattern.
+    The returned molecule is shared between calls and so must not be modified."""
+
+    rdkit_molecule = smiles_to_rdkit(canonical_smiles)
+    Chem.rdDepictor.Compute2DCoords(rdkit_molecule)
+
+    return rdkit_molecule
+
+
+def assign_2d_coordinates(rdkit_molecule: Chem.Mol):
+    """Adds a conformer containing a set of 2D depiction coordinates to a molecule.
+
+    Depictions are cached based on the canonical SMILES pattern of the molecule
+    (ignoring any atom map indices) so that the same molecule is laid out once and is
+    depicted consistently regardless of the atom ordering of the SMILES pattern it
+    was parsed from.
+
+    Parameters
+    ----------
+    rdkit_molecule
+        The molecule to add the coordinates to.
+    """
+
+    unmapped_molecule = Chem.Mol(rdkit_molecule)
+
+    for atom in unmapped_molecule.GetAtoms():
+        atom.SetAtomMapNum(0)
+
+    template = _canonical_depiction(Chem.MolToSmiles(unmapped_molecule))
+    template_conformer = template.GetConformer()
+
+    # Map the atoms of the cached depiction onto the atoms of the molecule.
+    atom_map = rdkit_molecule.GetSubstructMatch(template)
+
+    if len(atom_map) != rdkit_molecule.GetNumAtoms():
+
+        Chem.rdDepictor.Compute2DCoords(rdkit_molecule)
+        return
+
+    conformer = Chem.Conformer(rdkit_molecule.GetNumAtoms())
+    conformer.Set3D(False)
+
+    for template_index, atom_index in enumerate(atom_map):
+
+        conformer.SetAtomPosition(
+            atom_index, template_conformer.GetAtomPosition(template_index)
+        )
+
+    rdkit_molecule.AddConformer(conformer, assignId=True)
+
+
+def configure_image_cache(
+    directory: Optional[str] = None, max_bytes: int = 64 * 1024**2
+) -> ImageCache:
+    """Replaces the cache used to store the images rendered by ``smiles_to_svg``.
+
+    Parameters
+    ----------
+    directory
+        An optional directory to persist the rendered images in so that they can be
+        shared between processes and sessions.
+    max_bytes
+        The maximum total size [bytes] of the rendered images to retain in memory.
+
+    Returns
+    -------
+        The new image cache.
+    """
+
+    global _image_cache
+    _image_cache = ImageCache(directory, max_bytes)
+
+    return _image_cache
+
+
+def svg_cache_key(
+    smiles: str, highlight_smirks: Optional[str], image_size: int = 300
+) -> str:
+    """Returns the key which the image rendered by ``smiles_to_svg`` for a given
+    set of inputs is cached under."""
+
+    return ImageCache.build_key(
+        smiles, highlight_smirks, image_size, RENDERER_VERSION, rdkit.__version__
+    )
+
+
+def smiles_to_svg(
+    smiles: str,
+    highlight_smirks: Optional[str],
+    highlight_matches: Optional[Tuple[Tuple[int, ...], ...]] = None,
+    image_size: int = 300,
+) -> str:
     """Renders a 2D representation of a molecule based on its SMILES representation as
     an SVG string.
 
+    Rendered images are cached (see ``configure_image_cache``) based on the SMILES
+    pattern, highlight SMIRKS, image size and renderer version.
+
     Parameters
     ----------
     smiles
@@ -18,37 +240,139 @@ def smiles_to_svg(smiles: str, highlight_smirks: Optional[str]) -> str:
     highlight_smirks
         An optional SMIRK pattern to use to highlight a subset of atoms within
         the molecule.
+    highlight_matches
+        Optional pre-computed matches of ``highlight_smirks`` (see
+        ``find_smirks_matches``) which will be highlighted instead of searching for
+        the matches again.
+    image_size
+        The width and height [pixels] of the image.
 
     Returns
     -------
         The 2D SVG representation.
     """
-    from openforcefield.topology import Molecule
-    from openforcefield.utils import RDKitToolkitWrapper
 
-    # Parse the SMILES into an RDKit molecule
-    smiles_parser = Chem.rdmolfiles.SmilesParserParams()
-    smiles_parser.removeHs = False
+    cache_key = svg_cache_key(smiles, highlight_smirks, image_size)
+    svg_content = _image_cache.get(cache_key)
 
-    rdkit_molecule = Chem.MolFromSmiles(smiles, smiles_parser)
+    if svg_content is None:
+
+        svg_content = _render_svg(
+            smiles, highlight_smirks, highlight_matches, image_size
+        )
+        _image_cache.set(cache_key, svg_content)
+
+    return svg_content
+
+
+def smiles_to_svgs(
+    pairs: List[Tuple[str, Optional[str]]],
+    max_workers: Optional[int] = None,
+    image_size: int = 300,
+    image_cache: Optional[ImageCache] = None,
+    highlight_matches: Optional[List[Optional[Tuple[Tuple[int, ...], ...]]]] = None,
+) -> List[str]:
+    """Renders a batch of 2D representations of molecules as SVG strings across a
+    pool of processes. Any images which are already cached will not be re-rendered.
+
+    Parameters
+    ----------
+    pairs
+        The SMILES pattern of each molecule to render and an optional SMIRKS pattern
+        to use to highlight a subset of its atoms.
+    max_workers
+        The maximum number of processes to render the images with. If ``1``, the
+        images will be rendered in the current process.
+    image_size
+        The width and height [pixels] of each image.
+    image_cache
+        The cache to retrieve and store the images from / in. By default the cache
+        used by ``smiles_to_svg`` will be used.
+    highlight_matches
+        The (optional) pre-computed matches of the SMIRKS pattern of each pair. See
+        ``smiles_to_svg`` for details.
+
+    Returns
+    -------
+        The 2D SVG representation of each pair.
+    """
+
+    image_cache = image_cache if image_cache is not None else _image_cache
+
+    cache_keys = [
+        svg_cache_key(smiles, highlight_smirks, image_size)
+        for smiles, highlight_smirks in pairs
+    ]
+    svg_contents = [image_cache.get(cache_key) for cache_key in cache_keys]
+
+    missing_indices = [i for i, content in enumerate(svg_contents) if content is None]
+
+    render_arguments = (
+        [pairs[i][0] for i in missing_indices],
+        [pairs[i][1] for i in missing_indices],
+        (
+            [None] * len(missing_indices)
+            if highlight_matches is None
+            else [highlight_matches[i] for i in missing_indices]
+        ),
+        [image_size] * len(missing_indices),
+    )
+
+    if max_workers == 1 or len(missing_indices) <= 1:
+        rendered_contents = [*map(_render_svg, *render_arguments)]
+
+    else:
+
+        n_workers = max_workers if max_workers is not None else os.cpu_count() or 1
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+
+            rendered_contents = [
+                *executor.map(
+                    _render_svg,
+                    *render_arguments,
+                    chunksize=max(1, len(missing_indices) // (4 * n_workers)),
+                )
+            ]
+
+    for index, svg_content in zip(missing_indices, rendered_contents):
+
+        image_cache.set(cache_keys[index], svg_content)
+        svg_contents[index] = svg_content
+
+    return svg_contents
+
+
+def _render_svg(
+    smiles: str,
+    highlight_smirks: Optional[str],
+    highlight_matches: Optional[Tuple[Tuple[int, ...], ...]],
+    image_size: int,
+) -> str:
+    """Renders a 2D representation of a molecule as an SVG string. See
+    ``smiles_to_svg`` for details."""
+
+    rdkit_molecule = smiles_to_rdkit(smiles)
 
     # Generate a set of 2D coordinates.
     if not rdkit_molecule.GetNumConformers():
-        Chem.rdDepictor.Compute2DCoords(rdkit_molecule)
+        assign_2d_coordinates(rdkit_molecule)
 
     # Find any atoms which should be highlighted.
     highlight_atoms = set()
     highlight_bonds = set()
 
-    if highlight_smirks is not None:
+    if highlight_matches is None and highlight_smirks is not None:
+        highlight_matches = find_smirks_matches(rdkit_molecule, highlight_smirks)
 
-        openff_molecule = Molecule.from_smiles(smiles, allow_undefined_stereo=True)
+    if highlight_matches is not None:
 
-        matches = RDKitToolkitWrapper().find_smarts_matches(
-            openff_molecule, highlight_smirks
-        )
+        n_atoms = rdkit_molecule.GetNumAtoms()
 
-        for match in matches:
+        for match in highlight_matches:
+
+            # Skip any implicit hydrogen atoms which will not be drawn.
+            match = tuple(index for index in match if index < n_atoms)
 
             matched_bonds = [
                 rdkit_molecule.GetBondBetweenAtoms(match[i], match[i + 1])
@@ -61,7 +385,7 @@ def smiles_to_svg(smiles: str, highlight_smirks: Optional[str]) -> str:
                 bond.GetIdx() for bond in matched_bonds if bond is not None
             )
 
-    drawer = rdMolDraw2D.MolDraw2DSVG(300, 300)
+    drawer = rdMolDraw2D.MolDraw2DSVG(image_size, image_size)
 
     rdMolDraw2D.PrepareAndDrawMolecule(
         drawer,
@@ -80,6 +404,9 @@ def smiles_to_grid_svg(smiles: List[str]) -> str:
     """Renders a grid of 2D representations of a set of molecules based on their SMILES
     representation as an SVG string.
 
+    Rendered grids are cached (see ``configure_image_cache``) based on the list of
+    SMILES patterns and renderer version.
+
     Parameters
     ----------
     smiles
@@ -90,12 +417,25 @@ def smiles_to_grid_svg(smiles: List[str]) -> str:
         The 2D SVG representation.
     """
 
-    # Parse the SMILES into an RDKit molecule
-    smiles_parser = Chem.rdmolfiles.SmilesParserParams()
-    smiles_parser.removeHs = True
+    cache_key = ImageCache.build_key(
+        "grid", [*smiles], RENDERER_VERSION, rdkit.__version__
+    )
+    svg_content = _image_cache.get(cache_key)
+
+    if svg_content is not None:
+        return svg_content
 
     rdkit_molecules = [
-        Chem.MolFromSmiles(smiles_pattern, smiles_parser) for smiles_pattern in smiles
+        smiles_to_rdkit(smiles_pattern, remove_hydrogens=True)
+        for smiles_pattern in smiles
     ]
 
-    return Draw.MolsToGridImage(rdkit_molecules, 5, useSVG=True, subImgSize=(200, 200))
+    for rdkit_molecule in rdkit_molecules:
+        assign_2d_coordinates(rdkit_molecule)
+
+    svg_content = Draw.MolsToGridImage(
+        rdkit_molecules, 5, useSVG=True, subImgSize=(200, 200)
+    )
+    _image_cache.set(cache_key, svg_content)
+
+    return svg_content